@@ -0,0 +1,191 @@
+import asyncio
+import json
+import os.path
+import time
+from datetime import datetime
+import aiohttp
+from progress.bar import Bar
+import metrics
+from fetcher import get_prs, cache_filename, prepare_projects, GRAPHQL_URL, API_TOKEN
+
+# fetches many projects at once over one pooled aiohttp session.
+# pages of one project are still sequential since every page needs the previous endCursor,
+# instead of fixed sleeps the requests are paced by the rate-limit budget github reports back:
+# full speed while there is plenty of budget, spread out once it runs low, wait for the reset when it is gone.
+
+def parse_reset_at(s):
+    return datetime.fromisoformat(s.replace('Z', '+00:00')).timestamp()
+
+class RateLimiter:
+    def __init__(self, reserve=10, low_water=500, limit=5000):
+        self.reserve = reserve
+        self.low_water = low_water
+        self.limit = limit
+        self.remaining = None
+        self.reset_at = None
+        self.cost = 1
+        self.next_slot = 0.0
+        self.paused_until = 0.0
+        self.lock = asyncio.Lock()
+
+    def update(self, headers=None, js=None):
+        headers = headers or {}
+        if 'X-RateLimit-Limit' in headers:
+            self.limit = int(headers['X-RateLimit-Limit'])
+        if 'X-RateLimit-Remaining' in headers:
+            self.remaining = int(headers['X-RateLimit-Remaining'])
+        if 'X-RateLimit-Reset' in headers:
+            self.reset_at = float(headers['X-RateLimit-Reset'])
+        rl = ((js or {}).get('data') or {}).get('rateLimit')
+        if rl:
+            self.remaining = int(rl.get('remaining', self.remaining or 0))
+            self.cost = max(1, int(rl.get('cost', self.cost)))
+            if rl.get('resetAt'):
+                self.reset_at = parse_reset_at(rl['resetAt'])
+
+    def pause(self, seconds):
+        self.paused_until = max(self.paused_until, time.time() + seconds)
+
+    def pause_until_reset(self):
+        if self.reset_at:
+            self.paused_until = max(self.paused_until, self.reset_at + 1)
+        else:
+            self.pause(60)
+
+    async def acquire(self):
+        async with self.lock:
+            now = time.time()
+            slot = max(now, self.next_slot, self.paused_until)
+            spacing = 0.0
+            if self.reset_at and slot >= self.reset_at:
+                # a new window, the full budget until the next response reports the real one
+                self.remaining = self.limit
+                self.reset_at = None
+            if self.remaining is not None and self.reset_at:
+                window = min(3600.0, self.reset_at - slot)
+                if self.remaining - self.cost <= self.reserve:
+                    # budget exhausted, everybody waits for the reset
+                    slot = self.reset_at + 1
+                    self.remaining = self.limit
+                    self.reset_at = None
+                else:
+                    if 0 < self.remaining < self.low_water:
+                        # running low, spread the rest of the budget over the rest of the window
+                        spacing = window * self.cost / self.remaining
+                    self.remaining -= self.cost
+            self.next_slot = slot + spacing
+        delay = slot - time.time()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+def is_rate_limited(js):
+    return any(e.get('type') == 'RATE_LIMITED' for e in (js or {}).get('errors') or [])
+
+async def post_graphql(session, limiter, query, url=GRAPHQL_URL, token=API_TOKEN, max_retries=5):
+    headers = {'Authorization': 'token %s' % token}
+    for attempt in range(max_retries + 1):
+        if attempt > 0:
+            metrics.count('http.retries')
+        await limiter.acquire()
+        try:
+            # the latency of the request alone, without the wait for the rate limit
+            with metrics.timer('http', attempt=attempt) as m:
+                async with session.post(url, json={'query': query}, headers=headers) as r:
+                    text = await r.text()
+                    limiter.update(r.headers)
+                    status = r.status
+                    retry_after = r.headers.get('Retry-After')
+                    m['status'] = status
+                    m['bytes'] = len(text)
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            metrics.count('http.errors')
+            print(e, 'retry', attempt)
+            limiter.pause(min(2 ** attempt, 60))
+            continue
+        js = None
+        if status == 200:
+            js = json.loads(text)
+            limiter.update(js=js)
+            if not is_rate_limited(js):
+                return text, js
+        if retry_after:
+            limiter.pause(int(retry_after))
+        elif status in (403, 429) or is_rate_limited(js):
+            metrics.count('http.rate_limited')
+            if limiter.remaining == 0 or is_rate_limited(js):
+                limiter.pause_until_reset()
+            else:
+                # secondary rate limit without Retry-After
+                limiter.pause(min(60 * 2 ** attempt, 900))
+        elif status >= 500:
+            limiter.pause(min(2 ** attempt, 60))
+        else:
+            print(status, text)
+            return None, None
+    metrics.count('http.gave_up')
+    print('giving up after', max_retries, 'retries')
+    return None, None
+
+async def fetch_gh_async(session, limiter, project, after_cursor=None, **kwargs):
+    fname = cache_filename(project, after_cursor)
+    if os.path.isfile(fname):
+        metrics.count('fetch_gh.hit')
+        with open(fname) as f:
+            return json.load(f)
+    metrics.count('fetch_gh.miss')
+    text, js = await post_graphql(session, limiter, get_prs(project, after_cursor), **kwargs)
+    if js is not None:
+        with open(fname, 'w') as f:
+            f.write(text)
+    return js
+
+async def fetch_gh_paginated_async(session, limiter, project, **kwargs):
+    cursor = None
+    pages = 0
+    while True:
+        x = await fetch_gh_async(session, limiter, project, cursor, **kwargs)
+        try:
+            pi = x.get('data').get('repository').get('pullRequests').get('pageInfo')
+        except Exception:
+            print(project, x)
+            break
+        pages = pages + 1
+        if not pi.get('hasNextPage'):
+            break
+        cursor = pi.get('endCursor')
+    return pages
+
+async def fetch_projects_async(projects, concurrency=8, **kwargs):
+    limiter = RateLimiter()
+    queue = asyncio.Queue()
+    for p in projects:
+        queue.put_nowait(p)
+    bar = Bar('Processing ' + str(len(projects)) + " projects", max=len(projects), suffix='%(percent)d%% %(eta)s')
+    pages = dict()
+
+    async def worker(session):
+        while not queue.empty():
+            project = queue.get_nowait()
+            try:
+                pages[project] = await fetch_gh_paginated_async(session, limiter, project, **kwargs)
+            except Exception as e:
+                print(e, project)
+            bar.next()
+
+    connector = aiohttp.TCPConnector(limit=concurrency)
+    timeout = aiohttp.ClientTimeout(total=300)
+    with metrics.timer('fetch', projects=len(projects), concurrency=concurrency) as m:
+        async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+            await asyncio.gather(*[worker(session) for _ in range(concurrency)])
+        m['items'] = len(pages)
+        m['pages'] = sum(pages.values())
+    bar.finish()
+    return pages
+
+def fetch_projects(projects, concurrency=8, **kwargs):
+    return asyncio.run(fetch_projects_async(list(projects), concurrency, **kwargs))
+
+if __name__ == '__main__':
+    projects=prepare_projects()
+    print("Fetching ", len(projects))
+    fetch_projects(projects['project'], concurrency=int(os.environ.get('FETCH_CONCURRENCY', 8)))
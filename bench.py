@@ -0,0 +1,279 @@
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import pandas as pd
+
+# benchmarks of the PR processing pipeline on synthetic data.
+# gen_cache writes GraphQL pages shaped like the fetcher.get_prs responses in cached/,
+# gen_mined writes refminer outputs like the ones in mined/, both deterministic for a seed.
+# every stage is timed (best of --repeat) and run once more under tracemalloc for the peak memory,
+# results are appended to bench_results.jsonl and compared with the previous run of the same sizes.
+#
+#   python bench.py --pages 20 --prs 100 --mined 2000 --compare
+
+RESULTS_FILE = 'bench_results.jsonl'
+# entry points whose import time is measured (import_<module> stages), plots/utils for comparison
+IMPORT_MODULES = ['files', 'page_reader', 'fetcher', 'miner', 'utils', 'plots']
+
+WORDS = ['fix', 'add', 'update', 'refactor', 'test', 'tests', 'junit', 'dependency', 'thread', 'singleton',
+         'inject', 'network', 'socket', 'cache', 'parser', 'config', 'build', 'docs', 'release', 'cleanup',
+         'testable', 'visible', 'simplify', 'easier', 'remove', 'support', 'api', 'client', 'server', 'error']
+REF_TYPES = ['EXTRACT_OPERATION', 'RENAME_METHOD', 'RENAME_VARIABLE', 'MOVE_CLASS', 'EXTRACT_VARIABLE',
+             'CHANGE_PARAMETER_TYPE', 'ADD_PARAMETER', 'RENAME_CLASS', 'INLINE_OPERATION', 'EXTRACT_CLASS']
+
+def text(rnd, n):
+    return ' '.join(rnd.choice(WORDS) for _ in range(n))
+
+def pr_url(project, number):
+    return 'https://github.com/%s/pull/%d' % (project, number)
+
+def gen_files(rnd, max_files):
+    # a few prod classes, some with their test, plus other files
+    files = []
+    for i in range(rnd.randint(1, max_files)):
+        pkg = 'src/main/java/org/p%d/' % rnd.randint(0, 5)
+        cls = 'C%d' % rnd.randint(0, 200)
+        r = rnd.random()
+        if r < 0.5:
+            files.append(pkg + cls + '.java')
+            if rnd.random() < 0.5:
+                files.append(pkg.replace('main', 'test') + cls + 'Test.java')
+        elif r < 0.8:
+            files.append(pkg.replace('main', 'test') + cls + 'Test.java')
+        else:
+            files.append('docs/f%d.md' % i)
+    files = list(dict.fromkeys(files))[:max_files]
+    return [{'additions': rnd.randint(0, 300), 'deletions': rnd.randint(0, 100), 'path': f} for f in files]
+
+def gen_node(rnd, project, number, max_files, body_words):
+    files = gen_files(rnd, max_files)
+    return {'url': pr_url(project, number), 'number': number,
+            'title': text(rnd, rnd.randint(3, 10)),
+            'state': rnd.choice(['MERGED', 'CLOSED', 'OPEN']),
+            'id': 'PR_%s_%d' % (project.replace('/', '_'), number),
+            'bodyText': text(rnd, rnd.randint(0, body_words)),
+            'changedFiles': len(files),
+            'files': {'totalCount': len(files), 'nodes': files},
+            'labels': {'nodes': [{'name': rnd.choice(WORDS)} for _ in range(rnd.randint(0, 2))]}}
+
+def gen_cache(out_dir, pages=10, prs=100, max_files=15, body_words=200, projects=5, seed=42):
+    rnd = random.Random(seed)
+    os.makedirs(out_dir, exist_ok=True)
+    files = []
+    for p in range(pages):
+        project = 'owner%d/repo%d' % (p % projects, p % projects)
+        first = (p // projects) * prs + 1
+        nodes = [gen_node(rnd, project, first + i, max_files, body_words) for i in range(prs)]
+        page = {'data': {'rateLimit': {'cost': 1, 'remaining': 4999, 'resetAt': '2030-01-01T00:00:00Z'},
+                         'repository': {'pullRequests': {
+                             'pageInfo': {'endCursor': 'c%d' % p, 'hasNextPage': True},
+                             'totalCount': pages * prs, 'nodes': nodes}}}}
+        fname = os.path.join(out_dir, '%s_c%d.json' % (project.replace('/', '_'), p))
+        with open(fname, 'w') as f:
+            json.dump(page, f)
+        files.append(fname)
+    return files
+
+def gen_mined(out_dir, files=1000, refs=20, projects=5, seed=42):
+    # file names are the prid of the PR like utils.enrich_mine_df derives them
+    rnd = random.Random(seed)
+    os.makedirs(out_dir, exist_ok=True)
+    fnames = []
+    for i in range(files):
+        fname = os.path.join(out_dir, 'owner%d_repo%d_%d.csv' % (i % projects, i % projects, i // projects + 1))
+        with open(fname, 'w') as f:
+            f.write('commit;refactoringType;refactoringName;classesBefore;classesAfter;description\n')
+            for j in range(rnd.randint(0, refs)):
+                t = rnd.choices(REF_TYPES, weights=range(len(REF_TYPES), 0, -1))[0]
+                before = 'org.p%d.C%d' % (rnd.randint(0, 5), rnd.randint(0, 200))
+                after = before if rnd.random() < 0.7 else 'org.p%d.C%d' % (rnd.randint(0, 5), rnd.randint(0, 200))
+                f.write('%s;%s;%s;%s;%s;%s\n' % ('%040x' % rnd.getrandbits(160), t, t.title().replace('_', ' '),
+                                                 before, after, text(rnd, 8)))
+        fnames.append(fname)
+    return fnames
+
+def prepare(args, work_dir):
+    import utils
+    ctx = {'work_dir': work_dir}
+    ctx['files'] = gen_cache(os.path.join(work_dir, 'cached'), args.pages, args.prs, args.max_files,
+                             args.body_words, args.projects, args.seed)
+    ctx['nodes'] = [(f, n) for f in ctx['files'] for n in json.load(open(f))['data']['repository']['pullRequests']['nodes']]
+    ctx['titles'] = pd.Series([n['title'] for _, n in ctx['nodes']] + [n['bodyText'] for _, n in ctx['nodes']])
+    prs = utils.process_multiple_files(ctx['files'])
+    prs['title_mask'] = utils.title_masks(prs.title)
+    # all_prs_with_files.csv lists the changed files of a PR in changedFile
+    prs['changedFile'] = prs['prod_file']
+    ctx['prs'] = prs
+    # one row per changed file like all_prs_with_files.csv
+    ctx['changed'] = pd.DataFrame([(n['url'], x['path']) for _, n in ctx['nodes'] for x in n['files']['nodes']],
+                                  columns=['url', 'changedFile'])
+    ctx['mined_files'] = gen_mined(os.path.join(work_dir, 'mined'), args.mined, args.refs, args.projects, args.seed)
+    mined = utils.load_mined(ctx['mined_files'], cache=os.path.join(work_dir, 'mined.parquet'))
+    rnd = random.Random(args.seed)
+    pairs = {p: rnd.choice([0, 0, 1, 2, 3]) for p in mined.prid.unique()}
+    mined['url'] = mined.prid.str.replace(r'^(owner\d+)_(repo\d+)_(\d+)$', r'https://github.com/\1/\2/pull/\3', regex=True)
+    mined['test_pairs'] = mined.prid.map(pairs)
+    mined['with_test_pairs'] = mined.test_pairs > 0
+    mined['pr_group'] = mined.prid.map({p: rnd.choice(['irrelevant', 'relevant']) for p in pairs})
+    ctx['mined'] = mined
+    # manually reviewed prod files of the PRs, some of them are refactored classes
+    urls = mined.url.unique()
+    ctx['reviewed'] = pd.DataFrame({'url': [u for u in urls for _ in range(2)],
+                                    'prod_file': ['src/main/java/org/p%d/C%d.java' % (rnd.randint(0, 5), rnd.randint(0, 200))
+                                                  for _ in range(2 * len(urls))]})
+    return ctx
+
+def load_mined_cold(ctx):
+    import utils
+    cache = tempfile.mkdtemp(dir=ctx['work_dir'])
+    try:
+        return len(utils.load_mined(ctx['mined_files'], cache=os.path.join(cache, 'mined.parquet')))
+    finally:
+        shutil.rmtree(cache)
+
+def node_processor(ctx):
+    import utils
+    builder = utils.FrameBuilder()
+    for f, n in ctx['nodes']:
+        builder.add(utils.nodeProcessor(f, n))
+    builder.frame()
+    return len(ctx['nodes'])
+
+def exclude_precomputed(ctx):
+    # the java files per url computed once and reused by the following calls
+    import utils
+    if 'java_files' not in ctx:
+        ctx['java_files'] = utils.java_files_by_url(ctx['changed'])
+    utils.exclude_too_large_commits(ctx['mined'], ctx['changed'], ctx['java_files'])
+    return len(ctx['mined'])
+
+def import_time(module):
+    # in a fresh interpreter, so the time includes its startup
+    subprocess.run([sys.executable, '-c', 'import ' + module], check=True,
+                   cwd=os.path.dirname(os.path.abspath(__file__)))
+    return 1
+
+def stages():
+    import utils
+    from page_reader import read_page_nodes, NODE_FIELDS
+    # name -> function of the prepared context returning the number of processed items
+    return {
+        'process_file': lambda ctx: (utils.process_multiple_files(ctx['files']), len(ctx['nodes']))[1],
+        'read_page_nodes': lambda ctx: sum(len(read_page_nodes(f, NODE_FIELDS, streaming=False)) for f in ctx['files']),
+        'read_page_nodes_streaming': lambda ctx: sum(len(read_page_nodes(f, NODE_FIELDS, streaming=True)) for f in ctx['files']),
+        'nodeProcessor': node_processor,
+        'generate_all_prs': lambda ctx: (utils.generate_all_prs(ctx['prs']), len(ctx['prs']))[1],
+        'load_mined': load_mined_cold,
+        'calc_means_and_counts_by_ref_type': lambda ctx: (utils.calc_means_and_counts_by_ref_type(ctx['mined']), len(ctx['mined']))[1],
+        'merge_refs_on_prod_file': lambda ctx: (utils.merge_refs_on_prod_file(ctx['mined'].copy(), ctx['reviewed'].copy()), len(ctx['mined']))[1],
+        'exclude_too_large_commits': lambda ctx: (utils.exclude_too_large_commits(ctx['mined'], ctx['changed']), len(ctx['mined']))[1],
+        'exclude_too_large_commits_precomputed': exclude_precomputed,
+        'is_testability_relevant': lambda ctx: len([utils.is_testability_relevant(t) for t in ctx['titles']]),
+        'title_masks': lambda ctx: len(utils.title_masks(ctx['titles'])),
+        **{'import_' + m: (lambda ctx, m=m: import_time(m)) for m in IMPORT_MODULES},
+    }
+
+def measure(fn, ctx, repeat=3):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        items = fn(ctx)
+        times.append(time.perf_counter() - start)
+    tracemalloc.start()
+    try:
+        fn(ctx)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    best = min(times)
+    return {'items': items, 'seconds': best, 'throughput': items / best if best > 0 else None,
+            'peak_mb': peak / 2 ** 20}
+
+def version():
+    try:
+        return subprocess.run(['git', 'describe', '--always', '--dirty'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except OSError:
+        return None
+
+def run(args):
+    work_dir = tempfile.mkdtemp(prefix='bench-')
+    try:
+        start = time.perf_counter()
+        ctx = prepare(args, work_dir)
+        print('Generated %d pages with %d PRs and %d mined files in %.1fs' %
+              (len(ctx['files']), len(ctx['nodes']), len(ctx['mined_files']), time.perf_counter() - start))
+        todo = stages()
+        names = args.stages.split(',') if args.stages else list(todo)
+        run_id = time.strftime('%Y%m%dT%H%M%S')
+        params = {k: getattr(args, k) for k in ['pages', 'prs', 'max_files', 'body_words', 'mined', 'refs', 'projects', 'seed']}
+        results = []
+        for name in names:
+            r = dict(run=run_id, version=version(), stage=name, params=params, python=platform.python_version(),
+                     pandas=pd.__version__, **measure(todo[name], ctx, args.repeat))
+            print('%-40s %10d items %9.3fs %12.0f items/s %9.1f MB' %
+                  (name, r['items'], r['seconds'], r['throughput'] or 0, r['peak_mb']))
+            results.append(r)
+        return results
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+def save(results, results_file=RESULTS_FILE):
+    with open(results_file, 'a') as f:
+        for r in results:
+            f.write(json.dumps(r) + '\n')
+
+def load_results(results_file=RESULTS_FILE):
+    if not os.path.isfile(results_file):
+        return pd.DataFrame()
+    with open(results_file) as f:
+        return pd.DataFrame([json.loads(line) for line in f if line.strip()])
+
+def compare(results, results_file=RESULTS_FILE, threshold=1.2):
+    # regressions of results against the last earlier run with the same sizes, slower or more memory by threshold
+    prev = load_results(results_file)
+    regressions = []
+    for r in results:
+        if len(prev) == 0:
+            break
+        same = prev[(prev.stage == r['stage']) & (prev.run < r['run']) &
+                    prev.params.apply(lambda p: p == r['params'])]
+        if len(same) == 0:
+            continue
+        base = same.iloc[-1]
+        for metric in ['seconds', 'peak_mb']:
+            if base[metric] > 0 and r[metric] > base[metric] * threshold:
+                regressions.append(r['stage'])
+                print('REGRESSION %s %s: %.3f -> %.3f (%s -> %s)' %
+                      (r['stage'], metric, base[metric], r[metric], base['version'], r['version']))
+    return regressions
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='benchmark the PR processing pipeline on synthetic data')
+    parser.add_argument('--pages', type=int, default=10, help='cached GraphQL pages')
+    parser.add_argument('--prs', type=int, default=100, help='PRs per page')
+    parser.add_argument('--max-files', type=int, default=15, help='max changed files per PR')
+    parser.add_argument('--body-words', type=int, default=200, help='max words per PR body')
+    parser.add_argument('--mined', type=int, default=1000, help='mined csv files')
+    parser.add_argument('--refs', type=int, default=20, help='max refactorings per mined file')
+    parser.add_argument('--projects', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--stages', help='comma separated stages, default all')
+    parser.add_argument('--results', default=RESULTS_FILE)
+    parser.add_argument('--compare', action='store_true', help='exit with 1 on regressions against the previous run')
+    parser.add_argument('--threshold', type=float, default=1.2)
+    args = parser.parse_args()
+    results = run(args)
+    regressions = compare(results, args.results, args.threshold) if args.compare else []
+    save(results, args.results)
+    if regressions:
+        raise SystemExit(1)
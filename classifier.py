@@ -0,0 +1,103 @@
+import numpy as np
+import pandas as pd
+
+# keyword rule sets behind is_testability_relevant in miner.py and utils.py.
+# a rule is (relevant, label, groups): it matches when every group has at least one of its keywords
+# in the lowercased text, the first matching rule wins like in the original if-chains.
+# case_sensitive keywords are looked up in the original text instead.
+#
+# a rule set is compiled once into tuples of keywords per rule and a classify closure over them:
+# the text is lowercased once and the rules are tested in order with early exit. a combined regex /
+# aho-corasick scan was tried as well, but for ~25 short keywords python's substring search (in C) with
+# early exit beats walking the matches of one pattern.
+# classify_series classifies each distinct text of a series once and maps the results back.
+
+class RuleSet:
+    def __init__(self, rules, default, non_str, case_sensitive=()):
+        self.rules = [(relevant, label, tuple(tuple(g) for g in groups)) for relevant, label, groups in rules]
+        self.default = default
+        self.non_str = non_str
+        self.case_sensitive = frozenset(case_sensitive)
+        self.classify = self.compile()
+
+    def compile(self):
+        # per rule its groups as (keywords looked up in the lowercased text, case sensitive keywords)
+        checks = [(tuple((tuple(k for k in g if k not in self.case_sensitive), tuple(k for k in g if k in self.case_sensitive))
+                         for g in groups), (relevant, label))
+                  for relevant, label, groups in self.rules]
+        default, non_str = self.default, self.non_str
+
+        def classify(s):
+            if not isinstance(s, str):
+                return non_str
+            low = s.lower()
+            # plain loops, any() over a generator per group is several times slower
+            for groups, outcome in checks:
+                for keywords, orig in groups:
+                    for k in keywords:
+                        if k in low:
+                            break
+                    else:
+                        for k in orig:
+                            if k in s:
+                                break
+                        else:
+                            # no keyword of this group, next rule
+                            break
+                else:
+                    return outcome
+            return default
+        return classify
+
+    def classify_series(self, series):
+        # returns columns relevant and label, aligned with the series
+        series = pd.Series(series)
+        # missing values get code -1, i.e. the last outcome
+        codes, uniques = pd.factorize(series.to_numpy(dtype=object), use_na_sentinel=True)
+        outcomes = [self.classify(x) for x in uniques] + [self.non_str]
+        relevant = np.array([o[0] for o in outcomes], dtype=bool)
+        labels = np.array([o[1] for o in outcomes], dtype=object)
+        return pd.DataFrame({'relevant': relevant[codes], 'label': pd.Series(labels[codes], dtype=object, index=series.index)},
+                            index=series.index)
+
+def refactor_add_fix_rules(masks):
+    rules = []
+    for prefix in ['refactor', 'add', 'fix']:
+        rules += [(True, prefix + '_' + m, [[prefix], [m]]) for m in masks]
+    return rules + [(True, m, [[m]]) for m in masks]
+
+# miner.is_testability_relevant
+MINER_RULES = RuleSet(
+    [(False, '@Testable', [['@Testable']]),
+     (True, 'VisibleForTesting', [['VisibleForTesting']])] +
+    [(True, m, [[m]]) for m in ['testability', 'testable', 'easier to test', 'simplify testing', 'cover']] +
+    refactor_add_fix_rules(['test', 'junit']),
+    default=(False, None), non_str=(False, None), case_sensitive=['@Testable', 'VisibleForTesting'])
+
+TEST_JUNIT = ['test', 'junit']
+
+# utils.is_testability_relevant
+TESTABILITY_RULES = RuleSet(
+    [(True, 'testability', [['testability', 'testable']]),
+     (True, 'Refactor for test', [['refactor'], TEST_JUNIT]),
+     (True, 'Dependency', [['dependency', 'depend']]),
+     (True, 'Concurrency', [['concurren', 'thread', 'sleep', 'latch']]),
+     (True, 'Singleton', [['singleton']]),
+     (True, 'Inject', [['inject', 'wire', 'wiring']]),
+     (True, 'Network', [['socket', 'network', 'connectivity']]),
+     (True, 'test', [TEST_JUNIT])],
+    default=(False, 'Other'), non_str=(False, 'other'))
+
+# utils.is_testability_relevant_suggested, m1-m8 and the fallbacks
+SUGGESTED_RULES = RuleSet(
+    [(True, 'testability', [['testabilit', 'testable']]),
+     (True, 'Easier to test', [['simpl', 'visibl', 'eas'], TEST_JUNIT]),
+     (True, 'Refactor for test', [['refactor'], TEST_JUNIT]),
+     (True, 'Dependency', [['depend'], TEST_JUNIT]),
+     (True, 'Concurrency', [['concurren', 'thread', 'sleep', 'latch'], TEST_JUNIT]),
+     (True, 'Singleton', [['singleton'], TEST_JUNIT]),
+     (True, 'Injection', [['inject', 'wire', 'wiring'], TEST_JUNIT]),
+     (True, 'Network', [['network', 'socket', 'connectivity', 'connection'], TEST_JUNIT]),
+     (True, 'Fix', [['fix']]),
+     (True, 'test', [['test']])],
+    default=(False, 'other'), non_str=(False, 'other'))
@@ -1,18 +1,27 @@
-import requests
-import pandas as pd
 import json
 import os.path
 import time
 from progress.bar import Bar
+import metrics
 
+GRAPHQL_URL = os.environ.get('GITHUB_GRAPHQL_URL', 'https://api.github.com/graphql')
+API_TOKEN = os.environ.get('GITHUB_TOKEN', "737d7c04a5e3beff15421bacb25ceee99410b7c0")
 
-def get_prs(project, after_cursor=None):
+def get_prs(project, after_cursor=None, order_by=None):
     parts=project.split('/')
     owner=parts[0]
     name=parts[1]
     after = 'after:"%s",' % (after_cursor) if after_cursor else ""
+    # e.g. UPDATED_AT for the most recently updated PRs first
+    if order_by:
+        after = after + ' orderBy: {field: %s, direction: DESC},' % order_by
     query = """
  {
+  rateLimit {
+    cost
+    remaining
+    resetAt
+  }
   repository(owner:"%s", name:"%s") {
     pullRequests(first: 100, %s) {
       pageInfo {
@@ -26,10 +35,15 @@ def get_prs(project, after_cursor=None):
         title
         state
         id
+        updatedAt
         bodyText
         changedFiles
         files(first: 100) {
           totalCount
+          pageInfo {
+            endCursor
+            hasNextPage
+          }
           nodes {
             additions
             deletions
@@ -48,22 +62,29 @@ def get_prs(project, after_cursor=None):
 """ % (owner, name, after)
     return query
 
-def fetch_gh(project, after_cursor=None):
+def cache_filename(project, after_cursor=None):
     fname='cached/' + project.replace('/', '_')
     if after_cursor:
         fname = fname + '_' + after_cursor
-    fname = fname + '.json'
+    return fname + '.json'
+
+def fetch_gh(project, after_cursor=None):
+    fname=cache_filename(project, after_cursor)
 #    print(fname)
     if os.path.isfile(fname):
 #        print('return cached')
+        metrics.count('fetch_gh.hit')
         s = open(fname).read()
         x = json.loads(s)
         return x
-    url = 'https://api.github.com/graphql'
+    metrics.count('fetch_gh.miss')
+    # requests and pandas are imported where they are used, async_fetcher/refresh only need the queries
+    import requests
     json_query = { 'query' : get_prs(project, after_cursor) }
-    api_token = "737d7c04a5e3beff15421bacb25ceee99410b7c0"
-    headers = {'Authorization': 'token %s' % api_token}
-    r = requests.post(url=url, json=json_query, headers=headers)
+    headers = {'Authorization': 'token %s' % API_TOKEN}
+    with metrics.timer('http', project=project) as m:
+        r = requests.post(url=GRAPHQL_URL, json=json_query, headers=headers)
+        m['status'] = r.status_code
     time.sleep(0.5)
     if r.status_code == 200:
         f=open(fname, 'w')
@@ -73,6 +94,7 @@ def fetch_gh(project, after_cursor=None):
         return x
     else:
         if r.status_code == 403:
+            metrics.count('http.rate_limited')
             print("sleep 120")
             time.sleep(120)
         print(r.headers)
@@ -85,25 +107,29 @@ def fetch_gh_paginated(project):
     pi=dict()
     i = 0
     bar = None
-    while True:
-        i = i+1
-        x=fetch_gh(project, pi.get('endCursor', None))
-        try:
-            pi=x.get('data').get('repository').get('pullRequests').get('pageInfo')
-        except:
-            print(x)
-            break
-        totalCount = x.get('data').get('repository').get('pullRequests').get('totalCount')
-#        print(pi, i, totalCount)
-        if bar is None:
-            max_val = int( (totalCount-100) / 100) if totalCount > 200 else 1
-            bar=Bar('Fetching ' + project + ' expected ' + str(totalCount), max=max_val, suffix='%(percent)d%% %(eta)s')
-        bar.next()
-        if pi.get('hasNextPage') == False:
-            break
+    with metrics.timer('fetch_project', project=project) as m:
+        while True:
+            i = i+1
+            x=fetch_gh(project, pi.get('endCursor', None))
+            try:
+                pi=x.get('data').get('repository').get('pullRequests').get('pageInfo')
+            except:
+                print(x)
+                m['status'] = 'error'
+                break
+            m['pages'] = i
+            totalCount = x.get('data').get('repository').get('pullRequests').get('totalCount')
+#            print(pi, i, totalCount)
+            if bar is None:
+                max_val = int( (totalCount-100) / 100) if totalCount > 200 else 1
+                bar=Bar('Fetching ' + project + ' expected ' + str(totalCount), max=max_val, suffix='%(percent)d%% %(eta)s')
+            bar.next()
+            if pi.get('hasNextPage') == False:
+                break
 
 
 def prepare_projects():
+    import pandas as pd
     if os.path.isfile('large_prs.csv'):
         top_projects=pd.read_csv('large_prs.csv')
     else:
@@ -0,0 +1,122 @@
+import asyncio
+import json
+import os
+import aiohttp
+from progress.bar import Bar
+from files import get_files
+from async_fetcher import RateLimiter, post_graphql
+
+# completes the file lists of PRs with more than 100 changed files in the cached pages.
+# get_prs only asks for files(first: 100), a PR is truncated when files.totalCount > len(files.nodes).
+# the remaining files are fetched with the node ids of the PRs, BATCH_SIZE PRs per query under aliases
+# (pr0: node(id: ...) { ... on PullRequest { files(first: 100, after: ...) } }), such a query costs
+# about one point of the rate-limit budget instead of one per PR. pages cached before the files
+# connection had a pageInfo need one extra round to get the cursor after the first 100 files.
+# the fetched files are appended to the node in its page (files.pageInfo keeps the last cursor),
+# a page is rewritten as soon as all its truncated PRs are complete, an interrupted run continues from there.
+
+BATCH_SIZE = 25
+FILE_FIELDS = 'nodes { additions deletions path }'
+
+def truncated_prs(files):
+    prs = []
+    for fname in files:
+        with open(fname) as f:
+            js = json.load(f)
+        repository = (js.get('data') or {}).get('repository') or {}
+        for n in (repository.get('pullRequests') or {}).get('nodes') or []:
+            fs = n.get('files') or {}
+            have = len(fs.get('nodes') or [])
+            if n.get('id') and (fs.get('totalCount') or 0) > have:
+                # without pageInfo the cached nodes are the first page
+                cursor = (fs.get('pageInfo') or {}).get('endCursor') if have else None
+                prs.append({'page': fname, 'id': n['id'], 'url': n.get('url'), 'total': fs['totalCount'],
+                            'have': have, 'cursor': cursor, 'files': [], 'done': False, 'failed': False})
+    return prs
+
+def files_query(batch):
+    parts = []
+    for i, pr in enumerate(batch):
+        if pr['cursor'] or pr['have'] == 0:
+            after = ', after: "%s"' % pr['cursor'] if pr['cursor'] else ''
+            fields = FILE_FIELDS
+        else:
+            # only the cursor after the cached first page
+            after = ''
+            fields = ''
+        parts.append('  pr%d: node(id: "%s") { ... on PullRequest { files(first: 100%s) { totalCount pageInfo { endCursor hasNextPage } %s } } }'
+                     % (i, pr['id'], after, fields))
+    return '{\n  rateLimit { cost remaining resetAt }\n' + '\n'.join(parts) + '\n}'
+
+def apply_result(pr, node):
+    fs = (node or {}).get('files')
+    if not fs:
+        pr['failed'] = True
+        return
+    info = fs.get('pageInfo') or {}
+    if 'nodes' in fs:
+        pr['files'] += fs['nodes'] or []
+    pr['cursor'] = info.get('endCursor') or pr['cursor']
+    pr['done'] = not info.get('hasNextPage')
+
+def merge_into_page(fname, prs):
+    # appends the fetched files to the nodes, written under a temporary name and renamed
+    by_id = {pr['id']: pr for pr in prs}
+    with open(fname) as f:
+        js = json.load(f)
+    for n in js['data']['repository']['pullRequests']['nodes']:
+        pr = by_id.get(n.get('id'))
+        if pr is None or not (pr['files'] or pr['cursor']):
+            continue
+        fs = n['files']
+        fs['nodes'] = (fs.get('nodes') or []) + pr['files']
+        fs['pageInfo'] = {'endCursor': pr['cursor'], 'hasNextPage': not pr['done']}
+    tmp = fname + '.tmp'
+    with open(tmp, 'w') as f:
+        json.dump(js, f)
+    os.replace(tmp, fname)
+
+async def fetch_batch(session, limiter, batch, **kwargs):
+    text, js = await post_graphql(session, limiter, files_query(batch), **kwargs)
+    data = (js or {}).get('data') or {}
+    for i, pr in enumerate(batch):
+        apply_result(pr, data.get('pr%d' % i))
+
+async def complete_files_async(prs, batch_size=BATCH_SIZE, concurrency=4, **kwargs):
+    limiter = RateLimiter()
+    pages = dict()
+    for pr in prs:
+        pages.setdefault(pr['page'], []).append(pr)
+    bar = Bar('Completing ' + str(len(prs)) + ' PRs', max=max(1, len(pages)), suffix='%(percent)d%% %(eta)s')
+    queries = 0
+    connector = aiohttp.TCPConnector(limit=concurrency)
+    async with aiohttp.ClientSession(connector=connector, timeout=aiohttp.ClientTimeout(total=300)) as session:
+        while True:
+            pending = [pr for pr in prs if not pr['done'] and not pr['failed']]
+            if not pending:
+                break
+            batches = [pending[i:i + batch_size] for i in range(0, len(pending), batch_size)]
+            sem = asyncio.Semaphore(concurrency)
+
+            async def run(batch):
+                async with sem:
+                    await fetch_batch(session, limiter, batch, **kwargs)
+            await asyncio.gather(*[run(b) for b in batches])
+            queries += len(batches)
+            for fname in [p for p, ps in pages.items() if all(pr['done'] or pr['failed'] for pr in ps)]:
+                merge_into_page(fname, pages.pop(fname))
+                bar.next()
+    bar.finish()
+    failed = [pr['url'] for pr in prs if pr['failed']]
+    print('Completed', len(prs) - len(failed), 'of', len(prs), 'PRs with', queries, 'queries')
+    return failed
+
+def complete_files(cache_dir='cached', batch_size=BATCH_SIZE, concurrency=4, **kwargs):
+    # returns the urls of the PRs whose files could not be fetched
+    prs = truncated_prs([f for f in get_files(cache_dir) if f.endswith('.json')])
+    if not prs:
+        return []
+    return asyncio.run(complete_files_async(prs, batch_size, concurrency, **kwargs))
+
+if __name__ == '__main__':
+    complete_files(concurrency=int(os.environ.get('FETCH_CONCURRENCY', 4)))
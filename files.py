@@ -0,0 +1,10 @@
+import os
+
+# the files of the cache directories (cached/, mined/), without the imports of miner.py (pandas, ...)
+# for the fetch tools that only list them
+
+def get_files(d):
+    return [d+'/' + x for x in os.listdir(d)]
+
+def listed_files(d):
+    return set(get_files(d)) if os.path.isdir(d) else set()
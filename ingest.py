@@ -0,0 +1,100 @@
+import heapq
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import pandas as pd
+from progress.bar import Bar
+import metrics
+
+# parses many cached pages with a pool of processes.
+# the files are split into chunks of about the same size in bytes (not the same number of files),
+# a few chunks per worker so that a slow chunk does not keep the others waiting.
+# every worker writes its rows to a parquet part in out_dir and only returns a small summary,
+# the rows are never pickled back to the parent. a chunk that fails as a whole is retried file by file,
+# so one corrupt page only loses itself. a part that cannot be written fails the files of its chunk, the
+# other chunks go on.
+
+CHUNKS_PER_WORKER = 4
+
+def balanced_chunks(files, n_chunks):
+    # greedy: the largest remaining file goes to the chunk with the fewest bytes so far
+    chunks = [[] for _ in range(max(1, min(n_chunks, len(files))))]
+    heap = [(0, i) for i in range(len(chunks))]
+    for size, f in sorted(((os.path.getsize(f), f) for f in files), reverse=True):
+        total, i = heapq.heappop(heap)
+        chunks[i].append(f)
+        heapq.heappush(heap, (total + size, i))
+    order = {f: i for i, f in enumerate(files)}
+    return [sorted(c, key=order.get) for c in chunks if c]
+
+def parse_chunk(parse, chunk, out_file):
+    # parse(files) returns (DataFrame, failed files)
+    start = time.time()
+    try:
+        df, failed = parse(chunk)
+    except Exception as e:
+        print('chunk of', len(chunk), 'files failed, retrying one by one:', e)
+        frames, failed = [], []
+        for f in chunk:
+            try:
+                x, bad = parse([f])
+                frames.append(x)
+                failed += bad
+            except Exception as e:
+                print(f, e)
+                failed.append(f)
+        frames = [x for x in frames if len(x) > 0]
+        df = pd.concat(frames) if frames else pd.DataFrame()
+    if len(df) > 0:
+        try:
+            df.to_parquet(out_file, index=False)
+        except Exception as e:
+            # like a page that cannot be parsed, the files of the chunk are reported as failed
+            print('cannot write', out_file, e)
+            if os.path.isfile(out_file):
+                os.remove(out_file)
+            df, failed = pd.DataFrame(), list(chunk)
+    return {'part': out_file if len(df) > 0 else None, 'files': len(chunk), 'rows': len(df),
+            'bytes': sum(os.path.getsize(f) for f in chunk), 'failed': failed, 'seconds': time.time() - start}
+
+class IngestBar(Bar):
+    suffix = '%(percent)d%% %(files)d files %(mb_per_s).1f MB/s %(eta)ds'
+    files = 0
+    bytes = 0
+
+    @property
+    def mb_per_s(self):
+        return self.bytes / 2 ** 20 / max(self.elapsed, 1e-3)
+
+def ingest(files, parse, out_dir, workers=None):
+    # returns the written parts and the files that could not be parsed
+    workers = workers or os.cpu_count() or 1
+    os.makedirs(out_dir, exist_ok=True)
+    chunks = balanced_chunks(files, workers * CHUNKS_PER_WORKER)
+    start = time.time()
+    results = []
+    bar = IngestBar('Parsing', max=max(1, len(chunks)))
+    # the workers log their own parse_files stages, this one the whole ingest
+    with metrics.timer('ingest', files=len(files), chunks=len(chunks), workers=workers) as m:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(parse_chunk, parse, chunk, os.path.join(out_dir, 'part-%05d.parquet' % i))
+                       for i, chunk in enumerate(chunks)]
+            for future in as_completed(futures):
+                r = future.result()
+                results.append(r)
+                bar.files += r['files']
+                bar.bytes += r['bytes']
+                bar.next()
+        bar.finish()
+        total = sum(r['bytes'] for r in results)
+        failed = [f for r in results for f in r['failed']]
+        m.update(bytes=total, rows=sum(r['rows'] for r in results), failed=len(failed))
+    seconds = time.time() - start
+    print('Parsed %d files (%.1f MB, %d rows) with %d workers in %.1fs: %.0f files/s, %.1f MB/s, %d failed' %
+          (len(files), total / 2 ** 20, sum(r['rows'] for r in results), workers, seconds,
+           len(files) / max(seconds, 1e-3), total / 2 ** 20 / max(seconds, 1e-3), len(failed)))
+    return sorted(r['part'] for r in results if r['part']), failed
+
+def read_parts(parts):
+    frames = [pd.read_parquet(p) for p in parts]
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
@@ -0,0 +1,181 @@
+import functools
+import hashlib
+import inspect
+import os
+import pickle
+import types
+import pandas as pd
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+# caches the results of expensive analysis stages on disk, keyed by their content: a hash of the source
+# of the stage function (and of the functions and classes of this repository it uses, so a change to a
+# helper recomputes the stages that call it), of the DataFrame/Series arguments by content and of the other
+# arguments pickled. files=... adds the path, size and mtime of input files the stage reads itself.
+# results are pickled to MEMO_DIR/<key>.pkl, the least recently used are removed beyond MEMO_MAX_BYTES.
+# off unless MEMO_DIR is set or enable() was called. a hit does not repeat the side effects of the stage,
+# so stages must not modify their arguments, e.g. add columns to them (work on a copy).
+
+MEMO_MAX_BYTES = int(os.environ.get('MEMO_MAX_BYTES', 2 << 30))
+_dir = None
+
+def enable(directory='.memo'):
+    global _dir
+    _dir = directory
+
+def disable():
+    global _dir
+    _dir = None
+
+def memo_dir():
+    return _dir or os.environ.get('MEMO_DIR')
+
+def same_repo(obj, fn):
+    try:
+        return os.path.dirname(inspect.getfile(obj)) == os.path.dirname(inspect.getfile(fn))
+    except TypeError:
+        return False
+
+def code_digest(fn, seen=None):
+    # the source of fn and of the functions/classes of this repository it refers to, recursively
+    seen = set() if seen is None else seen
+    fn = inspect.unwrap(fn)
+    seen.add(fn)
+    try:
+        h = hashlib.sha1(inspect.getsource(fn).encode())
+    except (OSError, TypeError):
+        return getattr(fn, '__qualname__', repr(fn))
+    codes = [fn] if isinstance(fn, type) else [fn.__code__]
+    names = set()
+    while codes:
+        code = codes.pop()
+        if isinstance(code, type):
+            codes += [f.__code__ for f in vars(code).values() if isinstance(f, types.FunctionType)]
+            continue
+        names.update(code.co_names)
+        codes += [c for c in code.co_consts if isinstance(c, types.CodeType)]
+    scope = getattr(fn, '__globals__', None) or vars(inspect.getmodule(fn))
+    for name in sorted(names):
+        obj = scope.get(name)
+        # also functions behind decorators like functools.lru_cache or memo.stage
+        obj = inspect.unwrap(obj) if callable(obj) else obj
+        if isinstance(obj, (types.FunctionType, type)):
+            if obj not in seen and same_repo(obj, fn):
+                h.update(code_digest(obj, seen).encode())
+    return h.hexdigest()
+
+def column_digest(h, s):
+    # strings are hashed as arrow buffers, that is several times faster than pd.util.hash_pandas_object
+    h.update(('%s%d' % (s.dtype, len(s))).encode())
+    if isinstance(s.dtype, pd.CategoricalDtype):
+        column_digest(h, pd.Series(s.cat.categories))
+        h.update(s.cat.codes.to_numpy().tobytes())
+    elif isinstance(s.dtype, pd.api.extensions.ExtensionDtype) or s.dtype == object:
+        a = None
+        if pa is not None:
+            try:
+                a = pa.array(s)
+            except (TypeError, ValueError, pa.ArrowException):
+                pass
+        if a is None:
+            h.update(pd.util.hash_pandas_object(s, index=False).to_numpy().tobytes())
+            return
+        for chunk in a.chunks if isinstance(a, pa.ChunkedArray) else [a]:
+            h.update(('%s%d:%d' % (chunk.type, chunk.offset, len(chunk))).encode())
+            for b in chunk.buffers():
+                if b is not None:
+                    h.update(b)
+    else:
+        h.update(s.to_numpy().tobytes())
+
+def index_digest(h, index):
+    if isinstance(index, pd.RangeIndex):
+        h.update(repr(index).encode())
+    else:
+        for i in range(index.nlevels):
+            column_digest(h, pd.Series(index.get_level_values(i)))
+
+def value_digest(h, x):
+    if isinstance(x, pd.DataFrame):
+        h.update(('DataFrame%r' % list(x.columns)).encode())
+        for i in range(x.shape[1]):
+            column_digest(h, x.iloc[:, i])
+        index_digest(h, x.index)
+    elif isinstance(x, pd.Series):
+        h.update(('Series%r' % (x.name,)).encode())
+        column_digest(h, x)
+        index_digest(h, x.index)
+    elif isinstance(x, pd.Index):
+        h.update(b'Index')
+        index_digest(h, x)
+    elif isinstance(x, (list, tuple)):
+        h.update(('%s%d' % (type(x).__name__, len(x))).encode())
+        for v in x:
+            value_digest(h, v)
+    elif isinstance(x, dict):
+        h.update(b'dict')
+        for k, v in x.items():
+            value_digest(h, k)
+            value_digest(h, v)
+    elif callable(x):
+        h.update(code_digest(x).encode())
+    else:
+        h.update(pickle.dumps(x, protocol=pickle.HIGHEST_PROTOCOL))
+
+def files_digest(h, files):
+    for f in sorted(files):
+        st = os.stat(f)
+        h.update(('%s:%d:%d' % (f, st.st_size, st.st_mtime_ns)).encode())
+
+def evict(directory, max_bytes=None):
+    # removes the least recently used results until the rest fits
+    max_bytes = MEMO_MAX_BYTES if max_bytes is None else max_bytes
+    entries = []
+    for name in os.listdir(directory):
+        if name.endswith('.pkl'):
+            st = os.stat(os.path.join(directory, name))
+            entries.append((st.st_mtime, st.st_size, name))
+    total = sum(size for _, size, _ in entries)
+    for _, size, name in sorted(entries):
+        if total <= max_bytes:
+            break
+        os.remove(os.path.join(directory, name))
+        total -= size
+
+def stage(fn=None, files=None):
+    # decorator, files(*args, **kwargs) returns the input files of the stage
+    if fn is None:
+        return functools.partial(stage, files=files)
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        directory = memo_dir()
+        if not directory:
+            return fn(*args, **kwargs)
+        h = hashlib.sha1((fn.__module__ + '.' + fn.__qualname__).encode())
+        try:
+            h.update(code_digest(fn).encode())
+            value_digest(h, args)
+            value_digest(h, dict(sorted(kwargs.items())))
+            if files is not None:
+                files_digest(h, files(*args, **kwargs))
+        except (pickle.PicklingError, TypeError, AttributeError) as e:
+            print('memo: not caching', fn.__name__, e)
+            return fn(*args, **kwargs)
+        path = os.path.join(directory, '%s-%s.pkl' % (fn.__name__, h.hexdigest()))
+        if os.path.isfile(path):
+            with open(path, 'rb') as f:
+                result = pickle.load(f)
+            os.utime(path)
+            return result
+        result = fn(*args, **kwargs)
+        os.makedirs(directory, exist_ok=True)
+        tmp = path + '.tmp'
+        with open(tmp, 'wb') as f:
+            pickle.dump(result, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, path)
+        evict(directory)
+        return result
+    return wrapper
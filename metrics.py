@@ -0,0 +1,163 @@
+import atexit
+import collections
+import contextlib
+import json
+import os
+import sys
+import threading
+import time
+
+# instrumentation of the fetch, parse and mine stages, only the standard library so that the fetch tools
+# stay fast to import. off unless METRICS_FILE is set or enable() was called, then timer(stage, **fields)
+# times a block and writes one JSON line to METRICS_FILE with the seconds, the fields and per second rates
+# of the RATE_FIELDS, e.g. files and nodes per second of a parse. count(name) adds to a counter, the
+# totals of the counters are written when the outermost stage of a process ends and at exit, hit rates for
+# <name>.hit/<name>.miss pairs. every process appends to the same file, opened once per process and line
+# buffered, the lines have its pid.
+# PROFILE=cprofile runs the outermost stages under cProfile, PROFILE=sample samples the stacks of all
+# threads every PROFILE_INTERVAL seconds (collapsed stacks for flamegraph.pl/speedscope), both written to
+# PROFILE_DIR/<stage>-<pid>-<n>.prof/.folded.
+
+METRICS_FILE = os.environ.get('METRICS_FILE', '')
+PROFILE = os.environ.get('PROFILE', '')
+PROFILE_DIR = os.environ.get('PROFILE_DIR', 'profiles')
+PROFILE_INTERVAL = float(os.environ.get('PROFILE_INTERVAL', 0.01))
+RATE_FIELDS = ('items', 'files', 'nodes', 'rows', 'pages', 'bytes')
+
+_lock = threading.Lock()
+_depth = 0
+_profiles = 0
+_logged = None
+_file = None
+counters = collections.Counter()
+
+def enable(fname='metrics.jsonl'):
+    global METRICS_FILE
+    METRICS_FILE = fname
+
+def disable():
+    global METRICS_FILE
+    METRICS_FILE = ''
+
+def log(event, **fields):
+    global _file
+    if not METRICS_FILE:
+        return
+    line = json.dumps(dict(ts=round(time.time(), 3), pid=os.getpid(), event=event, **fields), default=str)
+    with _lock:
+        # reopened when METRICS_FILE was changed
+        if _file is None or _file.name != METRICS_FILE:
+            if _file is not None:
+                _file.close()
+            _file = open(METRICS_FILE, 'a', buffering=1)
+        _file.write(line + '\n')
+
+def count(name, n=1):
+    with _lock:
+        counters[name] += n
+
+def log_counters():
+    # totals so far, not again if nothing was counted since the last time
+    global _logged
+    with _lock:
+        values = dict(counters)
+        if not values or values == _logged:
+            return
+        _logged = values
+    rates = {name[:-4] + '.hit_rate': round(values[name] / (values[name] + values.get(name[:-4] + '.miss', 0)), 4)
+             for name in values if name.endswith('.hit')}
+    log('counters', **values, **rates)
+
+atexit.register(log_counters)
+
+def _reset():
+    # a forked worker (ingest.py) starts with its own counters, outside of the stages of its parent, and
+    # opens the file itself
+    global _depth, _lock, _logged, _file
+    _lock = threading.Lock()
+    _depth = 0
+    _logged = None
+    _file = None
+    counters.clear()
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset)
+
+class Sampler(threading.Thread):
+    # counts the stacks of all other threads every interval seconds
+    def __init__(self, interval=PROFILE_INTERVAL):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.stacks = collections.Counter()
+        self.done = threading.Event()
+
+    def run(self):
+        while not self.done.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == self.ident:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append('%s:%s' % (os.path.basename(code.co_filename), code.co_name))
+                    frame = frame.f_back
+                self.stacks[';'.join(reversed(stack))] += 1
+
+    def stop(self, fname):
+        self.done.set()
+        self.join()
+        with open(fname, 'w') as f:
+            for stack, n in self.stacks.most_common():
+                f.write('%s %d\n' % (stack, n))
+
+def start_profile():
+    if PROFILE == 'cprofile':
+        import cProfile
+        profiler = cProfile.Profile()
+        profiler.enable()
+        return profiler
+    if PROFILE == 'sample':
+        sampler = Sampler()
+        sampler.start()
+        return sampler
+    return None
+
+def stop_profile(profiler, stage):
+    global _profiles
+    _profiles += 1
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    name = os.path.join(PROFILE_DIR, '%s-%d-%d' % (stage, os.getpid(), _profiles))
+    if PROFILE == 'cprofile':
+        profiler.disable()
+        profiler.dump_stats(name + '.prof')
+    else:
+        profiler.stop(name + '.folded')
+
+@contextlib.contextmanager
+def timer(stage, **fields):
+    # yields the dict of fields, the block can add the ones it knows at the end (items, status, ...)
+    global _depth
+    with _lock:
+        _depth += 1
+        outermost = _depth == 1
+    # cProfile can only profile one stage at a time, nested stages are part of the outer profile
+    profiler = start_profile() if outermost and threading.current_thread() is threading.main_thread() else None
+    start = time.perf_counter()
+    try:
+        yield fields
+    except BaseException as e:
+        fields.setdefault('status', 'error')
+        fields.setdefault('error', repr(e))
+        raise
+    finally:
+        seconds = time.perf_counter() - start
+        if profiler is not None:
+            stop_profile(profiler, stage)
+        rates = {k + '_per_s': round(fields[k] / seconds, 2) for k in RATE_FIELDS
+                 if isinstance(fields.get(k), (int, float)) and seconds > 0}
+        log('stage', stage=stage, seconds=round(seconds, 6), **fields, **rates)
+        with _lock:
+            _depth -= 1
+            outermost = _depth == 0
+        if outermost:
+            log_counters()
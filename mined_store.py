@@ -0,0 +1,165 @@
+import contextlib
+import fcntl
+import gzip
+import os
+import re
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# loads the semicolon separated refminer outputs in mined/ into one frame.
+# files are read in parallel and concatenated once, commit and refactoringType are categorical.
+# mined.parquet is a directory of parquet parts that caches everything read so far, its manifest.csv
+# has the size, mtime and part of every file read (no part for files without rows). each load only reads
+# the csv files that are new or changed since and appends them as a new part, the rows of a file come from
+# its current part only.
+# parts no file refers to any more are removed. loads hold a lock (mined.parquet.lock), so the notebook
+# and miner.py can load at the same time.
+# the outputs may be gzipped (.csv.gz, MINED_SUFFIX for new ones), the code ranges the miner writes
+# next to them (<prid>-coderange.csv) are not mined files.
+
+MINED_CACHE = 'mined.parquet'
+MANIFEST = 'manifest.csv'
+MIN_SIZE = 100
+MINED_SUFFIXES = ('.csv', '.csv.gz')
+MINED_SUFFIX = os.environ.get('MINED_SUFFIX', '.csv')
+CODERANGE = '-coderange'
+
+MINED_SCHEMA = pa.schema([
+    ('commit', pa.dictionary(pa.int32(), pa.string())),
+    ('refactoringType', pa.dictionary(pa.int32(), pa.string())),
+    ('refactoringName', pa.string()),
+    ('classesBefore', pa.string()),
+    ('classesAfter', pa.string()),
+    ('description', pa.string()),
+    ('fname', pa.string()),
+    ('prid', pa.string()),
+])
+CATEGORICAL = ['commit', 'refactoringType']
+# the columns the miner writes
+CSV_COLUMNS = MINED_SCHEMA.names[:6]
+
+def prid_from_fname(fname):
+    return re.sub(r'\.csv(\.gz)?$', '', os.path.basename(fname))
+
+def is_mined_file(fname):
+    return fname.endswith(MINED_SUFFIXES) and not prid_from_fname(fname).endswith(CODERANGE)
+
+def mined_filenames(prids, listed, directory='mined'):
+    # the existing output of each prid in listed, whatever its suffix, else a new one with MINED_SUFFIX
+    base = directory + '/' + prids
+    fnames = base + MINED_SUFFIX
+    for suffix in MINED_SUFFIXES:
+        exists = (base + suffix).isin(listed)
+        fnames = fnames.where(~exists, base + suffix)
+    return fnames
+
+def read_mined_file(fname):
+    # header only, nothing mined. gzipped files are small anyway, they are checked after reading
+    if not fname.endswith('.gz') and os.path.getsize(fname) < MIN_SIZE:
+        return None
+    try:
+        x = pd.read_csv(fname, sep=';', dtype=str)
+    except (EOFError, gzip.BadGzipFile, zlib.error) as e:
+        # truncated by a killed miner, skipped instead of failing the whole load
+        print('skipping', fname, e)
+        return None
+    missing = [c for c in CSV_COLUMNS if c not in x.columns]
+    if missing:
+        print('skipping', fname, 'without', missing)
+        return None
+    if len(x) == 0:
+        return None
+    x = x[CSV_COLUMNS]
+    x['fname'] = fname
+    x['prid'] = prid_from_fname(fname)
+    return x
+
+def as_mined_frame(frames):
+    frames = [x for x in frames if x is not None]
+    if not frames:
+        return pd.DataFrame(columns=MINED_SCHEMA.names)
+    mined = pd.concat(frames, ignore_index=True)
+    for c in CATEGORICAL:
+        mined[c] = mined[c].astype('category')
+    return mined
+
+def read_mined_files(files, workers=8):
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return as_mined_frame(list(executor.map(read_mined_file, files)))
+
+@contextlib.contextmanager
+def locked(cache):
+    with open(cache + '.lock', 'a') as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+def read_manifest(cache=MINED_CACHE):
+    # fname -> size, mtime, part. a cache without one (older versions) counts as empty
+    path = os.path.join(cache, MANIFEST)
+    if not os.path.isfile(path):
+        return pd.DataFrame(columns=['size', 'mtime', 'part'], index=pd.Index([], name='fname'))
+    return pd.read_csv(path, dtype={'fname': str, 'part': str}).set_index('fname')
+
+def write_manifest(manifest, cache):
+    tmp = os.path.join(cache, '.' + MANIFEST)
+    manifest.reset_index().to_csv(tmp, index=False)
+    os.replace(tmp, os.path.join(cache, MANIFEST))
+
+def file_stats(files):
+    stats = [os.stat(f) for f in files]
+    return pd.DataFrame({'size': [st.st_size for st in stats], 'mtime': [st.st_mtime_ns for st in stats]},
+                        index=pd.Index(files, name='fname'))
+
+def append_to_cache(mined, cache=MINED_CACHE):
+    # returns the name of the new part
+    name = 'part-%d-%d.parquet' % (time.time_ns(), os.getpid())
+    tmp = os.path.join(cache, '.' + name)
+    pq.write_table(pa.Table.from_pandas(mined[MINED_SCHEMA.names], schema=MINED_SCHEMA, preserve_index=False), tmp)
+    os.replace(tmp, os.path.join(cache, name))
+    return name
+
+def remove_unused_parts(cache, parts):
+    # also the leftovers of interrupted loads, nobody else writes while the lock is held
+    for name in os.listdir(cache):
+        if name.endswith('.parquet') and name not in parts:
+            os.remove(os.path.join(cache, name))
+
+def read_cache(cache, manifest):
+    tables = [pq.read_table(os.path.join(cache, part), schema=MINED_SCHEMA, filters=[('fname', 'in', list(g.index))])
+              for part, g in manifest.groupby('part', sort=True)]
+    if not tables:
+        return as_mined_frame([])
+    mined = pa.concat_tables(tables).to_pandas()
+    for c in CATEGORICAL:
+        mined[c] = mined[c].cat.remove_unused_categories()
+    return mined
+
+def load_mined(files, cache=MINED_CACHE, workers=8):
+    # same rows as reading every file in files, but only files that are new or changed are parsed
+    files = list(dict.fromkeys(files))
+    os.makedirs(cache, exist_ok=True)
+    with locked(cache):
+        manifest = read_manifest(cache)
+        stats = file_stats(files)
+        old = manifest.reindex(stats.index)
+        todo = list(stats.index[(old['size'] != stats['size']) | (old['mtime'] != stats['mtime'])])
+        new = read_mined_files(todo, workers)
+        # changed files lose their old rows, also when they have none now. files without rows (header only,
+        # truncated) are recorded without a part, so they are only read again when they change
+        manifest = manifest[~manifest.index.isin(todo)]
+        entries = stats.loc[todo].assign(part=None)
+        if len(new) > 0:
+            part = append_to_cache(new, cache)
+            entries.loc[entries.index.isin(new['fname'].unique()), 'part'] = part
+        manifest = pd.concat([manifest, entries])
+        if len(todo) > 0 or not os.path.isfile(os.path.join(cache, MANIFEST)):
+            write_manifest(manifest, cache)
+            remove_unused_parts(cache, set(manifest['part']))
+        return read_cache(cache, manifest[manifest.index.isin(files)])
@@ -1,13 +1,18 @@
 import os
 from progress.bar import Bar
-import requests
 import pandas as pd
 import json
 import os.path
 import time
 import os
-import fetcher
 import re
+from classifier import MINER_RULES
+from test_pairs import find_test_pairs, DEFAULT_PATTERNS
+from scheduler import run_jobs, mining_command
+from mined_store import load_mined, is_mined_file, MINED_SUFFIX, MINED_SUFFIXES
+from page_reader import read_page_nodes, processor_fields, NODE_FIELDS
+from files import get_files, listed_files
+import metrics
 
 def get_project(x):
     mat=re.match(r'https://github.com/([^/]+/[^/]+).*',x)
@@ -15,58 +20,29 @@ def get_project(x):
         return mat.group(1)
     
     
+PR_URL_PATTERN = re.compile(r'(?P<repo>.*?github\.com/(?P<project>[^/]+/[^/]+))/pull/(?P<pull_req_id>[0-9]+)')
+
+def split_pr_urls(urls):
+    # repo_url, pull_req_id and prid for a series of PR urls in one vectorized pass. anything after the
+    # number (/files, a trailing /) is ignored. a url that is not a PR url is passed through like the
+    # string replacements before did: as repo_url and pull_req_id, with / replaced by _ as prid
+    parts = urls.str.extract(PR_URL_PATTERN)
+    matched = parts['pull_req_id'].notna()
+    return pd.DataFrame({'repo_url': (parts['repo'] + '.git').where(matched, urls),
+                         'pull_req_id': parts['pull_req_id'].where(matched, urls),
+                         'prid': (parts['project'].str.replace('/', '_', regex=False) + '_' + parts['pull_req_id'])
+                                 .where(matched, urls.str.replace('/', '_', regex=False))},
+                        index=urls.index)
+
 def extract_url(n):    
     return pd.DataFrame(data={'url':[n['url']]})
     
-def get_files(d):
-    return [d+'/' + x for x in os.listdir(d)]
-
 def is_testability_relevant(s):
-    if not isinstance(s, str):
-        return (False, None)
-    if '@Testable' in s:
-        return (False,'@Testable')
-    if 'VisibleForTesting' in s:
-        return (True, 'VisibleForTesting')
-    s=s.lower()
-    masks=['testability','testable','easier to test', 'simplify testing','cover']
-    for m in masks:
-        if m in s:
-            return (True, m)
-    ref_masks=['test','junit']
-    if 'refactor' in s:
-        for m in ref_masks:
-            if m in s:
-                return (True, 'refactor_' + m)
-    if 'add' in s:
-        for m in ref_masks:
-            if m in s:
-                return (True, 'add_' + m)
-    if 'fix' in s:
-        for m in ref_masks:
-            if m in s:
-                return (True, 'fix_' + m)
-    for m in ref_masks:
-        if m in s:
-            return (True, m)
-            
-    return (False, None)
-
-def get_prod_files(files):
-    java_files=dict([(f.split('/')[-1].replace('.java',''),f) for f in files if not 'Test.java' in f and f.endswith('.java')])
-    return java_files
-
-def get_test_files(files):
-    test_java_files=dict([(f.split('/')[-1].replace('Test.java',''),f) for f in files if 'Test.java' in f])
-    return test_java_files
-
-def calc_test_pairs(java_files, test_java_files):
-    return(dict([(java_files[t],test_java_files[t]) for t in test_java_files if t in java_files]))
+    return MINER_RULES.classify(s)
 
-def get_test_pairs(files):
-    java_files=get_prod_files(files)
-    test_java_files=get_test_files(files)
-    return calc_test_pairs(java_files, test_java_files)
+def get_test_pairs(files, patterns=DEFAULT_PATTERNS):
+    # FooTest, test_pairs.EXTENDED_PATTERNS also FooTests, FooIT and TestFoo
+    return find_test_pairs(files, patterns)
 
 def make_clickable(val):
     # target _blank to open new window
@@ -91,17 +67,21 @@ def process_node(n, items):
             n.update({'title_ok':title_ok})
             n.update({'fname':fname})
             items.append(n)
+
+process_node.fields = NODE_FIELDS
     
 def process_files(files, node_processor):
-    for fname in files:
-        js=json.loads(open(fname).read())
-        if not js.get('data').get('repository'):
-            continue
-        try:
-            for n in js.get('data',{}).get('repository',{}).get('pullRequests',{}).get('nodes',[]):
-                node_processor(n)
-        except Exception as e:
-            print(e, fname)
+    with metrics.timer('process_files', files=len(files)) as m:
+        nodes = 0
+        for fname in files:
+            try:
+                for n in read_page_nodes(fname, processor_fields(node_processor)):
+                    nodes += 1
+                    node_processor(n)
+            except Exception as e:
+                metrics.count('process_files.failed')
+                print(e, fname)
+        m['nodes'] = nodes
     
 if __name__ == '__main__':    
     files=get_files('cached')
@@ -119,39 +99,24 @@ if __name__ == '__main__':
     df['title_mask'] = df['title_ok'].apply(lambda x: x[1])
     df[['url','title','changedFiles','java_files','test_java_files','test_pairs','title_mask','body_mask']].to_csv('testable_prs.csv')
 
-    df['repo_url'] = df['url'].apply(lambda x: re.sub(pattern='(.*?)/pull/[0-9]+',string=x,repl='\\1.git'))
-    df['pull_req_id'] = df['url'].apply(lambda x: re.sub(pattern='.*?/pull/([0-9]+)',string=x,repl='\\1'))
-    df['prid'] = df['url'].apply(lambda x: re.sub(pattern='.*?github.com/(.*?)/pull',string=x,repl='\\1').replace('/','_'))
+    df[['repo_url','pull_req_id','prid']] = split_pr_urls(df['url'])
 
     def gen_mined_csv():
-        mined=pd.DataFrame()
-        for fname in get_files('mined'):
-            if os.path.getsize(fname) < 100:
-                continue
-            x=pd.read_csv(fname,sep=';')
-            x['fname']=fname
-            x['prid']=fname.replace('mined/','').replace('.csv','')
-            mined=mined.append(x)
-
+        mined=load_mined([f for f in get_files('mined') if is_mined_file(f)])
         m=df.merge(mined, on='prid')
         m.to_csv('mined.csv')
         return m
 
     print('Generate before: ', len(gen_mined_csv()))
 
-    bar=Bar('Mining', max=len(df), suffix='%(percent)d%% %(eta)s')
-    for i, row in df.sample(frac=1.0).iterrows():
-        fname='mined/' + row['prid']+'.csv'
-        if not (row['title_mask'] or row['body_mask']):
+    mined_already=listed_files('mined')
+    jobs=[]
+    for row in df.sample(frac=1.0).itertuples():
+        fname='mined/' + row.prid+MINED_SUFFIX
+        if not (row.title_mask or row.body_mask) or any('mined/' + row.prid+s in mined_already for s in MINED_SUFFIXES):
             continue
-
-        cmd='mvn com.github.anonauthor:refminer-mvn-plugin:refminer -DrefminerFilename=' + fname + ' -DgitURL=%s -DpullRequest=%s' % (row['repo_url'], row['pull_req_id'])
-        if not os.path.isfile(fname):
-            print(cmd)
-            ret=os.system(cmd)
-            if ret != 0:
-                print("Ended with " , ret)
-                break
-        bar.next()
+        jobs.append({'id':row.prid, 'output':fname,
+                     'cmd':mining_command(fname, row.repo_url, row.pull_req_id, 'com.github.anonauthor:refminer-mvn-plugin:refminer')})
+    run_jobs(jobs, workers=int(os.environ.get('MINING_WORKERS', 4)))
 
     print('Generate after: ', len(gen_mined_csv()))
@@ -0,0 +1,124 @@
+import contextlib
+import fcntl
+import os
+import re
+import shutil
+import subprocess
+import tempfile
+import time
+
+# local cache of bare mirrors of the mined repositories, keyed by repo_url.
+# a mirror is cloned once and then only fetched (incrementally) when it is older than max_age.
+# every mirror has a lock file: clone/fetch/eviction take it exclusively, mining and the check whether a
+# mirror is fresh hold it shared, so a mirror is never updated or evicted under a running miner and jobs
+# on the same fresh mirror run side by side. the lock file's mtime is the last use, eviction drops the
+# least recently used mirrors until the cache fits max_bytes (MIRROR_MAX_BYTES, 0 keeps all of them).
+
+MIRROR_DIR = os.environ.get('REFMINER_MIRRORS', 'mirrors')
+MAX_AGE = 24 * 3600
+MAX_BYTES = int(os.environ.get('MIRROR_MAX_BYTES', 50 << 30))
+
+def mirror_name(repo_url):
+    name = re.sub(r'^[a-z+]+://', '', repo_url).strip('/')
+    if not name.endswith('.git'):
+        name = name + '.git'
+    return re.sub(r'[^A-Za-z0-9._-]', '_', name)
+
+def mirror_path(repo_url, mirror_dir=MIRROR_DIR):
+    return os.path.join(mirror_dir, mirror_name(repo_url))
+
+@contextlib.contextmanager
+def locked(path, mode):
+    with open(path + '.lock', 'a') as f:
+        fcntl.flock(f, mode)
+        try:
+            yield f
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+def git(*args):
+    subprocess.run(['git'] + list(args), check=True, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+
+def stamp(path):
+    return os.path.join(path, 'FETCH_STAMP')
+
+def is_fresh(path, max_age):
+    return os.path.isfile(stamp(path)) and time.time() - os.path.getmtime(stamp(path)) <= max_age
+
+def evict_others(path, max_bytes, mirror_dir=MIRROR_DIR):
+    # under the shared lock of path, evict skips the mirror that was just ensured
+    with locked(path, fcntl.LOCK_SH):
+        return evict(max_bytes, mirror_dir)
+
+def ensure_mirror(repo_url, mirror_dir=MIRROR_DIR, max_age=MAX_AGE, max_bytes=MAX_BYTES):
+    # github mirrors include refs/pull/*/head, so pull requests can be mined from the mirror
+    os.makedirs(mirror_dir, exist_ok=True)
+    path = mirror_path(repo_url, mirror_dir)
+    # a fresh mirror only needs the shared lock, which the running miners hold too
+    with locked(path, fcntl.LOCK_SH):
+        fresh = is_fresh(path, max_age)
+        if fresh:
+            os.utime(path + '.lock')
+    if fresh:
+        if max_bytes:
+            evict_others(path, max_bytes, mirror_dir)
+        return path
+    with locked(path, fcntl.LOCK_EX):
+        if not os.path.isdir(path):
+            tmp = tempfile.mkdtemp(prefix='.tmp-', dir=mirror_dir)
+            try:
+                git('clone', '--mirror', '--quiet', repo_url, tmp)
+                os.rename(tmp, path)
+            finally:
+                shutil.rmtree(tmp, ignore_errors=True)
+            open(stamp(path), 'w').close()
+        elif not is_fresh(path, max_age):
+            git('--git-dir', path, 'fetch', '--prune', '--quiet', 'origin')
+            os.utime(stamp(path))
+        os.utime(path + '.lock')
+    if max_bytes:
+        evict_others(path, max_bytes, mirror_dir)
+    return path
+
+@contextlib.contextmanager
+def use_mirrors(repo_urls, mirror_dir=MIRROR_DIR, max_age=MAX_AGE, max_bytes=MAX_BYTES):
+    # yields {repo_url: mirror path} and keeps the mirrors from being updated or evicted meanwhile
+    with contextlib.ExitStack() as stack:
+        paths = dict()
+        for url in dict.fromkeys(repo_urls):
+            while True:
+                path = ensure_mirror(url, mirror_dir, max_age, max_bytes)
+                lock = stack.enter_context(contextlib.ExitStack())
+                lock.enter_context(locked(path, fcntl.LOCK_SH))
+                if os.path.isdir(path):
+                    break
+                # evicted between ensure_mirror and taking the shared lock
+                lock.close()
+            paths[url] = os.path.abspath(path)
+        yield paths
+
+def dir_size(path):
+    return sum(os.path.getsize(os.path.join(d, f)) for d, _, files in os.walk(path) for f in files)
+
+def evict(max_bytes, mirror_dir=MIRROR_DIR):
+    mirrors = [os.path.join(mirror_dir, d) for d in os.listdir(mirror_dir)
+               if d.endswith('.git') and os.path.isdir(os.path.join(mirror_dir, d))]
+    sizes = {m: dir_size(m) for m in mirrors}
+    total = sum(sizes.values())
+    evicted = []
+    for m in sorted(mirrors, key=lambda m: os.path.getmtime(m + '.lock') if os.path.isfile(m + '.lock') else 0):
+        if total <= max_bytes:
+            break
+        with open(m + '.lock', 'a') as f:
+            try:
+                fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                # in use
+                continue
+            try:
+                shutil.rmtree(m)
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+        total -= sizes[m]
+        evicted.append(m)
+    return evicted
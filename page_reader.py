@@ -0,0 +1,85 @@
+import functools
+import json
+import os
+
+# reads the PR nodes of a cached GraphQL page (data.repository.pullRequests.nodes).
+# with ijson installed a page can be parsed as a stream of events: the nodes are yielded one by one and
+# only their fields in `fields` are built, so the object tree of the whole page never exists in memory.
+# that is ~3x slower than json.load, by default only pages of at least STREAM_MIN_BYTES are streamed: the
+# cached pages of ~500KB take a few MB with json.load, a 17MB page ~70MB against <1MB streamed.
+# like before, a page with errors or without repository has no nodes: streaming notices errors only at
+# the end of the page, after the nodes have been yielded, and raises PageError then.
+
+try:
+    import ijson
+    from ijson.common import ObjectBuilder
+except ImportError:
+    ijson = None
+
+NODES_PREFIX = 'data.repository.pullRequests.nodes.item'
+# fields used by utils.nodeProcessor and miner.process_node, they declare them as their fields attribute
+NODE_FIELDS = ('url', 'number', 'title', 'state', 'bodyText', 'changedFiles', 'files')
+STREAM_MIN_BYTES = int(os.environ.get('PAGE_STREAM_MIN_BYTES', 8 << 20))
+
+class PageError(Exception):
+    pass
+
+def trim(node, fields):
+    return node if fields is None else {k: v for k, v in node.items() if k in fields}
+
+def json_nodes(f, fields):
+    js = json.load(f)
+    repository = (js.get('data') or {}).get('repository')
+    if not repository or js.get('errors'):
+        return []
+    return [trim(n, fields) for n in (repository.get('pullRequests') or {}).get('nodes') or []]
+
+def streamed_nodes(f, fields):
+    node = None
+    key = None
+    builder = None
+    errors = False
+    for prefix, event, value in ijson.parse(f, use_float=True):
+        if prefix == NODES_PREFIX:
+            if builder is not None:
+                node[key] = builder.value
+                builder = None
+            if event == 'start_map':
+                node = dict()
+            elif event == 'end_map':
+                yield node
+            elif event == 'map_key':
+                key = value
+                if fields is None or key in fields:
+                    builder = ObjectBuilder()
+        elif builder is not None:
+            builder.event(event, value)
+        elif prefix == 'errors.item':
+            errors = True
+    if errors:
+        raise PageError('errors in page')
+
+def should_stream(fname, streaming):
+    if ijson is None or streaming is False:
+        return False
+    return streaming or os.path.getsize(fname) >= STREAM_MIN_BYTES
+
+def processor_fields(fnproc):
+    # the fields a node processor declares in fnproc.fields (also behind functools.partial), None: the whole node
+    while isinstance(fnproc, functools.partial):
+        fnproc = fnproc.func
+    return getattr(fnproc, 'fields', None)
+
+def iter_page_nodes(fname, fields=None, streaming=None):
+    # streaming=None streams large pages only, True/False always/never. fields=None reads whole nodes
+    with open(fname, 'rb') as f:
+        if should_stream(fname, streaming):
+            yield from streamed_nodes(f, fields)
+        else:
+            yield from json_nodes(f, fields)
+
+def read_page_nodes(fname, fields=None, streaming=None):
+    try:
+        return list(iter_page_nodes(fname, fields, streaming))
+    except PageError:
+        return []
@@ -0,0 +1,90 @@
+import numpy as np
+import pandas as pd
+import matplotlib.pyplot as plt
+import seaborn as sns
+from utils import means_cis, ref_counts, as_title, as_title_sig
+
+# the charts of the analysis. separate from utils.py so that matplotlib and seaborn are only imported
+# when a chart is drawn, utils.plot_* still works and imports this module on first use.
+
+def ci_pointplot(cis, x, y, hue, order, hue_labels, dodge=0.2, markers=('o','x'), capsize=4):
+    # sns.pointplot without lines of precomputed means and CIs: cis has a row per (category, hue level)
+    # with mean, ci_low and ci_high. x or y is 'mean', the other one the category column.
+    # hue_labels maps the hue levels, in drawing order, to their legend labels
+    ax=plt.gca()
+    vertical=x!='mean'
+    cat=x if vertical else y
+    pos={k: i for i, k in enumerate(order)}
+    offsets=np.linspace(-dodge/2, dodge/2, len(hue_labels)) if dodge else np.zeros(len(hue_labels))
+    colors=sns.color_palette(n_colors=len(hue_labels))
+    for (level, label), offset, marker, color in zip(hue_labels.items(), offsets, markers, colors):
+        sel=cis[(cis[hue]==level) & cis[cat].isin(pos)]
+        at=sel[cat].map(pos).to_numpy()+offset
+        err=[sel['mean']-sel['ci_low'], sel['ci_high']-sel['mean']]
+        if vertical:
+            ax.errorbar(at, sel['mean'], yerr=err, fmt=marker, color=color, label=label, capsize=capsize)
+        else:
+            ax.errorbar(sel['mean'], at, xerr=err, fmt=marker, color=color, label=label, capsize=capsize)
+    ticks=(ax.set_xticks, ax.set_xlim) if vertical else (ax.set_yticks, ax.set_ylim)
+    ticks[0](range(len(order)), list(order))
+    # the first category on top like seaborn
+    ticks[1]((-.5, len(order)-.5) if vertical else (len(order)-.5, -.5))
+    ax.set_xlabel(x)
+    ax.set_ylabel(y)
+    return ax
+
+def plot_means(means):
+    melted=pd.melt(means[['refactoringType','without_test_pairs','with_test_pairs','ratio']], id_vars=['refactoringType','ratio'])
+    plt.figure(figsize=(16, 6))
+    sns.stripplot(data=melted, x='refactoringType',y='value',hue='variable',order=means.sort_values('ratio',ascending=False)['refactoringType'].drop_duplicates())
+    plt.xticks(rotation=90)
+    plt.ylabel('Frequency per PR')
+    plt.xlabel('RefactoringMiner pattern')
+    return means
+
+def old_plot_ci_means(mined, means, leg_title):
+    cis=means_cis(mined, means)
+    plt.figure(figsize=(16, 6))
+    ax = ci_pointplot(cis, x="refactoringType", y="mean", hue="with_tpairs",
+                   order=means.sort_values('ratio',ascending=False)['refactoringType'],
+                   hue_labels={False: 'False', True: 'True'}, dodge=0.05)
+    plt.legend(title=leg_title, loc='upper left')
+    plt.xticks(rotation=90)
+    plt.ylabel('Frequency per PR')
+    plt.xlabel('RefactoringMiner pattern')
+    return ax
+
+def plot_ci_means(mined, means, leg_title):
+    cis=means_cis(mined, means)
+    means['refactoringTitle']=means['refactoringType'].apply(as_title)
+    cis['variableTitle']=cis['refactoringType'].apply(as_title)
+    plt.figure(figsize=(5, 8))
+    ax = ci_pointplot(cis, x="mean", y="variableTitle", hue="with_tpairs",
+                   order=means.sort_values('ratio',ascending=False)['refactoringTitle'],
+                   hue_labels={False: 'False', True: 'True'}, dodge=0.2)
+    plt.legend(title=leg_title, loc='upper right')
+    plt.xticks(rotation=0)
+    plt.xlabel('Frequency per PR')
+    plt.ylabel('')
+    return ax
+
+def plot_ci_generic_means(mined, means, pos_title, neg_title):
+    counts=ref_counts(mined)
+    n1=counts.n_urls(True)
+    n2=counts.n_urls(False)
+    cis=means_cis(mined, means, counts)
+    means['refactoringTitle']=means['refactoringType'].apply(as_title)
+    means['refactoringTitleSig']=means[['significance','refactoringType']].apply(as_title_sig, axis=1)
+
+    cis['variableTitle']=cis['refactoringType'].apply(as_title)
+    plt.figure(figsize=(5, 12))
+    cis=cis.merge(means[['refactoringTitle','refactoringTitleSig']].drop_duplicates(), left_on='variableTitle',right_on='refactoringTitle')
+
+    ax = ci_pointplot(cis, x="mean", y="refactoringTitleSig", hue="with_tpairs",
+                   order=means.sort_values('ratio',ascending=False)['refactoringTitleSig'],
+                   hue_labels={True: pos_title+' (N=' + str(n1) + ')', False: neg_title + ' (N=' + str(n2) + ')'}, dodge=0.2)
+    plt.legend(loc='best',bbox_to_anchor=(0.5, 0.78))
+    plt.xticks(rotation=0)
+    plt.xlabel('Frequency per PR')
+    plt.ylabel('')
+    return ax
@@ -0,0 +1,186 @@
+import json
+import os
+import re
+import time
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+from miner import get_files, get_project
+
+# columnar copy of the cached/ GraphQL pages: one table of PRs and a child table of changed files,
+# both parquet, hive-partitioned by project. every row has the batch that ingested it. manifest.csv
+# lists every ingested cache file with its size, mtime and batch, and it is the commit: it is replaced
+# only after both tables of a batch are written, and readers only see the rows of a file's current
+# batch. a cache file rewritten in place (file_fetcher, refresh) is ingested again, its old rows
+# disappear. parts no manifest entry refers to any more are removed. one writer at a time.
+
+STORE_DIR = 'pr_store'
+MANIFEST = 'manifest.csv'
+
+PR_SCHEMA = pa.schema([
+    ('project', pa.string()),
+    ('fname', pa.string()),
+    ('url', pa.string()),
+    ('number', pa.int64()),
+    ('title', pa.string()),
+    ('state', pa.string()),
+    ('id', pa.string()),
+    ('bodyText', pa.string()),
+    ('changedFiles', pa.int64()),
+    ('files_total', pa.int64()),
+    ('labels', pa.string()),
+    ('batch', pa.string()),
+])
+
+FILE_SCHEMA = pa.schema([
+    ('project', pa.string()),
+    ('fname', pa.string()),
+    ('url', pa.string()),
+    ('path', pa.string()),
+    ('additions', pa.int64()),
+    ('deletions', pa.int64()),
+    ('batch', pa.string()),
+])
+
+def table_dir(store_dir, table):
+    return os.path.join(store_dir, table)
+
+def open_table(store_dir, table):
+    path = table_dir(store_dir, table)
+    if not os.path.isdir(path):
+        return None
+    schema = PR_SCHEMA if table == 'prs' else FILE_SCHEMA
+    return ds.dataset(path, schema=schema, format='parquet', partitioning='hive')
+
+def manifest_path(store_dir):
+    return os.path.join(store_dir, MANIFEST)
+
+def read_manifest(store_dir=STORE_DIR):
+    # fname -> size, mtime, batch. a store without one (older versions) counts as empty
+    path = manifest_path(store_dir)
+    if not os.path.isfile(path):
+        return pd.DataFrame(columns=['size', 'mtime', 'batch'], index=pd.Index([], name='fname'))
+    return pd.read_csv(path, dtype={'fname': str, 'batch': str}).set_index('fname')
+
+def write_manifest(manifest, store_dir):
+    tmp = manifest_path(store_dir) + '.tmp'
+    manifest.reset_index().to_csv(tmp, index=False)
+    os.replace(tmp, manifest_path(store_dir))
+
+def load_table(store_dir, table, columns=None, projects=None):
+    dataset = open_table(store_dir, table)
+    if dataset is None:
+        return pd.DataFrame(columns=columns or [])
+    manifest = read_manifest(store_dir)
+    flt = ds.field('batch').isin(list(manifest['batch'].unique()))
+    if projects is not None:
+        flt = flt & ds.field('project').isin(list(projects))
+    keys = [c for c in ('fname', 'batch') if columns is not None and c not in columns]
+    df = dataset.to_table(columns=columns + keys if columns is not None else None, filter=flt).to_pandas()
+    # rows of the current batch of their file only
+    current = df['batch'].to_numpy(dtype=object) == manifest['batch'].reindex(df['fname']).to_numpy(dtype=object, na_value=None)
+    return df[current].drop(columns=keys).reset_index(drop=True)
+
+def load_prs(columns=None, projects=None, store_dir=STORE_DIR):
+    return load_table(store_dir, 'prs', columns, projects)
+
+def load_files(columns=None, projects=None, store_dir=STORE_DIR):
+    return load_table(store_dir, 'files', columns, projects)
+
+def ingested_files(store_dir=STORE_DIR):
+    return set(read_manifest(store_dir).index)
+
+def read_page(fname):
+    with open(fname) as f:
+        js = json.load(f)
+    repository = (js.get('data') or {}).get('repository')
+    if not repository or js.get('errors'):
+        return []
+    return (repository.get('pullRequests') or {}).get('nodes') or []
+
+def page_rows(fname, prs, files, batch):
+    for n in read_page(fname):
+        project = get_project(n['url'])
+        fs = n.get('files') or {}
+        prs.append({'project': project,
+                    'fname': fname,
+                    'url': n['url'],
+                    'number': n.get('number'),
+                    'title': n.get('title'),
+                    'state': n.get('state'),
+                    'id': n.get('id'),
+                    'bodyText': n.get('bodyText'),
+                    'changedFiles': n.get('changedFiles'),
+                    'files_total': fs.get('totalCount'),
+                    'labels': ','.join(l['name'] for l in (n.get('labels') or {}).get('nodes') or []),
+                    'batch': batch})
+        for f in fs.get('nodes') or []:
+            files.append({'project': project,
+                          'fname': fname,
+                          'url': n['url'],
+                          'path': f.get('path'),
+                          'additions': f.get('additions'),
+                          'deletions': f.get('deletions'),
+                          'batch': batch})
+
+def write_table(rows, schema, store_dir, table, run_id):
+    if not rows:
+        return
+    ds.write_dataset(pa.Table.from_pylist(rows, schema=schema), table_dir(store_dir, table),
+                     format='parquet', partitioning=['project'], partitioning_flavor='hive',
+                     basename_template='part-' + run_id + '-{i}.parquet',
+                     existing_data_behavior='overwrite_or_ignore')
+
+def part_batch(name):
+    mat = re.match(r'part-(\d+-\d+)-\d+\.parquet$', name)
+    return mat.group(1) if mat else None
+
+def remove_unused_parts(store_dir, batches):
+    for table in ('prs', 'files'):
+        for d, _, names in os.walk(table_dir(store_dir, table)):
+            for name in names:
+                if part_batch(name) not in batches:
+                    os.remove(os.path.join(d, name))
+
+def ingest_cache(cache_dir='cached', store_dir=STORE_DIR, batch_size=2000):
+    # ingests new and changed cache files, returns how many
+    manifest = read_manifest(store_dir)
+    stats = {f: os.stat(f) for f in get_files(cache_dir) if f.endswith('.json')}
+    current = pd.DataFrame({'size': [st.st_size for st in stats.values()], 'mtime': [st.st_mtime_ns for st in stats.values()]},
+                           index=pd.Index(list(stats), name='fname'))
+    # deleted cache files lose their rows
+    manifest = manifest[manifest.index.isin(current.index)]
+    old = manifest.reindex(current.index)
+    todo = sorted(current.index[(old['size'] != current['size']) | (old['mtime'] != current['mtime'])])
+    run_id = str(int(time.time() * 1000))
+    os.makedirs(store_dir, exist_ok=True)
+    for start in range(0, len(todo), batch_size):
+        prs, files = [], []
+        batch_id = run_id + '-' + str(start // batch_size)
+        chunk = todo[start:start + batch_size]
+        for fname in chunk:
+            try:
+                page_rows(fname, prs, files, batch_id)
+            except Exception as e:
+                print(fname, e)
+        write_table(prs, PR_SCHEMA, store_dir, 'prs', batch_id)
+        write_table(files, FILE_SCHEMA, store_dir, 'files', batch_id)
+        new = current.loc[chunk].assign(batch=batch_id)
+        manifest = pd.concat([manifest[~manifest.index.isin(chunk)], new])
+        write_manifest(manifest, store_dir)
+    write_manifest(manifest, store_dir)
+    remove_unused_parts(store_dir, set(manifest['batch']))
+    return len(todo)
+
+def iter_nodes(store_dir=STORE_DIR, projects=None):
+    # rebuilds (fname, node) pairs shaped like the GraphQL nodes for the node processors in utils
+    prs = load_prs(['fname', 'url', 'title', 'bodyText', 'changedFiles'], projects, store_dir)
+    files = load_files(['url', 'path', 'additions', 'deletions'], projects, store_dir)
+    by_url = {url: g[['path', 'additions', 'deletions']].to_dict('records') for url, g in files.groupby('url', sort=False)}
+    for row in prs.itertuples(index=False):
+        nodes = by_url.get(row.url, [])
+        yield row.fname, {'url': row.url, 'title': row.title, 'bodyText': row.bodyText,
+                          'changedFiles': row.changedFiles, 'files': {'nodes': nodes} if nodes else None}
+
+if __name__ == '__main__':
+    print('Ingested', ingest_cache(), 'files into', STORE_DIR)
@@ -0,0 +1,75 @@
+import hashlib
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+
+# the refactorings per PR and refactoringType of a mined frame, a sparse urls x types count matrix for
+# each value of with_test_pairs with the urls and types as index maps. get_refs_per_url, agg_data and
+# the statistics of calc_means_and_counts_by_ref_type read them instead of building a crosstab each time.
+# the counts are cached by a hash of the columns they are built from (COLUMNS): a frame that changed
+# gets new counts, the same or an equal frame reuses them. the last CACHE_SIZE frames are kept.
+
+COLUMNS = ['url', 'refactoringType', 'with_test_pairs']
+CACHE_SIZE = 4
+_cache = OrderedDict()
+
+class RefCounts:
+    def __init__(self, mined):
+        from scipy import sparse
+        self.counts = dict()
+        self.urls = dict()
+        self.types = dict()
+        for flag in (True, False):
+            # the rows of utils.filter_mined, without missing url or type like pd.crosstab
+            sel = mined.loc[mined['with_test_pairs'] == flag, ['url', 'refactoringType']]
+            keep = (sel['url'].notna() & sel['refactoringType'].notna()).to_numpy()
+            rows, urls = pd.factorize(sel['url'][keep], sort=True)
+            cols, types = pd.factorize(sel['refactoringType'][keep], sort=True)
+            self.counts[flag] = sparse.csr_matrix((np.ones(len(rows), dtype=np.int64), (rows, cols)),
+                                                  shape=(len(urls), len(types)))
+            self.urls[flag] = pd.Index(np.asarray(urls, dtype=object), dtype=object, name='url')
+            self.types[flag] = pd.Index(np.asarray(types, dtype=object), dtype=object, name='refactoringType')
+        # utils.ref_type_cis of these counts
+        self.cis = None
+
+    def n_urls(self, flag):
+        return len(self.urls[flag])
+
+    def frame(self, flag):
+        # same as pd.crosstab(url, refactoringType) of the rows
+        return pd.DataFrame(self.counts[flag].toarray(), index=self.urls[flag], columns=self.types[flag])
+
+    def sums(self, flag):
+        return pd.Series(np.asarray(self.counts[flag].sum(axis=0)).ravel(), index=self.types[flag])
+
+    def means(self, flag):
+        # refactorings of a type per PR, PRs without it count 0
+        return self.sums(flag) / self.n_urls(flag)
+
+    def melted(self):
+        # url, with_tpairs, refactoringType, value: one row per PR and type of its group, like the
+        # pd.melt of both get_refs_per_url frames the plots used
+        frames = []
+        for flag in (True, False):
+            n, m = self.counts[flag].shape
+            frames.append(pd.DataFrame({'url': np.repeat(self.urls[flag].to_numpy(), m), 'with_tpairs': flag,
+                                        'refactoringType': np.tile(self.types[flag].to_numpy(), n),
+                                        'value': self.counts[flag].toarray().ravel()}))
+        return pd.concat(frames, ignore_index=True)
+
+def fingerprint(mined):
+    h = hashlib.sha1()
+    for c in COLUMNS:
+        h.update(pd.util.hash_pandas_object(mined[c], index=False).to_numpy().tobytes())
+    return h.hexdigest()
+
+def ref_counts(mined):
+    key = fingerprint(mined)
+    if key in _cache:
+        _cache.move_to_end(key)
+        return _cache[key]
+    counts = RefCounts(mined)
+    _cache[key] = counts
+    while len(_cache) > CACHE_SIZE:
+        _cache.popitem(last=False)
+    return counts
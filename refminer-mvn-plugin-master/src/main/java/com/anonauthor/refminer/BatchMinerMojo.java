@@ -0,0 +1,141 @@
+package com.anonauthor.refminer;
+
+import java.io.File;
+import java.io.Reader;
+import java.nio.file.Files;
+import java.nio.file.Path;
+import java.nio.file.Paths;
+import java.nio.file.StandardCopyOption;
+import java.util.ArrayList;
+import java.util.LinkedHashMap;
+import java.util.List;
+import java.util.Map;
+
+import org.apache.commons.csv.CSVFormat;
+import org.apache.commons.csv.CSVRecord;
+import org.apache.maven.plugin.AbstractMojo;
+import org.apache.maven.plugin.MojoExecutionException;
+import org.apache.maven.plugins.annotations.LifecyclePhase;
+import org.apache.maven.plugins.annotations.Mojo;
+import org.apache.maven.plugins.annotations.Parameter;
+import org.apache.maven.plugins.annotations.ResolutionScope;
+import org.eclipse.jgit.api.Git;
+import org.eclipse.jgit.lib.Repository;
+import org.refactoringminer.api.GitHistoryRefactoringMiner;
+import org.refactoringminer.api.RefactoringHandler;
+import org.refactoringminer.rm1.GitHistoryRefactoringMinerImpl;
+
+import me.tongfei.progressbar.ProgressBar;
+
+/*
+ * Mines many pull requests in one JVM with one miner instance.
+ *
+ * batchFile is a CSV with the columns repo_url,pull_req_id,refminerFilename and optionally
+ * local_repo, a local mirror of repo_url with refs/pull/N/head. Pull requests of the same
+ * repository are mined one after another from one opened mirror, a pull request whose
+ * refminerFilename already exists is skipped so that a batch can be restarted.
+ *
+ */
+
+@Mojo(name = "batchminer", requiresProject=false, defaultPhase = LifecyclePhase.NONE, requiresDependencyResolution = ResolutionScope.NONE)
+public class BatchMinerMojo extends AbstractMojo {
+
+	@Parameter( property = "batchFile", required = true)
+	private String batchFile;
+
+	// empty: next to batchFile, so that batches running at the same time write their own
+	@Parameter( property = "codeRangeFilename", defaultValue = "")
+	private String codeRangeFilename;
+
+	@Parameter( property = "timeout", defaultValue = "600")
+	private int timeout;
+
+	@Parameter( property = "branch", defaultValue = "master")
+	private String branch;
+
+	public void execute() throws MojoExecutionException {
+		Map<String, List<CSVRecord>> byRepo = readBatch();
+		int total = byRepo.values().stream().mapToInt(List::size).sum();
+		getLog().info("Mining " + total + " pull requests of " + byRepo.size() + " repositories from " + batchFile);
+
+		GitHistoryRefactoringMiner miner = new GitHistoryRefactoringMinerImpl(org.refactoringminer.rm1.PRBasedMiner::new);
+		GitHistoryRefactoringMiner localMiner = new GitHistoryRefactoringMinerImpl();
+		int failed = 0;
+		String codeRanges = codeRangeFilename == null || codeRangeFilename.trim().isEmpty()
+				? CommitMinerMojo.codeRangeFilename(batchFile) : codeRangeFilename;
+		try (CSVReporter codeRangeReporter = CommitMinerMojo.createCodeRangeReporter(codeRanges);
+				ProgressBar progressBar = new ProgressBar("pull requests", total)) {
+			for (Map.Entry<String, List<CSVRecord>> repo : byRepo.entrySet()) {
+				Repository repository = openLocalRepo(repo.getValue().get(0));
+				try {
+					for (CSVRecord row : repo.getValue()) {
+						if (!minePullRequest(repository == null ? miner : localMiner, repo.getKey(), repository, row, codeRangeReporter)) {
+							failed++;
+						}
+						progressBar.step();
+					}
+				} finally {
+					if (repository != null) {
+						repository.close();
+					}
+				}
+			}
+		}
+		getLog().info("Mined " + (total - failed) + " of " + total + " pull requests");
+		if (failed > 0) {
+			throw new MojoExecutionException(failed + " pull requests failed");
+		}
+	}
+
+	private Map<String, List<CSVRecord>> readBatch() throws MojoExecutionException {
+		Map<String, List<CSVRecord>> byRepo = new LinkedHashMap<>();
+		try (Reader reader = Files.newBufferedReader(Paths.get(batchFile))) {
+			for (CSVRecord row : CSVFormat.DEFAULT.withFirstRecordAsHeader().parse(reader)) {
+				byRepo.computeIfAbsent(row.get("repo_url"), k -> new ArrayList<>()).add(row);
+			}
+		} catch (Exception e) {
+			throw new MojoExecutionException("Can't read " + batchFile, e);
+		}
+		return byRepo;
+	}
+
+	private Repository openLocalRepo(CSVRecord row) throws MojoExecutionException {
+		if (!row.isMapped("local_repo") || row.get("local_repo").trim().isEmpty()) {
+			return null;
+		}
+		try {
+			return Git.open(new File(row.get("local_repo"))).getRepository();
+		} catch (Exception e) {
+			throw new MojoExecutionException("Can't open " + row.get("local_repo"), e);
+		}
+	}
+
+	private boolean minePullRequest(GitHistoryRefactoringMiner miner, String gitURL, Repository repository,
+			CSVRecord row, CSVReporter codeRangeReporter) {
+		Path target = Paths.get(row.get("refminerFilename"));
+		if (Files.exists(target)) {
+			return true;
+		}
+		// written under a temporary name, a file in place always means a finished pull request.
+		// gzipped like the target, the temporary name does not end in .gz
+		Path tmp = Paths.get(target + ".tmp");
+		try {
+			try (CSVReporter mainReporter = CommitMinerMojo.createMainReporter(tmp.toString(), target.toString().endsWith(".gz"));
+					ProgressBar commits = new ProgressBar("commits", 1)) {
+				RefactoringHandler handler = CommitMinerMojo.reportingHandler(mainReporter, codeRangeReporter, commits, getLog());
+				int pullRequest = Integer.valueOf(row.get("pull_req_id"));
+				if (repository != null) {
+					CommitMinerMojo.minePullRequestLocally(miner, repository, pullRequest, branch, handler);
+				} else {
+					miner.detectAtPullRequest(gitURL, pullRequest, handler, timeout);
+				}
+			}
+			Files.move(tmp, target, StandardCopyOption.ATOMIC_MOVE);
+			return true;
+		} catch (Exception e) {
+			getLog().error("Can't mine " + gitURL + " #" + row.get("pull_req_id") + " due to " + e.getMessage(), e);
+			new File(tmp.toString()).delete();
+			return false;
+		}
+	}
+}
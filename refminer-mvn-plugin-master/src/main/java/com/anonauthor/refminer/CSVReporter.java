@@ -1,22 +1,37 @@
 package com.anonauthor.refminer;
 
+import java.io.BufferedWriter;
 import java.io.IOException;
+import java.io.OutputStreamWriter;
+import java.io.Writer;
+import java.nio.charset.StandardCharsets;
 import java.nio.file.Files;
+import java.nio.file.Path;
 import java.nio.file.Paths;
+import java.util.List;
+import java.util.zip.GZIPOutputStream;
 
 import org.apache.commons.csv.CSVFormat;
 import org.apache.commons.csv.CSVPrinter;
 
 /**
  * Wrapper for final CSVPrinter (that's why people need Powermock!).
+ * A file name ending in .gz is written gzipped. writeAll writes many records
+ * under one lock, e.g. all refactorings of a commit.
  * 
  */
 public class CSVReporter implements AutoCloseable {
 
+	static final int BUFFER_SIZE = 1 << 16;
+
 	private CSVPrinter csvPrinter;
 
 	public CSVReporter(String fname, String... fields) throws IOException {
-		this(new CSVPrinter(Files.newBufferedWriter(Paths.get(fname)),
+		this(fname, fname.endsWith(".gz"), fields);
+	}
+
+	public CSVReporter(String fname, boolean gzip, String... fields) throws IOException {
+		this(new CSVPrinter(openWriter(Paths.get(fname), gzip),
 				CSVFormat.DEFAULT.withHeader(fields).withSystemRecordSeparator().withDelimiter(';')));
 	}
 
@@ -24,6 +39,24 @@ public class CSVReporter implements AutoCloseable {
 		this.csvPrinter = csvPrinter;
 	}
 
+	static Writer openWriter(Path path, boolean gzip) throws IOException {
+		if (!gzip) {
+			return Files.newBufferedWriter(path);
+		}
+		return new BufferedWriter(new OutputStreamWriter(
+				new GZIPOutputStream(Files.newOutputStream(path), BUFFER_SIZE), StandardCharsets.UTF_8), BUFFER_SIZE);
+	}
+
+	public synchronized void writeAll(List<Object[]> records) {
+		try {
+			for (Object[] values : records) {
+				csvPrinter.printRecord(values);
+			}
+		} catch (IOException e) {
+			throw new IllegalArgumentException(e.getMessage(), e);
+		}
+	}
+
 	public synchronized void writeArray(Object[] values) {
 		try {
 			csvPrinter.printRecord(values);
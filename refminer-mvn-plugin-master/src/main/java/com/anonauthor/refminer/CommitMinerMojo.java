@@ -1,11 +1,18 @@
 package com.anonauthor.refminer;
 
 import java.io.File;
+import java.io.IOException;
+import java.nio.file.Files;
+import java.nio.file.Path;
+import java.nio.file.Paths;
+import java.nio.file.StandardCopyOption;
+import java.util.ArrayList;
 import java.util.List;
 import java.util.stream.Collectors;
 
 import org.apache.maven.plugin.AbstractMojo;
 import org.apache.maven.plugin.MojoExecutionException;
+import org.apache.maven.plugin.logging.Log;
 import org.apache.maven.plugins.annotations.LifecyclePhase;
 import org.apache.maven.plugins.annotations.Mojo;
 import org.apache.maven.plugins.annotations.Parameter;
@@ -14,8 +21,14 @@ import org.apache.maven.project.MavenProject;
 import org.eclipse.jgit.api.Git;
 import org.eclipse.jgit.api.errors.GitAPIException;
 import org.eclipse.jgit.api.errors.NoHeadException;
+import org.eclipse.jgit.lib.CommitBuilder;
+import org.eclipse.jgit.lib.Constants;
+import org.eclipse.jgit.lib.ObjectId;
+import org.eclipse.jgit.lib.ObjectInserter;
 import org.eclipse.jgit.lib.Repository;
 import org.eclipse.jgit.revwalk.RevCommit;
+import org.eclipse.jgit.revwalk.RevWalk;
+import org.eclipse.jgit.revwalk.filter.RevFilter;
 import org.refactoringminer.api.GitHistoryRefactoringMiner;
 import org.refactoringminer.api.Refactoring;
 import org.refactoringminer.api.RefactoringHandler;
@@ -50,9 +63,16 @@ public class CommitMinerMojo extends AbstractMojo {
 	@Parameter( property = "refminerFilename", defaultValue = "refminer_commits.csv")
 	private String refminerFilename = "";
 
+	// empty: next to refminerFilename, see codeRangeFilename(String)
+	@Parameter( property = "codeRangeFilename", defaultValue = "")
+	private String codeRangeFilename = "";
+
+	@Parameter( property = "localRepo", defaultValue = "")
+	private String localRepo;
+
 	
 	
-	public static void main(String[] args) {
+	public static void main(String[] args) throws MojoExecutionException {
 		new CommitMinerMojo().process(new File("."));
 		
 	}
@@ -75,36 +95,29 @@ public class CommitMinerMojo extends AbstractMojo {
 		getLog().info("Processing " + dir);
 		process(dir);
 	}
-	private void process(File dir) {
+	private void process(File dir) throws MojoExecutionException {
+		// like batchminer written under a temporary name, a killed job leaves no truncated (gzip) output
+		Path target = Paths.get(refminerFilename);
+		Path tmp = Paths.get(refminerFilename + ".tmp");
+		boolean moved = false;
 		try {
 
 			GitHistoryRefactoringMiner miner = new GitHistoryRefactoringMinerImpl();
 
-			CSVReporter mainReporter = new CSVReporter(refminerFilename, "commit", "refactoringType","refactoringName",
-					"classesBefore","classesAfter","description");
-			CSVReporter codeRangeReporter = new CSVReporter("refminer-coderange.csv", 
-					"commit", "refactoringType","refactoringName","side",
-					"codeElement","codeElementType","filePath","startLine","endLine",
-					"startColumn","endColumn","description");
+			CSVReporter mainReporter = createMainReporter(tmp.toString(), refminerFilename.endsWith(".gz"));
+			CSVReporter codeRangeReporter = createCodeRangeReporter(codeRangeFilename == null || codeRangeFilename.trim().isEmpty()
+					? codeRangeFilename(refminerFilename) : codeRangeFilename);
 
 			final ProgressBar progressBar = new ProgressBar("commits",1);
 			
-			RefactoringHandler handler = new RefactoringHandler() {
-				@Override
-				public void handle(String commitId, List<Refactoring> refactorings) {
-					for (Refactoring ref : refactorings) {
-						processRefactoring(mainReporter, codeRangeReporter, commitId, ref);
-					}
-					progressBar.step();
-				}
-				@Override
-				public void handleException(String commitId, Exception e) {
-					getLog().error("Can't handle commit= " + commitId + " due to " + e.getMessage(), e);
-					progressBar.step();
-				}
-			};
+			RefactoringHandler handler = reportingHandler(mainReporter, codeRangeReporter, progressBar, getLog());
 			getLog().info("gitURL: " + gitURL);
-			if (gitURL != null && !gitURL.trim().isEmpty() && pullRequest != null && !pullRequest.trim().isEmpty() && Integer.valueOf(pullRequest) > 0) {
+			if (localRepo != null && !localRepo.trim().isEmpty() && pullRequest != null && !pullRequest.trim().isEmpty()) {
+				getLog().info("Use local mirror " + localRepo);
+				try (Repository repository = Git.open(new File(localRepo)).getRepository()) {
+					minePullRequestLocally(miner, repository, Integer.valueOf(pullRequest), branch, handler);
+				}
+			} else if (gitURL != null && !gitURL.trim().isEmpty() && pullRequest != null && !pullRequest.trim().isEmpty() && Integer.valueOf(pullRequest) > 0) {
 				int timeout=600;
 				getLog().info("Use PRBasedMiner");
 				miner = new GitHistoryRefactoringMinerImpl(org.refactoringminer.rm1.PRBasedMiner::new);
@@ -123,10 +136,147 @@ public class CommitMinerMojo extends AbstractMojo {
 			progressBar.close();
 			mainReporter.close();
 			codeRangeReporter.close();
+			Files.move(tmp, target, StandardCopyOption.REPLACE_EXISTING, StandardCopyOption.ATOMIC_MOVE);
+			moved = true;
 		} catch (Exception e) {
-			getLog().error(e.getMessage(), e);
+			// mvn has to exit with an error, else the scheduler records a failed pull request as mined
+			throw new MojoExecutionException("Can't mine " + gitURL + " #" + pullRequest + " into " + refminerFilename, e);
+		} finally {
+			// also after an Error such as OutOfMemoryError
+			if (!moved) {
+				new File(tmp.toString()).delete();
+			}
 		}
 	}
+	static RefactoringHandler reportingHandler(CSVReporter mainReporter, CSVReporter codeRangeReporter,
+			ProgressBar progressBar, Log log) {
+		return new RefactoringHandler() {
+			@Override
+			public void handle(String commitId, List<Refactoring> refactorings) {
+				// the records of a commit are written at once instead of locking the reporters per record
+				List<Object[]> mainRecords = new ArrayList<>(refactorings.size());
+				List<Object[]> codeRangeRecords = new ArrayList<>();
+				for (Refactoring ref : refactorings) {
+					processRefactoring(mainRecords, codeRangeRecords, commitId, ref);
+				}
+				mainReporter.writeAll(mainRecords);
+				codeRangeReporter.writeAll(codeRangeRecords);
+				progressBar.step();
+			}
+			@Override
+			public void handleException(String commitId, Exception e) {
+				log.error("Can't handle commit= " + commitId + " due to " + e.getMessage(), e);
+				progressBar.step();
+			}
+		};
+	}
+
+	/**
+	 * Mines a pull request from a local (bare) mirror that has refs/pull/N/head: the whole
+	 * pull request is squashed into one unreferenced commit on top of its base, so that
+	 * like with PRBasedMiner the content diff of the PR is mined instead of every single commit.
+	 * With refs/pull/N/merge that is the merge against its first parent. Without it the base is
+	 * where the PR forked off: found through the merge commit that merged the PR, if it was merged
+	 * with one, else the merge base with HEAD (an open, squashed or rebased PR).
+	 */
+	static void minePullRequestLocally(GitHistoryRefactoringMiner miner, Repository repository, int pullRequest,
+			String branch, RefactoringHandler handler) throws Exception {
+		ObjectId head = repository.resolve("refs/pull/" + pullRequest + "/head");
+		if (head == null) {
+			throw new IOException("No refs/pull/" + pullRequest + "/head in " + repository.getDirectory());
+		}
+		ObjectId merge = repository.resolve("refs/pull/" + pullRequest + "/merge");
+		try (RevWalk walk = new RevWalk(repository); ObjectInserter inserter = repository.newObjectInserter()) {
+			RevCommit headCommit = walk.parseCommit(head);
+			RevCommit tip = headCommit;
+			RevCommit base;
+			if (merge != null) {
+				tip = walk.parseCommit(merge);
+				base = walk.parseCommit(tip.getParent(0));
+			} else {
+				base = forkPoint(repository, walk, headCommit, branch);
+			}
+			if (base == null || base.equals(headCommit)) {
+				// an empty diff would silently report no refactorings
+				throw new IOException("Can't find the base of pull request " + pullRequest + " in " + repository.getDirectory());
+			}
+			CommitBuilder squash = new CommitBuilder();
+			squash.setTreeId(tip.getTree());
+			squash.setParentId(base);
+			squash.setAuthor(headCommit.getAuthorIdent());
+			squash.setCommitter(headCommit.getCommitterIdent());
+			squash.setMessage("pull request #" + pullRequest);
+			ObjectId squashed = inserter.insert(squash);
+			inserter.flush();
+			miner.detectAtCommit(repository, squashed.getName(), handler);
+		}
+	}
+
+	static RevCommit forkPoint(Repository repository, RevWalk walk, RevCommit headCommit, String branch) throws IOException {
+		ObjectId target = repository.resolve(Constants.HEAD);
+		if (target == null) {
+			target = repository.resolve(branch);
+		}
+		if (target == null) {
+			return headCommit.getParentCount() > 0 ? walk.parseCommit(headCommit.getParent(0)) : null;
+		}
+		RevCommit targetCommit = walk.parseCommit(target);
+		RevCommit base = mergeBase(walk, headCommit, targetCommit);
+		if (base == null || !base.equals(headCommit)) {
+			return base;
+		}
+		// merged with a merge commit: the head is in the history of the target, the PR forked off
+		// the first parent of the commit that merged it
+		for (RevCommit c = targetCommit; c != null; c = c.getParentCount() > 0 ? walk.parseCommit(c.getParent(0)) : null) {
+			for (int i = 1; i < c.getParentCount(); i++) {
+				if (c.getParent(i).equals(headCommit)) {
+					return mergeBase(walk, headCommit, walk.parseCommit(c.getParent(0)));
+				}
+			}
+		}
+		return null;
+	}
+
+	static RevCommit mergeBase(RevWalk walk, RevCommit a, RevCommit b) throws IOException {
+		walk.reset();
+		walk.setRevFilter(RevFilter.MERGE_BASE);
+		walk.markStart(a);
+		walk.markStart(b);
+		RevCommit base = walk.next();
+		walk.setRevFilter(RevFilter.ALL);
+		return base;
+	}
+
+	/**
+	 * The code range report of a job next to its refminerFilename, so that jobs running
+	 * at the same time do not write to the same file: mined/x.csv -> mined/x-coderange.csv,
+	 * mined/x.csv.gz -> mined/x-coderange.csv.gz.
+	 */
+	static String codeRangeFilename(String refminerFilename) {
+		boolean gzip = refminerFilename.endsWith(".gz");
+		String base = gzip ? refminerFilename.substring(0, refminerFilename.length() - 3) : refminerFilename;
+		if (base.endsWith(".csv")) {
+			base = base.substring(0, base.length() - 4);
+		}
+		return base + "-coderange.csv" + (gzip ? ".gz" : "");
+	}
+
+	static CSVReporter createMainReporter(String fname) throws IOException {
+		return createMainReporter(fname, fname.endsWith(".gz"));
+	}
+
+	static CSVReporter createMainReporter(String fname, boolean gzip) throws IOException {
+		return new CSVReporter(fname, gzip, "commit", "refactoringType","refactoringName",
+				"classesBefore","classesAfter","description");
+	}
+
+	static CSVReporter createCodeRangeReporter(String fname) throws IOException {
+		return new CSVReporter(fname, 
+				"commit", "refactoringType","refactoringName","side",
+				"codeElement","codeElementType","filePath","startLine","endLine",
+				"startColumn","endColumn","description");
+	}
+
 	private int countCommits(Git git) throws GitAPIException, NoHeadException {
 		Iterable<RevCommit> commits = git.log().call();
 		int count = 0;
@@ -136,9 +286,9 @@ public class CommitMinerMojo extends AbstractMojo {
 		return count;
 	}
 
-	private void reportCodeRanges(CSVReporter reporter, String commitId, Refactoring ref, String side, List<CodeRange> codeRanges) {
+	private static void reportCodeRanges(List<Object[]> records, String commitId, Refactoring ref, String side, List<CodeRange> codeRanges) {
 		for (CodeRange range : codeRanges) {
-			reporter.write(commitId, 
+			records.add(new Object[] {commitId, 
 					ref.getRefactoringType(), 
 					ref.getName(),
 					side, 
@@ -149,20 +299,20 @@ public class CommitMinerMojo extends AbstractMojo {
 					range.getEndLine(),
 					range.getStartColumn(),
 					range.getEndColumn(),
-					range.getDescription().replaceAll(";", ","));
+					range.getDescription().replaceAll(";", ",")});
 		}
 	}
 
-	private void processRefactoring(CSVReporter mainReporter, CSVReporter codeRangeReporter, String commitData,
+	private static void processRefactoring(List<Object[]> mainRecords, List<Object[]> codeRangeRecords, String commitData,
 			Refactoring ref) {
-		mainReporter.write(commitData, 
+		mainRecords.add(new Object[] {commitData, 
 				ref.getRefactoringType(), 
 				ref.getName(),
 				ref.getInvolvedClassesBeforeRefactoring().stream().map(x->x.right).collect(Collectors.joining(",")),
 				ref.getInvolvedClassesAfterRefactoring().stream().map(x->x.right).collect(Collectors.joining(",")),
 				ref.toString().replaceAll(";", ",")
-		);
-		reportCodeRanges(codeRangeReporter, commitData, ref, "left", ref.leftSide());
-		reportCodeRanges(codeRangeReporter, commitData, ref, "right", ref.rightSide());
+		});
+		reportCodeRanges(codeRangeRecords, commitData, ref, "left", ref.leftSide());
+		reportCodeRanges(codeRangeRecords, commitData, ref, "right", ref.rightSide());
 	}
 }
@@ -0,0 +1,150 @@
+import asyncio
+import json
+import os
+import re
+import time
+import aiohttp
+from progress.bar import Bar
+from fetcher import get_prs, cache_filename, prepare_projects
+from files import get_files
+from async_fetcher import RateLimiter, post_graphql
+
+# brings the cached pages of projects up to date without fetching their whole history again.
+# the PRs of a project are requested ordered by UPDATED_AT, newest first, and paging stops at the
+# first PR older than the project's high-water mark (the newest updatedAt seen so far),
+# so a project without changes costs one request. updated PRs replace their node in the cached page
+# that has them, new PRs go to an extra page cached/owner_repo_updated_<time>.json.
+# the marks are kept in refresh_state.json. a project that was never refreshed starts from the time
+# its newest cached page was written, pages cached before updatedAt was part of the query don't have it.
+
+STATE_FILE = 'refresh_state.json'
+
+def iso(ts):
+    return time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(ts))
+
+def load_state(state_file=STATE_FILE):
+    if not os.path.isfile(state_file):
+        return dict()
+    with open(state_file) as f:
+        return json.load(f)
+
+def save_state(state, state_file=STATE_FILE):
+    tmp = state_file + '.tmp'
+    with open(tmp, 'w') as f:
+        json.dump(state, f, indent=1, sort_keys=True)
+    os.replace(tmp, state_file)
+
+def page_pattern(project):
+    # owner_repo.json, owner_repo_<cursor>.json (github cursors are base64 of 'cursor:...') and
+    # owner_repo_updated_<time>.json, not the pages of owner/repo_other
+    return re.compile(r'^%s(_Y3Vyc29y[A-Za-z0-9+=]*|_updated_\d+)?\.json$' % re.escape(project.replace('/', '_')))
+
+def project_pages(project, cache_dir='cached'):
+    pattern = page_pattern(project)
+    return [f for f in get_files(cache_dir) if pattern.match(os.path.basename(f))]
+
+def page_nodes(js):
+    return (((js or {}).get('data') or {}).get('repository') or {}).get('pullRequests', {}).get('nodes') or []
+
+def initial_mark(pages):
+    # the newest updatedAt in the cache, otherwise when the newest page was fetched
+    marks = []
+    for fname in pages:
+        with open(fname) as f:
+            marks += [n['updatedAt'] for n in page_nodes(json.load(f)) if n.get('updatedAt')]
+    if marks:
+        return max(marks)
+    return iso(max(os.path.getmtime(f) for f in pages)) if pages else None
+
+def write_page(fname, js):
+    tmp = fname + '.tmp'
+    with open(tmp, 'w') as f:
+        json.dump(js, f)
+    os.replace(tmp, fname)
+
+def upsert(project, nodes, pages, cache_dir='cached'):
+    # replaces cached nodes by url, the rest is written to a new page. returns (updated, added)
+    by_url = {n['url']: n for n in nodes}
+    updated = 0
+    for fname in pages:
+        with open(fname) as f:
+            js = json.load(f)
+        cached = page_nodes(js)
+        hits = 0
+        for i, n in enumerate(cached):
+            fresh = by_url.pop(n.get('url'), None)
+            if fresh is not None and fresh != n:
+                cached[i] = fresh
+                hits += 1
+        if hits:
+            write_page(fname, js)
+            updated += hits
+    if by_url:
+        new = list(by_url.values())
+        js = {'data': {'repository': {'pullRequests': {
+            'pageInfo': {'endCursor': None, 'hasNextPage': False}, 'totalCount': len(new), 'nodes': new}}}}
+        write_page(os.path.join(cache_dir, os.path.basename(cache_filename(project, 'updated_%d' % time.time_ns()))), js)
+    return updated, len(by_url)
+
+async def changed_prs(session, limiter, project, mark, **kwargs):
+    # nodes updated after mark, newest first
+    changed = []
+    cursor = None
+    while True:
+        text, js = await post_graphql(session, limiter, get_prs(project, cursor, 'UPDATED_AT'), **kwargs)
+        prs = (((js or {}).get('data') or {}).get('repository') or {}).get('pullRequests')
+        if js is None or not prs or js.get('errors'):
+            raise ValueError('cannot refresh %s: %s' % (project, (js or {}).get('errors')))
+        nodes = prs.get('nodes') or []
+        # >= so that a PR updated within the same second as the mark is not missed
+        newer = [n for n in nodes if mark is None or n['updatedAt'] >= mark]
+        changed += newer
+        if len(newer) < len(nodes) or not prs['pageInfo'].get('hasNextPage'):
+            return changed
+        cursor = prs['pageInfo']['endCursor']
+
+async def refresh_project(session, limiter, project, state, cache_dir='cached', **kwargs):
+    pages = project_pages(project, cache_dir)
+    mark = state.get(project) or initial_mark(pages)
+    changed = await changed_prs(session, limiter, project, mark, **kwargs)
+    updated, added = upsert(project, changed, pages, cache_dir) if changed else (0, 0)
+    if changed:
+        mark = max(mark or '', max(n['updatedAt'] for n in changed))
+    if mark:
+        state[project] = mark
+    return updated, added
+
+async def refresh_projects_async(projects, concurrency=8, cache_dir='cached', state_file=STATE_FILE, **kwargs):
+    limiter = RateLimiter()
+    state = load_state(state_file)
+    queue = asyncio.Queue()
+    for p in projects:
+        queue.put_nowait(p)
+    bar = Bar('Refreshing ' + str(len(projects)) + ' projects', max=max(1, len(projects)), suffix='%(percent)d%% %(eta)s')
+    results = dict()
+
+    async def worker(session):
+        while not queue.empty():
+            project = queue.get_nowait()
+            try:
+                results[project] = await refresh_project(session, limiter, project, state, cache_dir, **kwargs)
+                save_state(state, state_file)
+            except Exception as e:
+                print(e, project)
+            bar.next()
+
+    connector = aiohttp.TCPConnector(limit=concurrency)
+    async with aiohttp.ClientSession(connector=connector, timeout=aiohttp.ClientTimeout(total=300)) as session:
+        await asyncio.gather(*[worker(session) for _ in range(concurrency)])
+    bar.finish()
+    print('Updated', sum(u for u, _ in results.values()), 'and added', sum(a for _, a in results.values()),
+          'PRs in', len(results), 'projects')
+    return results
+
+def refresh_projects(projects, concurrency=8, **kwargs):
+    # {project: (updated PRs, new PRs)}
+    return asyncio.run(refresh_projects_async(list(projects), concurrency, **kwargs))
+
+if __name__ == '__main__':
+    projects = prepare_projects()
+    refresh_projects(projects['project'], concurrency=int(os.environ.get('FETCH_CONCURRENCY', 8)))
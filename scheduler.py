@@ -0,0 +1,138 @@
+import contextlib
+import json
+import os
+import signal
+import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from progress.bar import Bar
+import metrics
+
+# runs refminer jobs (or any other command) N at a time with a timeout per job and bounded retries.
+# every state change is appended to a json-lines ledger, a restarted run skips the jobs that are done
+# (or gave up) according to the ledger and picks up the rest. the output of an attempt that did not
+# succeed is removed (the miner writes the header first), an existing output only counts as done for
+# jobs the ledger does not know. a job with an output is only done when the output is there.
+
+LEDGER_FILE = 'mining_ledger.jsonl'
+LOG_DIR = 'mining_logs'
+MVN = os.environ.get('REFMINER_MVN', 'mvn')
+
+def mining_command(fname, repo_url, pull_req_id, plugin='com.github.jazzmuesli:refminer-mvn-plugin:commitminer', local_repo=None):
+    cmd = [MVN, plugin, '-DrefminerFilename=' + fname, '-DgitURL=' + repo_url, '-DpullRequest=' + str(pull_req_id)]
+    if local_repo:
+        cmd.append('-DlocalRepo=' + local_repo)
+    return cmd
+
+def batch_command(batch_file, plugin='com.github.jazzmuesli:refminer-mvn-plugin:batchminer'):
+    return [MVN, plugin, '-DbatchFile=' + batch_file]
+
+def read_ledger(ledger=LEDGER_FILE):
+    state = dict()
+    if not os.path.isfile(ledger):
+        return state
+    with open(ledger) as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                # last line of an interrupted run
+                continue
+            state[entry['id']] = entry
+    return state
+
+class Ledger:
+    def __init__(self, fname=LEDGER_FILE):
+        self.fname = fname
+        self.lock = threading.Lock()
+
+    def write(self, job_id, status, **kwargs):
+        entry = dict(id=job_id, status=status, ts=time.time(), **kwargs)
+        with self.lock:
+            with open(self.fname, 'a') as f:
+                f.write(json.dumps(entry) + '\n')
+
+def run_command(cmd, timeout, log_file):
+    # own process group, so that a timeout kills mvn together with the forked jvm
+    with open(log_file, 'w') as log:
+        p = subprocess.Popen(cmd, stdout=log, stderr=subprocess.STDOUT, start_new_session=True)
+        try:
+            return p.wait(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            os.killpg(p.pid, signal.SIGKILL)
+            p.wait()
+            return None
+
+def remove_output(job):
+    if job.get('output') and os.path.isfile(job['output']):
+        os.remove(job['output'])
+
+def run_job(job, ledger, timeout, retries, backoff, log_dir):
+    # job['cmd'] may also be a function of the context entered by job['context'], e.g. mirror paths
+    log_file = os.path.join(log_dir, job['id'] + '.log')
+    for attempt in range(retries + 1):
+        if attempt > 0:
+            time.sleep(backoff * 2 ** (attempt - 1))
+        ledger.write(job['id'], 'started', attempt=attempt)
+        # left over by an interrupted run
+        remove_output(job)
+        start = time.time()
+        with metrics.timer('mine_job', job=job['id'], attempt=attempt) as m:
+            try:
+                with job['context']() if job.get('context') else contextlib.nullcontext() as ctx:
+                    rc = run_command(job['cmd'](ctx) if callable(job['cmd']) else job['cmd'], timeout, log_file)
+            except Exception as e:
+                print(job['id'], e)
+                rc = -1
+            if rc == 0 and job.get('output') and not os.path.isfile(job['output']):
+                # exited normally without writing its output, not mined
+                print(job['id'], 'exited with 0 without writing', job['output'])
+                rc = -1
+            m.update(rc=rc, status='done' if rc == 0 else 'timeout' if rc is None else 'failed')
+        metrics.count('mine.' + m['status'])
+        duration = time.time() - start
+        if rc == 0:
+            ledger.write(job['id'], 'done', attempt=attempt, rc=rc, duration=duration)
+            return True
+        remove_output(job)
+        ledger.write(job['id'], 'timeout' if rc is None else 'failed', attempt=attempt, rc=rc, duration=duration)
+    ledger.write(job['id'], 'gave_up', attempt=retries)
+    metrics.count('mine.gave_up')
+    return False
+
+def pending_jobs(jobs, ledger=LEDGER_FILE, retry_failed=False):
+    state = read_ledger(ledger)
+    finished = ['done'] if retry_failed else ['done', 'gave_up']
+    jobs = list({j['id']: j for j in jobs}.values())
+    todo = []
+    for j in jobs:
+        status = state.get(j['id'], {}).get('status')
+        if status in finished:
+            continue
+        # mined before there was a ledger
+        if status is None and j.get('output') and os.path.isfile(j['output']):
+            continue
+        todo.append(j)
+    return todo
+
+def run_jobs(jobs, workers=4, timeout=3600, retries=2, backoff=60, ledger=LEDGER_FILE, log_dir=LOG_DIR, retry_failed=False):
+    # jobs are dicts with id, cmd (argument list) and optionally output, a job whose output exists is skipped
+    todo = pending_jobs(jobs, ledger, retry_failed)
+    print('Running', len(todo), 'of', len(jobs), 'jobs with', workers, 'workers')
+    os.makedirs(log_dir, exist_ok=True)
+    led = Ledger(ledger)
+    results = dict()
+    bar = Bar('Mining', max=max(1, len(todo)), suffix='%(percent)d%% %(eta)s')
+    with metrics.timer('mine', items=len(todo), workers=workers) as m:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {executor.submit(run_job, job, led, timeout, retries, backoff, log_dir): job['id'] for job in todo}
+            for future in as_completed(futures):
+                results[futures[future]] = future.result()
+                bar.next()
+        bar.finish()
+        failed = [k for k, ok in results.items() if not ok]
+        m['failed'] = len(failed)
+    if failed:
+        print(len(failed), 'jobs failed, see', log_dir)
+    return results
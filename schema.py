@@ -0,0 +1,54 @@
+import numpy as np
+import pandas as pd
+
+# compact dtypes for the analysis frames (all_prs_with_files.csv, mined.csv, reviewed.csv, ...).
+# repeated strings become categoricals and counts int32, so a frame takes a fraction of the memory and
+# groupbys and merges work on integer codes. frames that are merged on url should share one url dtype
+# (share_urls): merging categoricals with equal categories joins the codes, otherwise pandas falls back
+# to comparing the strings. pr_id is the code of the url in that shared dtype, an integer id per PR.
+# groupbys on these columns need observed=True, else pandas < 3 adds a group for every unused category.
+
+CATEGORY_COLUMNS = ['url', 'title_mask', 'body_mask', 'refactoringType', 'refactoringName', 'pr_group',
+                    'ref_pattern', 'selected', 'project', 'prid', 'fname', 'commit', 'prod_file', 'test_file',
+                    'changedFile', 'classesBefore', 'classesAfter', 'period', 'reviewer', 'repo_url', 'mined_filename']
+INT_COLUMNS = ['test_pairs', 'changed_files', 'changedFiles', 'prod_additions', 'test_additions',
+               'prod_deletions', 'test_deletions', 'java_files_count', 'java_files', 'test_java_files', 'pull_req_id']
+INT32 = np.iinfo(np.int32)
+
+def as_int32(s):
+    # only without missing values and in range, otherwise the column stays as it is
+    if not pd.api.types.is_numeric_dtype(s) or s.isnull().any() or len(s) == 0:
+        return s
+    if (s % 1 != 0).any() or s.min() < INT32.min or s.max() > INT32.max:
+        return s
+    return s.astype('int32')
+
+def compact(df, urls=None):
+    # urls: the CategoricalDtype from url_dtype to share with other frames
+    df = df.copy()
+    for c in CATEGORY_COLUMNS:
+        if c in df and not isinstance(df[c].dtype, pd.CategoricalDtype):
+            df[c] = df[c].astype('category')
+    for c in INT_COLUMNS:
+        if c in df:
+            df[c] = as_int32(df[c])
+    if urls is not None and 'url' in df:
+        df['url'] = df['url'].astype(object).astype(urls)
+        df['pr_id'] = df['url'].cat.codes.astype('int32')
+    return df
+
+def read_csv(fname, urls=None, **kwargs):
+    # pd.read_csv with the compact dtypes, the categoricals are built while reading
+    columns = pd.read_csv(fname, nrows=0, **kwargs).columns
+    dtype = {c: 'category' for c in CATEGORY_COLUMNS if c in columns}
+    dtype.update(kwargs.pop('dtype', None) or {})
+    return compact(pd.read_csv(fname, dtype=dtype, **kwargs), urls)
+
+def url_dtype(*frames):
+    urls = pd.concat([pd.Series(f['url'].dropna().unique()).astype(object) for f in frames if 'url' in f])
+    return pd.CategoricalDtype(np.sort(urls.unique()))
+
+def share_urls(*frames):
+    # the frames with one url dtype over all their urls and pr_id
+    urls = url_dtype(*frames)
+    return [compact(f, urls) for f in frames]
@@ -0,0 +1,87 @@
+import numpy as np
+import pandas as pd
+
+# significance and confidence intervals of the refactorings per PR, for all refactoring types at once.
+# the z-test is computed on arrays instead of calling proportions_ztest row by row. the resampling is a
+# matrix: bootstrap weights (how often each PR is drawn in each resample) and permuted group labels,
+# seeded, so a frame gets the same CIs and p-values in the tables and in every plot (utils.ref_type_cis
+# keeps them with the counts, a redraw does not resample again). the resamples are drawn and multiplied
+# with the PR x type counts BATCH at a time: the peak is a BATCH x PRs float64 matrix, 48MB for 30k PRs,
+# instead of all N_BOOT x PRs at once.
+
+N_BOOT = 1000
+N_PERM = 1000
+SEED = 42
+BATCH = 200
+
+def proportions_ztest(count1, count2, nobs1, nobs2):
+    # p-values of statsmodels' proportions_ztest([count1, count2], [nobs1, nobs2]) for arrays of counts.
+    # scipy.stats is imported here, it takes about a second
+    from scipy.stats import norm
+    count1 = np.asarray(count1, dtype=float)
+    count2 = np.asarray(count2, dtype=float)
+    prop = (count1 + count2) / (nobs1 + nobs2)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        z = (count1 / nobs1 - count2 / nobs2) / np.sqrt(prop * (1 - prop) * (1 / nobs1 + 1 / nobs2))
+    return norm.sf(np.abs(z)) * 2
+
+def bootstrap_weights(n, n_boot=N_BOOT, seed=SEED):
+    # the rows of an n_boot x n matrix, BATCH at a time, row b: how often each of the n rows is drawn in
+    # resample b. the same draws as one n_boot x n matrix
+    rng = np.random.default_rng(seed)
+    for i in range(0, n_boot, BATCH):
+        yield rng.multinomial(n, np.full(n, 1 / n), size=min(BATCH, n_boot - i)).astype(float)
+
+def permuted_labels(n1, n2, n_perm=N_PERM, seed=SEED):
+    # the rows of an n_perm x (n1 + n2) matrix, BATCH at a time, row p: 1 for the rows in the first group
+    # of permutation p
+    rng = np.random.default_rng(seed)
+    labels = np.zeros(n1 + n2)
+    labels[:n1] = 1
+    for i in range(0, n_perm, BATCH):
+        yield rng.permuted(np.tile(labels, (min(BATCH, n_perm - i), 1)), axis=1)
+
+def bootstrap_means(x, n_boot=N_BOOT, seed=SEED):
+    # n_boot x columns, the column means of x in every resample of its rows
+    x = np.asarray(x, dtype=float)
+    return np.vstack([w @ x for w in bootstrap_weights(len(x), n_boot, seed)]) / len(x)
+
+def bootstrap_ci(x, level=95, n_boot=N_BOOT, seed=SEED):
+    # (low, high) percentile CIs of the column means, like seaborn's errorbar=('ci', level)
+    x = np.asarray(x, dtype=float)
+    if len(x) == 0:
+        return np.full(x.shape[1], np.nan), np.full(x.shape[1], np.nan)
+    low, high = np.percentile(bootstrap_means(x, n_boot, seed), [(100 - level) / 2, (100 + level) / 2], axis=0)
+    return low, high
+
+def permutation_pvalues(x1, x2, n_perm=N_PERM, seed=SEED):
+    # two-sided p-values of the difference of the column means of x1 and x2
+    x1 = np.asarray(x1, dtype=float)
+    x2 = np.asarray(x2, dtype=float)
+    n1, n2 = len(x1), len(x2)
+    if n1 == 0 or n2 == 0:
+        return np.full(x1.shape[1], np.nan)
+    x = np.vstack([x1, x2])
+    total = x.sum(axis=0)
+    observed = np.abs(x1.mean(axis=0) - x2.mean(axis=0))
+    # differences equal to the observed one up to rounding count as at least as large
+    observed = observed - 1e-9 * np.maximum(observed, 1)
+    hits = np.zeros(x.shape[1])
+    for labels in permuted_labels(n1, n2, n_perm, seed):
+        s1 = labels @ x
+        hits += (np.abs(s1 / n1 - (total - s1) / n2) >= observed).sum(axis=0)
+    return (hits + 1) / (n_perm + 1)
+
+def compare_means(first, second, level=95, n_boot=N_BOOT, n_perm=N_PERM, seed=SEED):
+    # first, second: rows x columns counts (utils.get_refs_per_url). one row per column of either with the
+    # means and bootstrap CIs of both and the permutation p-value, a column missing in one frame counts 0 there
+    columns = first.columns.union(second.columns, sort=False)
+    x1 = first.reindex(columns=columns, fill_value=0).to_numpy(dtype=float)
+    x2 = second.reindex(columns=columns, fill_value=0).to_numpy(dtype=float)
+    low1, high1 = bootstrap_ci(x1, level, n_boot, seed)
+    low2, high2 = bootstrap_ci(x2, level, n_boot, seed)
+    mean1 = x1.sum(axis=0) / len(x1) if len(x1) else np.full(len(columns), np.nan)
+    mean2 = x2.sum(axis=0) / len(x2) if len(x2) else np.full(len(columns), np.nan)
+    return pd.DataFrame({'mean1': mean1, 'ci_low1': low1, 'ci_high1': high1,
+                         'mean2': mean2, 'ci_low2': low2, 'ci_high2': high2,
+                         'pvalue': permutation_pvalues(x1, x2, n_perm, seed)}, index=columns)
@@ -0,0 +1,85 @@
+import posixpath
+import re
+
+# pairs production classes with their tests in the changed files of a PR.
+# test files are recognised by name and paired with the production class of the same name. by default
+# only FooTest like the original matching (the tables), EXTENDED_PATTERNS adds FooTests, FooIT and TestFoo.
+# if there are several classes of that name, the one in the same package is preferred: first the directory
+# that corresponds to the test's (src/test -> src/main), then the same package in another module,
+# otherwise the last one listed like before.
+# the production classes are indexed by name once, so a PR with thousands of files is one pass.
+
+TEST_PATTERNS = {
+    'Test': re.compile(r'^(?P<name>.+)Test$'),
+    'Tests': re.compile(r'^(?P<name>.+)Tests$'),
+    'IT': re.compile(r'^(?P<name>.+)IT$'),
+    'Test*': re.compile(r'^Test(?P<name>[A-Z].*)$'),
+}
+# the patterns tried in order, the first that matches names the class under test
+DEFAULT_PATTERNS = ('Test',)
+EXTENDED_PATTERNS = ('Test', 'Tests', 'IT', 'Test*')
+# TestFoo or FooIT under src/main is e.g. a TestUtils helper or a class named after an abbreviation, not a test
+NOT_IN_MAIN = ('IT', 'Test*')
+SOURCE_ROOT = re.compile(r'(^|/)src/(main|test)/[^/]+/')
+
+def class_name(path):
+    return posixpath.basename(path)[:-len('.java')]
+
+def package_of(path):
+    # directory below src/main/java or src/test/java, the directory itself for other layouts
+    d = posixpath.dirname(path)
+    m = SOURCE_ROOT.search(d + '/')
+    return (d + '/')[m.end():].rstrip('/') if m else d
+
+def main_dir(path):
+    # directory where the production class of a test is expected
+    return re.sub(r'(^|/)src/test/', r'\1src/main/', posixpath.dirname(path) + '/').rstrip('/')
+
+def in_main(path):
+    return re.search(r'(^|/)src/main/', path) is not None
+
+def subject(path, patterns=DEFAULT_PATTERNS):
+    # name of the class under test or None if path is not a test
+    if not path.endswith('.java'):
+        return None
+    name = class_name(path)
+    for p in patterns:
+        if p in NOT_IN_MAIN and in_main(path):
+            continue
+        m = TEST_PATTERNS[p].match(name)
+        if m:
+            return m.group('name')
+    return None
+
+def best_match(test, candidates):
+    if len(candidates) == 1:
+        return candidates[0]
+    expected = main_dir(test)
+    for c in candidates:
+        if posixpath.dirname(c) == expected:
+            return c
+    pkg = package_of(test)
+    same_pkg = [c for c in candidates if package_of(c) == pkg]
+    return same_pkg[-1] if same_pkg else candidates[-1]
+
+def index_files(files, patterns=DEFAULT_PATTERNS):
+    # production classes by name and the tests with their subject, in the order of files
+    prod = dict()
+    tests = []
+    for f in files:
+        name = subject(f, patterns)
+        if name is not None:
+            tests.append((f, name))
+        elif f.endswith('.java'):
+            prod.setdefault(class_name(f), []).append(f)
+    return prod, tests
+
+def find_test_pairs(files, patterns=DEFAULT_PATTERNS):
+    # {production file: test file}, a production file keeps its first test
+    prod, tests = index_files(files, patterns)
+    pairs = dict()
+    for test, name in tests:
+        candidates = prod.get(name)
+        if candidates:
+            pairs.setdefault(best_match(test, candidates), test)
+    return pairs
@@ -0,0 +1,99 @@
+# the keyword classifiers as they were before classifier.RuleSet (miner.py and utils.py of the
+# baseline), kept unchanged to check the rule sets against
+
+def contains_in_masks(s, masks):
+    return len([m for m in masks if m in s]) > 0
+
+def miner_is_testability_relevant(s):
+    if not isinstance(s, str):
+        return (False, None)
+    if '@Testable' in s:
+        return (False,'@Testable')
+    if 'VisibleForTesting' in s:
+        return (True, 'VisibleForTesting')
+    s=s.lower()
+    masks=['testability','testable','easier to test', 'simplify testing','cover']
+    for m in masks:
+        if m in s:
+            return (True, m)
+    ref_masks=['test','junit']
+    if 'refactor' in s:
+        for m in ref_masks:
+            if m in s:
+                return (True, 'refactor_' + m)
+    if 'add' in s:
+        for m in ref_masks:
+            if m in s:
+                return (True, 'add_' + m)
+    if 'fix' in s:
+        for m in ref_masks:
+            if m in s:
+                return (True, 'fix_' + m)
+    for m in ref_masks:
+        if m in s:
+            return (True, m)
+            
+    return (False, None)
+
+def is_testability_relevant(s):
+    if not isinstance(s, str):
+        return (False, "other")
+    s=s.lower()
+    testability_masks=['testability','testable']
+    for m in testability_masks:
+        if m in s:
+            return (True, 'testability')
+    if 'refactor' in s and ('test' in s or 'junit' in s):
+        return (True, 'Refactor for test')
+    if 'dependency' in s or 'depend' in s:
+        return (True, 'Dependency')
+    if 'concurren' in s or 'thread' in s or 'sleep' in s or 'latch' in s:
+        return (True, 'Concurrency')
+    if 'singleton' in s:
+        return (True, 'Singleton')
+    if 'inject' in s or 'wire' in s or 'wiring' in s:
+        return (True, 'Inject')
+    if 'socket' in s or 'network' in s or 'connectivity' in s:
+        return (True, 'Network')
+    
+    if 'test' in s or 'junit' in s:
+        return (True, 'test')
+    
+    return (False, "Other")
+
+def is_testability_relevant_suggested(s):
+    if not isinstance(s, str):
+        return (False, "other")
+    s=s.lower()
+    test_junit=['test','junit']
+    #m1
+    if contains_in_masks(s, ['testabilit','testable']):
+        return (True, 'testability')
+    #m2
+    if contains_in_masks(s, ['simpl','visibl','eas']) and contains_in_masks(s, test_junit):
+        return (True, 'Easier to test')
+    #m3
+    if 'refactor' in s and contains_in_masks(s, test_junit):
+        return (True, 'Refactor for test')
+    #m4
+    if 'depend' in s and contains_in_masks(s, test_junit):
+        return (True, 'Dependency')
+    #m5
+    if contains_in_masks(s, ['concurren','thread','sleep','latch']) and contains_in_masks(s, test_junit):
+        return (True, 'Concurrency')
+    #m6
+    if 'singleton' in s and contains_in_masks(s, test_junit):
+        return (True, 'Singleton')
+    #m7
+    if contains_in_masks(s, ['inject','wire','wiring']) and contains_in_masks(s, test_junit):
+        return (True, 'Injection')
+    #m8
+    if contains_in_masks(s, ['network','socket','connectivity','connection']) and contains_in_masks(s, test_junit):
+        return (True, 'Network')
+    
+    if 'fix' in s:
+        return (True, 'Fix')
+    if 'test' in s:
+        return (True, 'test')
+            
+    return (False, "other")
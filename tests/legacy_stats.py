@@ -0,0 +1,37 @@
+import numpy as np
+import pandas as pd
+from statsmodels.stats.proportion import proportions_ztest
+
+# calc_means_and_counts_by_ref_type before stats.py and ref_counts.py, a crosstab and a z-test per type.
+# only changed where pandas 3 needs it: row.iloc[i] for row[i], 'mean'/'sum' for np.mean/sum, .copy()
+
+def filter_mined(mined, with_test_pairs):
+    sel=mined[mined['with_test_pairs']==with_test_pairs]
+    return sel
+
+def get_refs_per_url(mined, with_test_pairs):
+    sel=filter_mined(mined, with_test_pairs)
+    return pd.crosstab(sel.url, sel.refactoringType)
+
+def agg_data(mined, with_test_pairs):
+    col_name='with_test_pairs' if with_test_pairs else 'without_test_pairs'
+    p=pd.DataFrame(get_refs_per_url(mined, with_test_pairs).agg('mean'),columns=[col_name])
+    p['refactoringType']=p.index
+    p.index.name=None
+    cnt=pd.DataFrame(get_refs_per_url(mined, with_test_pairs).agg('sum'),columns=[col_name+'_cnt'])
+    cnt['refactoringType']=cnt.index
+    cnt.index.name=None
+    return pd.DataFrame(p[['refactoringType',col_name]]).merge(pd.DataFrame(cnt[['refactoringType',col_name+'_cnt']]))
+
+def calc_means_and_counts_by_ref_type(mined, min_count=5):
+    w1=agg_data(mined, True)
+    w2=agg_data(mined, False)
+    w=w2.merge(w1,on='refactoringType')
+    with_tests_cnt=len(set(mined[mined.test_pairs>0]['prid']))
+    without_tests_cnt=len(set(mined[mined.test_pairs==0]['prid']))
+
+    w['significance']=w[['with_test_pairs_cnt','without_test_pairs_cnt']].apply(lambda row: round(proportions_ztest([row.iloc[0], row.iloc[1]], [with_tests_cnt,without_tests_cnt])[1],4), axis=1)
+
+    w=w[(w.without_test_pairs_cnt>min_count) & (w.with_test_pairs_cnt > min_count)].copy()
+    w['ratio']=w['with_test_pairs']/w['without_test_pairs']
+    return w.sort_values('ratio')
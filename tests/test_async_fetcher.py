@@ -0,0 +1,84 @@
+import asyncio
+import json
+import time
+from aiohttp import web
+import aiohttp
+import async_fetcher
+from async_fetcher import RateLimiter, post_graphql
+
+# a local GraphQL endpoint that answers with the pages of one project, after an optional 403
+
+def page(cursor, has_next, remaining=4000, reset_at='2030-01-01T00:00:00Z'):
+    return {'data': {'rateLimit': {'cost': 1, 'remaining': remaining, 'resetAt': reset_at},
+                     'repository': {'pullRequests': {'pageInfo': {'endCursor': cursor, 'hasNextPage': has_next},
+                                                     'totalCount': 2, 'nodes': [{'url': 'u' + cursor}]}}}}
+
+async def serve(handler):
+    app = web.Application()
+    app.router.add_post('/graphql', handler)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    await site.start()
+    port = runner.addresses[0][1]
+    return runner, 'http://127.0.0.1:%d/graphql' % port
+
+def test_waits_for_reset_after_rate_limit():
+    calls = []
+
+    async def handler(request):
+        calls.append(time.time())
+        if len(calls) == 1:
+            # budget gone, the window resets right away
+            return web.Response(status=403, text='{}', headers={
+                'X-RateLimit-Limit': '5000', 'X-RateLimit-Remaining': '0', 'X-RateLimit-Reset': str(time.time())})
+        return web.json_response(page('a', False))
+
+    async def run():
+        runner, url = await serve(handler)
+        limiter = RateLimiter()
+        try:
+            async with aiohttp.ClientSession() as session:
+                first = await post_graphql(session, limiter, 'q', url=url, max_retries=2)
+                # the limiter keeps working after the reset
+                second = await post_graphql(session, limiter, 'q', url=url, max_retries=2)
+        finally:
+            await runner.cleanup()
+        return first, second
+
+    first, second = asyncio.run(run())
+    assert first[1]['data']['repository']['pullRequests']['pageInfo']['endCursor'] == 'a'
+    assert second[1] is not None
+    assert len(calls) == 3
+    # waited for the reset plus a second
+    assert calls[1] - calls[0] >= 0.9
+
+def test_acquire_with_exhausted_budget_past_reset():
+    limiter = RateLimiter()
+    limiter.remaining = 0
+    limiter.reset_at = time.time() - 1
+    asyncio.run(limiter.acquire())
+    assert limiter.remaining == limiter.limit
+
+def test_fetch_projects_pages_and_cache(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / 'cached').mkdir()
+    queries = []
+
+    async def handler(request):
+        query = (await request.json())['query']
+        queries.append(query)
+        return web.json_response(page('b', False) if 'after:"a"' in query else page('a', True))
+
+    async def run():
+        runner, url = await serve(handler)
+        try:
+            return await async_fetcher.fetch_projects_async(['o/r'], concurrency=2, url=url)
+        finally:
+            await runner.cleanup()
+
+    assert asyncio.run(run()) == {'o/r': 2}
+    assert json.loads((tmp_path / 'cached' / 'o_r_a.json').read_text())['data']['repository']['pullRequests']['pageInfo']['endCursor'] == 'b'
+    # the second run reads the cache
+    assert asyncio.run(run()) == {'o/r': 2}
+    assert len(queries) == 2
@@ -0,0 +1,34 @@
+import random
+import numpy as np
+import pandas as pd
+import legacy_classifier as legacy
+from classifier import MINER_RULES, TESTABILITY_RULES, SUGGESTED_RULES
+
+# the rule sets give the labels of the if-chains they replaced
+
+WORDS = ['fix', 'add', 'refactor', 'test', 'Test', 'junit', 'JUnit', 'testability', 'testable', 'TESTABLE',
+         'easier to test', 'simplify testing', 'cover', 'coverage', '@Testable', '@testable', 'VisibleForTesting',
+         'visible', 'easy', 'simple', 'depend', 'dependency', 'concurrent', 'thread', 'sleep', 'latch', 'singleton',
+         'inject', 'wire', 'wiring', 'socket', 'network', 'connectivity', 'connection', 'the', 'a', 'docs', 'update']
+CASES = [(MINER_RULES, legacy.miner_is_testability_relevant),
+         (TESTABILITY_RULES, legacy.is_testability_relevant),
+         (SUGGESTED_RULES, legacy.is_testability_relevant_suggested)]
+
+def texts(n=20000, seed=42):
+    rnd = random.Random(seed)
+    xs = [rnd.choice(['', ' ', '-']).join(rnd.choice(WORDS) for _ in range(rnd.randint(0, 6))) for _ in range(n)]
+    return xs + [None, np.nan, 3, '', 'Test', '@Testable VisibleForTesting']
+
+def test_same_labels_as_legacy():
+    xs = texts()
+    for rules, old in CASES:
+        assert [rules.classify(x) for x in xs] == [old(x) for x in xs]
+
+def test_classify_series_same_as_scalar():
+    xs = texts(2000)
+    xs = pd.Series(xs, index=range(5, 5 + len(xs)))
+    for rules, old in CASES:
+        df = rules.classify_series(xs)
+        expected = [old(x) for x in xs]
+        assert df.index.equals(xs.index)
+        assert list(zip(df['relevant'], df['label'])) == expected
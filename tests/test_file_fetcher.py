@@ -0,0 +1,73 @@
+import asyncio
+import json
+import re
+from aiohttp import web
+import file_fetcher
+from test_async_fetcher import serve
+
+# a local GraphQL endpoint with the files of some PRs, 100 per page with cursors c<offset>
+
+TOTALS = {'A': 250, 'B': 150}
+NODE = re.compile(r'pr(\d+): node\(id: "(\w+)"\).*files\(first: 100(?:, after: "c(\d+)")?\)')
+
+def files_of(pr, start, end):
+    return [{'path': '%s/F%d.java' % (pr, i), 'additions': 1, 'deletions': 0} for i in range(start, end)]
+
+def pr_node(pr, have, page_info=True):
+    fs = {'totalCount': TOTALS.get(pr, 300), 'nodes': files_of(pr, 0, have)}
+    if page_info:
+        fs['pageInfo'] = {'endCursor': 'c%d' % have, 'hasNextPage': True}
+    return {'id': pr, 'url': 'https://github.com/o/r/pull/' + pr, 'files': fs}
+
+def write_page(path, nodes):
+    path.write_text(json.dumps({'data': {'repository': {'pullRequests': {'nodes': nodes}}}}))
+    return str(path)
+
+def test_completes_truncated_prs(tmp_path):
+    queries = []
+
+    async def handler(request):
+        query = (await request.json())['query']
+        queries.append(query)
+        data = {'rateLimit': {'cost': 1, 'remaining': 4000, 'resetAt': '2030-01-01T00:00:00Z'}}
+        for line in query.splitlines():
+            m = NODE.search(line)
+            if not m:
+                continue
+            alias, pr, after = 'pr' + m.group(1), m.group(2), int(m.group(3) or 0)
+            if pr not in TOTALS:
+                # deleted in the meantime
+                data[alias] = None
+                continue
+            end = min(after + 100, TOTALS[pr])
+            fs = {'totalCount': TOTALS[pr], 'pageInfo': {'endCursor': 'c%d' % end, 'hasNextPage': end < TOTALS[pr]}}
+            if 'nodes {' in line:
+                fs['nodes'] = files_of(pr, after, end)
+            data[alias] = {'files': fs}
+        return web.json_response({'data': data})
+
+    # A has a cursor after the first 100 files, B was cached before there was a pageInfo
+    first = write_page(tmp_path / 'o_r_1.json', [pr_node('A', 100), {'id': 'C', 'files': {'totalCount': 1, 'nodes': files_of('C', 0, 1)}}])
+    second = write_page(tmp_path / 'o_r_2.json', [pr_node('B', 100, page_info=False), pr_node('gone', 100)])
+    prs = file_fetcher.truncated_prs([first, second])
+    assert [pr['id'] for pr in prs] == ['A', 'B', 'gone']
+
+    async def run():
+        runner, url = await serve(handler)
+        try:
+            return await file_fetcher.complete_files_async(prs, batch_size=2, concurrency=2, url=url, max_retries=0)
+        finally:
+            await runner.cleanup()
+
+    failed = asyncio.run(run())
+    assert failed == ['https://github.com/o/r/pull/gone']
+    nodes = {n['id']: n for page in (first, second) for n in json.load(open(page))['data']['repository']['pullRequests']['nodes']}
+    assert [f['path'] for f in nodes['A']['files']['nodes']] == ['A/F%d.java' % i for i in range(250)]
+    assert [f['path'] for f in nodes['B']['files']['nodes']] == ['B/F%d.java' % i for i in range(150)]
+    assert nodes['A']['files']['pageInfo'] == {'endCursor': 'c250', 'hasNextPage': False}
+    assert len(nodes['C']['files']['nodes']) == 1
+    assert len(nodes['gone']['files']['nodes']) == 100
+    # several PRs per query
+    assert any(query.count('node(id:') == 2 for query in queries)
+    # nothing left to complete but the failed one
+    assert [pr['id'] for pr in file_fetcher.truncated_prs([first, second])] == ['gone']
@@ -0,0 +1,25 @@
+import os
+import subprocess
+import sys
+import pytest
+
+# the fetch and parse entry points stay light, see bench.py's import_<module> stages
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY = ('pandas', 'numpy', 'matplotlib', 'seaborn', 'scipy', 'statsmodels', 'requests')
+
+def loaded(code):
+    out = subprocess.run([sys.executable, '-c', code + '; import sys; print(" ".join(sorted(sys.modules)))'],
+                         check=True, capture_output=True, text=True, cwd=ROOT).stdout
+    return set(out.split())
+
+@pytest.mark.parametrize('module', ['page_reader', 'files', 'fetcher', 'async_fetcher', 'file_fetcher', 'refresh'])
+def test_light_imports(module):
+    assert sorted(loaded('import ' + module) & set(HEAVY)) == []
+
+def test_star_import_has_plots():
+    names = loaded('from utils import *; assert all(callable(f) for f in '
+                   '(plot_means, plot_ci_means, plot_ci_generic_means, old_plot_ci_means, ci_pointplot, nodeProcessor)); pd.DataFrame')
+    assert 'matplotlib' in names
+    # a plain import still does not load them
+    assert 'matplotlib' not in loaded('import utils')
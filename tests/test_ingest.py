@@ -0,0 +1,28 @@
+import os
+import pandas as pd
+import bench
+import ingest
+import utils
+
+# the parallel ingest against parsing the same pages serially
+
+def rows(df):
+    return df.sort_values(['url', 'prod_file']).reset_index(drop=True)
+
+def test_parts_equal_serial_parse(tmp_path):
+    files = bench.gen_cache(str(tmp_path / 'cached'), pages=6, prs=40)
+    (tmp_path / 'cached' / 'bad.json').write_text('{"data": ')
+    files.append(str(tmp_path / 'cached' / 'bad.json'))
+    parts, failed = ingest.ingest(files, utils.parse_files, str(tmp_path / 'parts'), workers=2)
+    assert len(parts) > 1
+    assert failed == [str(tmp_path / 'cached' / 'bad.json')]
+    serial, _ = utils.parse_files(files[:-1])
+    pd.testing.assert_frame_equal(rows(ingest.read_parts(parts)), rows(serial), check_dtype=False)
+
+def test_failed_write_fails_its_files(tmp_path):
+    files = bench.gen_cache(str(tmp_path / 'cached'), pages=2, prs=5)
+    r = ingest.parse_chunk(utils.parse_files, files, str(tmp_path / 'missing' / 'part-00000.parquet'))
+    assert r['part'] is None
+    assert r['rows'] == 0
+    assert r['failed'] == files
+    assert not os.path.exists(tmp_path / 'missing')
@@ -0,0 +1,44 @@
+import pandas as pd
+import pytest
+import memo
+import utils
+
+@pytest.fixture
+def memo_dir(tmp_path):
+    memo.enable(str(tmp_path / 'memo'))
+    yield
+    memo.disable()
+
+def frames():
+    mined = pd.DataFrame({'url': ['u1', 'u1', 'u2'], 'pr_group': ['g', 'g', 'irrelevant'],
+                          'commit': ['c1', 'c2', 'c3'], 'refactoringType': ['RENAME_METHOD'] * 3,
+                          'classesBefore': ['a.Foo', 'a.Bar', 'a.Baz'], 'classesAfter': ['a.Foo', 'a.Foo', 'a.Baz']})
+    reviewed = pd.DataFrame({'url': ['u1', 'u2'], 'pr_group': ['g', 'irrelevant'],
+                             'prod_file': ['src/main/java/a/Foo.java', 'src/main/java/a/Qux.java']})
+    return mined, reviewed
+
+def test_merge_refs_same_on_miss_and_hit(memo_dir):
+    results = []
+    for _ in range(2):
+        mined, reviewed = frames()
+        results.append(utils.merge_refs_on_prod_file(mined, reviewed))
+        # the arguments are left as they were, memo hit or not
+        pd.testing.assert_frame_equal(mined, frames()[0])
+        pd.testing.assert_frame_equal(reviewed, frames()[1])
+    pd.testing.assert_frame_equal(results[0], results[1])
+    assert sorted(results[0]['commit']) == ['c1', 'c2', 'c3']
+
+def test_get_3k_mined_leaves_prs_to_mine(memo_dir, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / 'mined').mkdir()
+    (tmp_path / 'mined' / 'o_r_1.csv').write_text('commit;refactoringType;refactoringName;classesBefore;classesAfter;description\n'
+                                                   'c1;RENAME_METHOD;Rename Method;a.B;a.B;rename x\n')
+    def prs():
+        return pd.DataFrame({'url': ['https://github.com/o/r/pull/1', 'https://github.com/o/r/pull/2'], 'test_pairs': [1, 0]})
+    results = []
+    for _ in range(2):
+        prs_to_mine = prs()
+        results.append(utils.get_3k_mined(prs_to_mine))
+        pd.testing.assert_frame_equal(prs_to_mine, prs())
+    pd.testing.assert_frame_equal(results[0], results[1])
+    assert list(results[0]['commit']) == ['c1']
@@ -0,0 +1,48 @@
+import json
+import os
+import metrics
+
+def read(path):
+    return [json.loads(l) for l in path.read_text().splitlines()]
+
+def test_off_by_default(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    assert metrics.METRICS_FILE == ''
+    with metrics.timer('stage', files=3):
+        pass
+    assert os.listdir(tmp_path) == []
+
+def test_opened_once_per_file(tmp_path):
+    first, second = tmp_path / 'a.jsonl', tmp_path / 'b.jsonl'
+    metrics.enable(str(first))
+    try:
+        with metrics.timer('stage', files=3):
+            pass
+        f = metrics._file
+        metrics.log('event', n=1)
+        assert metrics._file is f
+        metrics.enable(str(second))
+        metrics.log('event', n=2)
+        assert f.closed
+    finally:
+        metrics.disable()
+    assert [l['event'] for l in read(first)] == ['stage', 'event']
+    assert read(first)[0]['files_per_s'] > 0
+    assert [l['n'] for l in read(second)] == [2]
+
+def test_forked_child_appends(tmp_path):
+    path = tmp_path / 'm.jsonl'
+    metrics.enable(str(path))
+    try:
+        metrics.log('parent')
+        pid = os.fork()
+        if pid == 0:
+            metrics.log('child')
+            os._exit(0)
+        os.waitpid(pid, 0)
+        metrics.log('parent')
+    finally:
+        metrics.disable()
+    lines = read(path)
+    assert [l['event'] for l in lines] == ['parent', 'child', 'parent']
+    assert lines[1]['pid'] == pid
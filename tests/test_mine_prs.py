@@ -0,0 +1,73 @@
+import os
+import sys
+import pandas as pd
+import scheduler
+import utils
+
+# mine_prs with stub commands: a batch that mines all of its PRs but one and fails
+
+BATCH = ('import csv, sys\\n'
+         'rows = list(csv.DictReader(open(sys.argv[1])))\\n'
+         'for r in rows:\\n'
+         '    if r["pull_req_id"] != "2":\\n'
+         '        open(r["refminerFilename"], "w").write("header\\\\n")\\n'
+         'raise SystemExit(1)')
+
+def stub_batch(batch_file):
+    return [sys.executable, '-c', eval("'" + BATCH + "'"), batch_file]
+
+def stub_single(fname, repo_url, pull_req_id, local_repo=None):
+    return [sys.executable, '-c', 'open(%r, "w").write("header\\n")' % fname]
+
+def prs(n):
+    return pd.DataFrame({'url': ['https://github.com/o/r/pull/%d' % i for i in range(1, n + 1)]})
+
+def test_failed_batch_mines_the_rest_one_by_one(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / 'mined').mkdir()
+    monkeypatch.setattr(utils, 'batch_command', stub_batch)
+    monkeypatch.setattr(utils, 'mining_command', stub_single)
+    results = utils.mine_prs(prs(4), workers=2, retries=0, backoff=0, batch_size=4)
+    assert sorted(p.name for p in (tmp_path / 'mined').iterdir()) == ['o_r_%d.csv' % i for i in range(1, 5)]
+    # the batch and only the PR it did not mine
+    batch = next(k for k in results if k.startswith('batch_'))
+    assert results == {batch: False, 'o_r_2': True}
+
+def test_batch_ids_depend_on_all_prs(tmp_path):
+    df = utils.enrich_mine_df(prs(6))
+    ids = [j['id'] for j in utils.write_mining_batches(df, 3, batch_dir=str(tmp_path))]
+    other = [j['id'] for j in utils.write_mining_batches(df.iloc[[0, 2, 3, 4]], 3, batch_dir=str(tmp_path))]
+    assert len(set(ids + other)) == 4
+    assert all(i.startswith('batch_') for i in ids)
+
+def test_gave_up_batch_is_not_skipped_forever(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / 'mined').mkdir()
+    monkeypatch.setattr(utils, 'mining_command', stub_single)
+    # the batch of both PRs gave up in an earlier run
+    batch = utils.write_mining_batches(utils.enrich_mine_df(prs(2)), 2)[0]['id']
+    scheduler.Ledger().write(batch, 'gave_up', attempt=0)
+    assert utils.mine_prs(prs(2), workers=1, retries=0, backoff=0, batch_size=2) == {'o_r_1': True, 'o_r_2': True}
+
+def test_mirrors_evicted_beyond_limit(tmp_path, monkeypatch):
+    from test_mirror import make_repo
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / 'mined').mkdir()
+    # github.com/o/r and o/s are local repositories
+    for name in ('r', 's'):
+        make_repo(str(tmp_path / 'gh' / 'o' / (name + '.git')))
+    monkeypatch.setenv('GIT_CONFIG_COUNT', '1')
+    monkeypatch.setenv('GIT_CONFIG_KEY_0', 'url.file://%s/gh/.insteadOf' % tmp_path)
+    monkeypatch.setenv('GIT_CONFIG_VALUE_0', 'https://github.com/')
+    used = []
+
+    def single(fname, repo_url, pull_req_id, local_repo=None):
+        used.append(local_repo)
+        return stub_single(fname, repo_url, pull_req_id)
+    monkeypatch.setattr(utils, 'mining_command', single)
+    df = pd.DataFrame({'url': ['https://github.com/o/r/pull/1', 'https://github.com/o/s/pull/1']})
+    results = utils.mine_prs(df, workers=1, retries=0, backoff=0, use_mirrors=True, mirror_max_bytes=1)
+    assert results == {'o_r_1': True, 'o_s_1': True}
+    assert all(path and path.endswith('.git') for path in used)
+    # the mirror of the first job was evicted by the second, the one in use was kept
+    assert [m for m in os.listdir(tmp_path / 'mirrors') if m.endswith('.git')] == [os.path.basename(used[-1])]
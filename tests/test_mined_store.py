@@ -0,0 +1,67 @@
+import gzip
+from concurrent.futures import ThreadPoolExecutor
+import mined_store
+from mined_store import load_mined
+
+HEADER = 'commit;refactoringType;refactoringName;classesBefore;classesAfter;description\n'
+ROW = 'c1;RENAME_METHOD;Rename Method;a.B;a.B;rename x\n'
+
+def write(path, rows, gz=False):
+    text = HEADER + ROW * rows
+    if gz:
+        path.write_bytes(gzip.compress(text.encode()))
+    else:
+        path.write_text(text)
+    return str(path)
+
+def test_csv_and_gz_and_truncated(tmp_path):
+    files = [write(tmp_path / 'o_r_1.csv', 3), write(tmp_path / 'o_r_2.csv.gz', 2, gz=True)]
+    data = gzip.compress((HEADER + ROW * 100).encode())
+    (tmp_path / 'o_r_3.csv.gz').write_bytes(data[:len(data) // 2])
+    files.append(str(tmp_path / 'o_r_3.csv.gz'))
+    mined = load_mined(files, cache=str(tmp_path / 'mined.parquet'))
+    assert mined.groupby('prid').size().to_dict() == {'o_r_1': 3, 'o_r_2': 2}
+
+def test_rewritten_file_replaces_its_rows(tmp_path):
+    cache = str(tmp_path / 'mined.parquet')
+    fname = write(tmp_path / 'o_r_1.csv', 3)
+    other = write(tmp_path / 'o_r_2.csv', 1)
+    assert len(load_mined([fname, other], cache=cache)) == 4
+    write(tmp_path / 'o_r_1.csv', 5)
+    assert len(load_mined([fname, other], cache=cache)) == 6
+    # header only now
+    write(tmp_path / 'o_r_1.csv', 0)
+    assert len(load_mined([fname, other], cache=cache)) == 1
+    assert len(load_mined([fname], cache=cache)) == 0
+
+def test_concurrent_loads_do_not_duplicate(tmp_path):
+    cache = str(tmp_path / 'mined.parquet')
+    files = [write(tmp_path / ('o_r_%d.csv' % i), 2) for i in range(20)]
+    with ThreadPoolExecutor(4) as executor:
+        sizes = list(executor.map(lambda _: len(load_mined(files, cache=cache)), range(4)))
+    assert sizes == [40] * 4
+    assert len(load_mined(files, cache=cache)) == 40
+
+def test_other_columns_are_skipped(tmp_path):
+    good = write(tmp_path / 'o_r_1.csv', 2)
+    bad = tmp_path / 'o_r_2.csv'
+    bad.write_text('x;y\n' + '1;2\n' * 100)
+    mined = load_mined([good, str(bad)], cache=str(tmp_path / 'mined.parquet'))
+    assert mined['prid'].unique().tolist() == ['o_r_1']
+
+def test_files_without_rows_are_read_once(tmp_path, monkeypatch):
+    cache = str(tmp_path / 'mined.parquet')
+    files = [write(tmp_path / 'o_r_1.csv', 2), write(tmp_path / 'o_r_2.csv', 0)]
+    data = gzip.compress((HEADER + ROW * 100).encode())
+    (tmp_path / 'o_r_3.csv.gz').write_bytes(data[:len(data) // 2])
+    files.append(str(tmp_path / 'o_r_3.csv.gz'))
+    assert len(load_mined(files, cache=cache)) == 2
+    read = []
+    original = mined_store.read_mined_file
+    monkeypatch.setattr(mined_store, 'read_mined_file', lambda f: read.append(f) or original(f))
+    assert len(load_mined(files, cache=cache)) == 2
+    assert read == []
+    # once written, its rows are there
+    write(tmp_path / 'o_r_2.csv', 3)
+    assert len(load_mined(files, cache=cache)) == 5
+    assert read == [files[1]]
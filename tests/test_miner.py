@@ -0,0 +1,14 @@
+import pandas as pd
+from miner import split_pr_urls
+
+def test_split_pr_urls():
+    urls = pd.Series(['https://github.com/o/r/pull/12', 'https://github.com/o/r.x/pull/3/',
+                      'https://github.com/o/r/pull/4/files?diff=split', 'https://github.com/o/r', 'not a url'],
+                     index=[5, 6, 7, 8, 9])
+    df = split_pr_urls(urls)
+    assert list(df.index) == [5, 6, 7, 8, 9]
+    assert df.to_dict('list') == {
+        'repo_url': ['https://github.com/o/r.git', 'https://github.com/o/r.x.git', 'https://github.com/o/r.git',
+                     'https://github.com/o/r', 'not a url'],
+        'pull_req_id': ['12', '3', '4', 'https://github.com/o/r', 'not a url'],
+        'prid': ['o_r_12', 'o_r.x_3', 'o_r_4', 'https:__github.com_o_r', 'not a url']}
@@ -0,0 +1,59 @@
+import fcntl
+import os
+import subprocess
+import threading
+import mirror
+
+# mirrors of local repositories, no network
+
+def git(cwd, *args):
+    return subprocess.run(['git'] + list(args), cwd=cwd, check=True, capture_output=True, text=True).stdout.strip()
+
+def make_repo(path):
+    os.makedirs(path)
+    git(path, 'init', '-q', '-b', 'master')
+    git(path, 'config', 'user.email', 't@t')
+    git(path, 'config', 'user.name', 't')
+    commit(path, 'a.txt', 'first')
+    git(path, 'update-ref', 'refs/pull/1/head', 'HEAD')
+    return 'file://' + path
+
+def commit(path, fname, text):
+    with open(os.path.join(path, fname), 'w') as f:
+        f.write(text)
+    git(path, 'add', fname)
+    git(path, 'commit', '-q', '-m', text)
+    return git(path, 'rev-parse', 'HEAD')
+
+def test_clone_and_fetch(tmp_path):
+    url = make_repo(str(tmp_path / 'src'))
+    mirrors = str(tmp_path / 'mirrors')
+    path = mirror.ensure_mirror(url, mirrors)
+    assert git(path, 'rev-parse', 'refs/pull/1/head') == git(str(tmp_path / 'src'), 'rev-parse', 'HEAD')
+    head = commit(str(tmp_path / 'src'), 'b.txt', 'second')
+    # fresh, not fetched again
+    mirror.ensure_mirror(url, mirrors)
+    assert git(path, 'rev-parse', 'master') != head
+    mirror.ensure_mirror(url, mirrors, max_age=-1)
+    assert git(path, 'rev-parse', 'master') == head
+
+def test_fresh_mirror_does_not_wait_for_miner(tmp_path):
+    url = make_repo(str(tmp_path / 'src'))
+    mirrors = str(tmp_path / 'mirrors')
+    with mirror.use_mirrors([url], mirrors) as paths:
+        # a second job on the same repository while the first one mines
+        t = threading.Thread(target=mirror.ensure_mirror, args=(url, mirrors))
+        t.start()
+        t.join(5)
+        assert not t.is_alive()
+        assert os.path.isdir(paths[url])
+
+def test_evict_skips_mirrors_in_use(tmp_path):
+    urls = [make_repo(str(tmp_path / name)) for name in ('a', 'b')]
+    mirrors = str(tmp_path / 'mirrors')
+    for url in urls:
+        mirror.ensure_mirror(url, mirrors)
+    with mirror.locked(mirror.mirror_path(urls[0], mirrors), fcntl.LOCK_SH):
+        evicted = mirror.evict(0, mirrors)
+    assert evicted == [mirror.mirror_path(urls[1], mirrors)]
+    assert os.path.isdir(mirror.mirror_path(urls[0], mirrors))
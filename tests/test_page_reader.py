@@ -0,0 +1,36 @@
+import json
+import pytest
+import page_reader
+
+# the streamed nodes (threshold 0) against json.load
+
+NODES = [{'url': 'https://github.com/o/r/pull/%d' % i, 'number': i, 'title': 'x "y" é', 'state': 'OPEN',
+          'bodyText': '', 'changedFiles': 2, 'ratio': 0.5, 'merged': None, 'labels': {'nodes': [{'name': 'bug'}]},
+          'files': {'totalCount': 2, 'nodes': [{'path': 'A.java', 'additions': 1, 'deletions': 0},
+                                               {'path': 'ATest.java', 'additions': 2, 'deletions': 1}]}}
+         for i in range(3)]
+PAGES = {
+    'nodes': {'data': {'repository': {'pullRequests': {'pageInfo': {'endCursor': 'c'}, 'nodes': NODES}}}},
+    'empty': {'data': {'repository': {'pullRequests': {'nodes': []}}}},
+    'errors_after': {'data': {'repository': {'pullRequests': {'nodes': NODES}}}, 'errors': [{'message': 'timeout'}]},
+    'errors_before': {'errors': [{'message': 'timeout'}], 'data': {'repository': {'pullRequests': {'nodes': NODES}}}},
+    'no_repository': {'data': {'repository': None}, 'errors': [{'type': 'NOT_FOUND'}]},
+    'no_data': {'message': 'Bad credentials'},
+}
+
+def expected(js, fields):
+    repository = (js.get('data') or {}).get('repository')
+    if not repository or js.get('errors'):
+        return []
+    return [page_reader.trim(n, fields) for n in repository['pullRequests']['nodes']]
+
+@pytest.mark.parametrize('name', sorted(PAGES))
+@pytest.mark.parametrize('fields', [None, page_reader.NODE_FIELDS])
+def test_streamed_same_as_json(tmp_path, monkeypatch, name, fields):
+    monkeypatch.setattr(page_reader, 'STREAM_MIN_BYTES', 0)
+    fname = str(tmp_path / 'p.json')
+    with open(fname, 'w') as f:
+        json.dump(PAGES[name], f)
+    assert page_reader.should_stream(fname, None)
+    assert page_reader.read_page_nodes(fname, fields) == expected(PAGES[name], fields)
+    assert page_reader.read_page_nodes(fname, fields, streaming=False) == expected(PAGES[name], fields)
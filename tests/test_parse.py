@@ -0,0 +1,33 @@
+import functools
+import json
+import utils
+
+# node processors get the fields they declare, whole nodes when they declare none
+
+def write_page(path):
+    node = {'url': 'https://github.com/o/r/pull/1', 'number': 1, 'title': 't', 'state': 'OPEN', 'id': 'PR_1',
+            'bodyText': 'b', 'changedFiles': 2, 'updatedAt': '2020-01-01T00:00:00Z',
+            'labels': {'nodes': [{'name': 'bug'}]},
+            'files': {'nodes': [{'path': 'src/main/java/A.java', 'additions': 1, 'deletions': 0},
+                                {'path': 'src/test/java/ATest.java', 'additions': 2, 'deletions': 0}]}}
+    path.write_text(json.dumps({'data': {'repository': {'pullRequests': {'nodes': [node]}}}}))
+    return str(path)
+
+def labels(fname, n):
+    yield {'url': n['url'], 'id': n['id'], 'labels': len(n['labels']['nodes'])}
+
+def test_custom_processor_gets_whole_nodes(tmp_path):
+    fname = write_page(tmp_path / 'p.json')
+    df, failed = utils.parse_files([fname], labels)
+    assert failed == []
+    assert df.to_dict('records') == [{'url': 'https://github.com/o/r/pull/1', 'id': 'PR_1', 'labels': 1}]
+
+def test_declared_and_explicit_fields(tmp_path):
+    fname = write_page(tmp_path / 'p.json')
+    seen = []
+    def keys(fname, n):
+        seen.append(sorted(n))
+    utils.process_file(fname, keys, fields=('url', 'id'))
+    assert seen == [['id', 'url']]
+    assert len(utils.process_multiple_files([fname])) == 1
+    assert len(utils.process_multiple_files([fname], functools.partial(utils.nodeProcessor, max_changed_files=None))) == 1
@@ -0,0 +1,45 @@
+import json
+import os
+import pr_store
+
+def write_page(path, prs):
+    nodes = [{'url': 'https://github.com/o/r/pull/%d' % n, 'number': n, 'title': title, 'state': 'OPEN', 'id': str(n),
+              'bodyText': '', 'changedFiles': 1, 'labels': {'nodes': []},
+              'files': {'totalCount': 1, 'nodes': [{'path': 'A%d.java' % n, 'additions': 1, 'deletions': 0}]}}
+             for n, title in prs]
+    path.write_text(json.dumps({'data': {'repository': {'pullRequests': {'nodes': nodes}}}}))
+
+def test_changed_and_deleted_pages(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    os.makedirs('cached')
+    write_page(tmp_path / 'cached' / 'a.json', [(1, 'one'), (2, 'two')])
+    write_page(tmp_path / 'cached' / 'b.json', [(3, 'three')])
+    assert pr_store.ingest_cache(store_dir='store') == 2
+    assert pr_store.ingest_cache(store_dir='store') == 0
+    # rewritten in place like file_fetcher/refresh do
+    write_page(tmp_path / 'cached' / 'a.json', [(1, 'one again')])
+    os.utime('cached/a.json', ns=(1, 1))
+    assert pr_store.ingest_cache(store_dir='store') == 1
+    prs = pr_store.load_prs(['url', 'title'], store_dir='store').sort_values('url')
+    assert prs['title'].tolist() == ['one again', 'three']
+    assert sorted(pr_store.load_files(['path'], store_dir='store')['path']) == ['A1.java', 'A3.java']
+    os.remove('cached/b.json')
+    pr_store.ingest_cache(store_dir='store')
+    assert pr_store.load_prs(['title'], store_dir='store')['title'].tolist() == ['one again']
+    assert pr_store.ingested_files('store') == {'cached/a.json'}
+    assert [n['title'] for _, n in pr_store.iter_nodes('store')] == ['one again']
+
+def test_uncommitted_batch_is_invisible(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    os.makedirs('cached')
+    write_page(tmp_path / 'cached' / 'a.json', [(1, 'one')])
+    pr_store.ingest_cache(store_dir='store')
+    # parts of a crashed ingest without a manifest entry
+    write_page(tmp_path / 'cached' / 'b.json', [(2, 'two')])
+    prs, files = [], []
+    pr_store.page_rows('cached/b.json', prs, files, '1-0')
+    pr_store.write_table(prs, pr_store.PR_SCHEMA, 'store', 'prs', '1-0')
+    assert pr_store.load_prs(['title'], store_dir='store')['title'].tolist() == ['one']
+    assert pr_store.ingest_cache(store_dir='store') == 1
+    assert sorted(pr_store.load_prs(['title'], store_dir='store')['title']) == ['one', 'two']
+    assert sorted(pr_store.load_files(['path'], store_dir='store')['path']) == ['A1.java', 'A2.java']
@@ -0,0 +1,36 @@
+import pandas as pd
+import ref_counts
+
+def frame():
+    return pd.DataFrame({'url': ['u1', 'u1', 'u1', 'u2', 'u3', 'u3', None],
+                         'refactoringType': ['A', 'A', 'B', 'B', 'C', None, 'A'],
+                         'with_test_pairs': [True, True, True, True, False, False, True],
+                         'commit': list('abcdefg')})
+
+def test_counts_equal_groupby():
+    mined = frame()
+    counts = ref_counts.ref_counts(mined)
+    for flag in (True, False):
+        # like pd.crosstab, rows without url or type are not counted
+        sel = mined[mined.with_test_pairs == flag].dropna(subset=['url', 'refactoringType'])
+        expected = pd.crosstab(sel.url, sel.refactoringType)
+        pd.testing.assert_frame_equal(counts.frame(flag), expected, check_dtype=False, check_names=False,
+                                      check_index_type=False, check_column_type=False)
+        sizes = sel.groupby('refactoringType').size()
+        assert counts.sums(flag).to_dict() == sizes.to_dict()
+        assert (counts.means(flag) == sizes / sel.url.nunique()).all()
+    assert counts.frame(True).loc['u1', 'A'] == 2
+
+def test_changed_frame_gets_new_counts():
+    mined = frame()
+    first = ref_counts.ref_counts(mined)
+    # an equal frame reuses the counts, another column does not matter
+    assert ref_counts.ref_counts(frame().assign(commit='x')) is first
+    mined.loc[3, 'refactoringType'] = 'A'
+    second = ref_counts.ref_counts(mined)
+    assert second is not first
+    assert ref_counts.fingerprint(mined) != ref_counts.fingerprint(frame())
+    assert second.frame(True).loc['u2', 'A'] == 1
+    assert second.frame(True).loc['u2', 'B'] == 0
+    mined.loc[0, 'with_test_pairs'] = False
+    assert ref_counts.ref_counts(mined).frame(False).loc['u1', 'A'] == 1
@@ -0,0 +1,70 @@
+import asyncio
+import json
+import re
+from aiohttp import web
+import refresh
+from test_async_fetcher import serve
+
+# a local GraphQL endpoint with the PRs of o/r ordered by updatedAt, two per page
+
+def pr(number, updated, title='t'):
+    return {'url': 'https://github.com/o/r/pull/%d' % number, 'number': number, 'title': title, 'updatedAt': updated}
+
+def pages_js(nodes, cursor, has_next):
+    return {'data': {'rateLimit': {'cost': 1, 'remaining': 4000, 'resetAt': '2030-01-01T00:00:00Z'},
+                     'repository': {'pullRequests': {'pageInfo': {'endCursor': cursor, 'hasNextPage': has_next},
+                                                     'totalCount': 4, 'nodes': nodes}}}}
+
+def write(path, nodes):
+    path.write_text(json.dumps({'data': {'repository': {'pullRequests': {'nodes': nodes}}}}))
+
+def test_project_pages_exact(tmp_path):
+    for name in ('o_r.json', 'o_r_Y3Vyc29yOnYyOpHOAA==.json', 'o_r_updated_123.json',
+                 'o_r_x.json', 'o_r_x_Y3Vyc29yOnYyOpHOAA==.json', 'o_r_x_updated_1.json', 'o_r.json.tmp'):
+        (tmp_path / name).write_text('{}')
+    assert sorted(f.split('/')[-1] for f in refresh.project_pages('o/r', str(tmp_path))) == [
+        'o_r.json', 'o_r_Y3Vyc29yOnYyOpHOAA==.json', 'o_r_updated_123.json']
+
+def test_stops_at_seen_prs_and_rewrites_pages(tmp_path):
+    cache = tmp_path / 'cached'
+    cache.mkdir()
+    write(cache / 'o_r.json', [pr(1, '2022-01-01T00:00:00Z'), pr(2, '2022-02-01T00:00:00Z')])
+    # another project whose name starts like this one, newer: it must not move the mark
+    write(cache / 'o_r_x.json', [pr(9, '2022-09-01T00:00:00Z')])
+    remote = [pr(3, '2022-05-01T00:00:00Z', 'new'), pr(2, '2022-04-01T00:00:00Z', 'edited'),
+              pr(1, '2022-01-01T00:00:00Z'), pr(0, '2021-01-01T00:00:00Z')]
+    queries = []
+
+    async def handler(request):
+        query = (await request.json())['query']
+        queries.append(query)
+        assert 'orderBy: {field: UPDATED_AT, direction: DESC}' in query
+        m = re.search(r'after:"c(\d+)"', query)
+        start = int(m.group(1)) if m else 0
+        return web.json_response(pages_js(remote[start:start + 2], 'c%d' % (start + 2), start + 2 < len(remote)))
+
+    state_file = str(tmp_path / 'state.json')
+
+    async def run():
+        runner, url = await serve(handler)
+        try:
+            return await refresh.refresh_projects_async(['o/r'], concurrency=1, cache_dir=str(cache),
+                                                        state_file=state_file, url=url, max_retries=0)
+        finally:
+            await runner.cleanup()
+
+    assert asyncio.run(run()) == {'o/r': (1, 1)}
+    # the second page has an older PR, the one after it is not requested
+    assert len(queries) == 2
+    assert [n['title'] for n in json.loads((cache / 'o_r.json').read_text())['data']['repository']['pullRequests']['nodes']] == ['t', 'edited']
+    updated = [f for f in cache.iterdir() if f.name.startswith('o_r_updated_')]
+    assert len(updated) == 1
+    assert [n['number'] for n in json.loads(updated[0].read_text())['data']['repository']['pullRequests']['nodes']] == [3]
+    assert json.loads((cache / 'o_r_x.json').read_text())['data']['repository']['pullRequests']['nodes'] == [pr(9, '2022-09-01T00:00:00Z')]
+    assert json.load(open(state_file)) == {'o/r': '2022-05-01T00:00:00Z'}
+    # nothing changed since: one request, no page written
+    queries.clear()
+    mtimes = {f.name: f.stat().st_mtime_ns for f in cache.iterdir()}
+    assert asyncio.run(run()) == {'o/r': (0, 0)}
+    assert len(queries) == 1
+    assert {f.name: f.stat().st_mtime_ns for f in cache.iterdir()} == mtimes
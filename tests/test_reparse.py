@@ -0,0 +1,42 @@
+import os
+import shutil
+import pandas as pd
+import bench
+import utils
+
+# reparse_files(incremental=True) after changes to the cache against a full reparse, compared as written
+
+def rows(df):
+    return df.sort_values(['fname', 'url', 'prod_file']).reset_index(drop=True)
+
+def full(tmp_path):
+    utils.reparse_files(out_file=str(tmp_path / 'full.csv'), manifest_file=str(tmp_path / 'full.manifest.csv'), workers=2)
+    return rows(pd.read_csv(tmp_path / 'full.csv'))
+
+def incremental(tmp_path):
+    utils.reparse_files(incremental=True, out_file=str(tmp_path / 'out.csv'), manifest_file=str(tmp_path / 'out.manifest.csv'), workers=2)
+    return rows(pd.read_csv(tmp_path / 'out.csv'))
+
+def test_incremental_equals_full(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    files = [os.path.relpath(f, tmp_path) for f in bench.gen_cache(str(tmp_path / 'cached'), pages=4, prs=30, seed=1)]
+    other = bench.gen_cache(str(tmp_path / 'other'), pages=5, prs=30, seed=2)
+    first = incremental(tmp_path)
+    pd.testing.assert_frame_equal(first, full(tmp_path))
+    # a page rewritten, one added, one removed
+    shutil.copy(other[0], files[0])
+    shutil.copy(other[4], 'cached')
+    os.remove(files[3])
+    second = incremental(tmp_path)
+    assert not second.equals(first)
+    pd.testing.assert_frame_equal(second, full(tmp_path))
+    # unchanged: nothing parsed, same rows
+    pd.testing.assert_frame_equal(incremental(tmp_path), second)
+
+def test_empty_previous_output_parses_all(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    bench.gen_cache(str(tmp_path / 'cached'), pages=3, prs=30)
+    incremental(tmp_path)
+    for text in ('', 'a,b\n1,2\n'):
+        (tmp_path / 'out.csv').write_text(text)
+        pd.testing.assert_frame_equal(incremental(tmp_path), full(tmp_path))
@@ -0,0 +1,47 @@
+import json
+import sys
+from scheduler import run_jobs, pending_jobs, read_ledger
+
+# stub commands instead of mvn: write the output, maybe fail or hang
+
+def stub(output, rc=0, sleep=0):
+    code = 'import time; open(%r, "w").write("header\\n"); time.sleep(%r); raise SystemExit(%d)' % (output, sleep, rc)
+    return [sys.executable, '-c', code]
+
+def run(tmp_path, jobs, **kwargs):
+    return run_jobs(jobs, workers=2, retries=1, backoff=0, ledger=str(tmp_path / 'ledger.jsonl'),
+                    log_dir=str(tmp_path / 'logs'), **kwargs)
+
+def test_done_failed_and_timeout(tmp_path):
+    out = {name: str(tmp_path / (name + '.csv')) for name in ('ok', 'bad', 'slow')}
+    jobs = [{'id': 'ok', 'output': out['ok'], 'cmd': stub(out['ok'])},
+            {'id': 'bad', 'output': out['bad'], 'cmd': stub(out['bad'], rc=1)},
+            {'id': 'slow', 'output': out['slow'], 'cmd': stub(out['slow'], sleep=30)}]
+    assert run(tmp_path, jobs, timeout=1) == {'ok': True, 'bad': False, 'slow': False}
+    state = read_ledger(str(tmp_path / 'ledger.jsonl'))
+    assert {k: v['status'] for k, v in state.items()} == {'ok': 'done', 'bad': 'gave_up', 'slow': 'gave_up'}
+    # no partial outputs that would look finished
+    assert (tmp_path / 'ok.csv').exists()
+    assert not (tmp_path / 'bad.csv').exists()
+    assert not (tmp_path / 'slow.csv').exists()
+    # a restart runs nothing, with retry_failed the failed ones again
+    assert run(tmp_path, jobs, timeout=1) == {}
+    assert [j['id'] for j in pending_jobs(jobs, str(tmp_path / 'ledger.jsonl'), retry_failed=True)] == ['bad', 'slow']
+
+def test_ledger_over_existing_output(tmp_path):
+    output = tmp_path / 'x.csv'
+    output.write_text('header\n')
+    ledger = tmp_path / 'ledger.jsonl'
+    jobs = [{'id': 'x', 'output': str(output), 'cmd': stub(str(output))},
+            {'id': 'old', 'output': str(output), 'cmd': stub(str(output))}]
+    # interrupted while x was mining, old was mined before the ledger
+    ledger.write_text(json.dumps({'id': 'x', 'status': 'started', 'attempt': 0}) + '\n')
+    assert [j['id'] for j in pending_jobs(jobs[:1], str(ledger))] == ['x']
+    assert pending_jobs(jobs[1:], str(ledger)) == []
+
+def test_exit_0_without_output_is_not_done(tmp_path):
+    output = str(tmp_path / 'x.csv')
+    jobs = [{'id': 'x', 'output': output, 'cmd': [sys.executable, '-c', 'pass']}]
+    assert run(tmp_path, jobs, timeout=10) == {'x': False}
+    statuses = [json.loads(l)['status'] for l in open(tmp_path / 'ledger.jsonl')]
+    assert statuses == ['started', 'failed', 'started', 'failed', 'gave_up']
@@ -0,0 +1,49 @@
+import argparse
+import pandas as pd
+import pytest
+import bench
+import schema
+import utils
+
+# the analysis on compact frames (schema.read_csv, as utils.load_frame loads them) against plain ones
+
+@pytest.fixture(scope='module')
+def csvs(tmp_path_factory):
+    work = tmp_path_factory.mktemp('schema')
+    args = argparse.Namespace(pages=4, prs=50, max_files=15, body_words=20, mined=200, refs=20, projects=5, seed=42)
+    ctx = bench.prepare(args, str(work))
+    # two commits per PR, some of them change more classes than the PR has .java files
+    mined = ctx['mined']
+    mined['commit'] = mined['prid'].astype(str) + '_' + (mined.index % 2).astype(str)
+    mined.to_csv(work / 'mined.csv', index=False)
+    ctx['changed'].to_csv(work / 'changed.csv', index=False)
+    return work / 'mined.csv', work / 'changed.csv'
+
+def plain(df):
+    df = df.copy()
+    for c in df.columns:
+        if isinstance(df[c].dtype, pd.CategoricalDtype):
+            df[c] = df[c].astype(object)
+    return df.reset_index(drop=True)
+
+def test_load_frame_is_compact(csvs):
+    mined = utils.load_frame(csvs[0])
+    assert isinstance(mined['refactoringType'].dtype, pd.CategoricalDtype)
+    assert mined['test_pairs'].dtype == 'int32'
+    assert mined.memory_usage(deep=True).sum() < pd.read_csv(csvs[0]).memory_usage(deep=True).sum()
+
+@pytest.mark.parametrize('shared', [False, True])
+def test_same_results(csvs, shared):
+    mined, changed = pd.read_csv(csvs[0]), pd.read_csv(csvs[1])
+    cmined, cchanged = utils.load_frame(csvs[0]), utils.load_frame(csvs[1])
+    if shared:
+        cmined, cchanged = schema.share_urls(cmined, cchanged)
+        cmined, cchanged = cmined.drop(columns='pr_id'), cchanged.drop(columns='pr_id')
+    excluded = utils.exclude_too_large_commits(mined, changed)
+    cexcluded = utils.exclude_too_large_commits(cmined, cchanged)
+    assert 0 < len(excluded) < len(mined)
+    pd.testing.assert_frame_equal(plain(cexcluded), plain(excluded), check_dtype=False)
+    means = utils.calc_means_and_counts_by_ref_type(excluded, 2)
+    cmeans = utils.calc_means_and_counts_by_ref_type(cexcluded, 2)
+    assert len(means) > 0
+    pd.testing.assert_frame_equal(plain(cmeans), plain(means), check_dtype=False)
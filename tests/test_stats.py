@@ -0,0 +1,46 @@
+import argparse
+import numpy as np
+import pandas as pd
+import pytest
+from statsmodels.stats.proportion import proportions_ztest as sm_ztest
+import bench
+import schema
+import stats
+import utils
+import legacy_stats
+
+@pytest.fixture(scope='module')
+def mined(tmp_path_factory):
+    args = argparse.Namespace(pages=1, prs=10, max_files=5, body_words=5, mined=300, refs=20, projects=5, seed=7)
+    mined = bench.prepare(args, str(tmp_path_factory.mktemp('stats')))['mined']
+    return mined.astype({'refactoringType': object, 'url': object, 'prid': object})
+
+def test_ztest_same_as_statsmodels():
+    rnd = np.random.default_rng(1)
+    nobs1, nobs2 = 500, 800
+    count1, count2 = rnd.integers(0, nobs1, 50), rnd.integers(0, nobs2, 50)
+    count1[:3] = [0, 0, nobs1]
+    count2[:3] = [0, 5, nobs2]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        expected = [sm_ztest([c1, c2], [nobs1, nobs2])[1] for c1, c2 in zip(count1, count2)]
+    np.testing.assert_allclose(stats.proportions_ztest(count1, count2, nobs1, nobs2), expected, rtol=1e-9)
+
+@pytest.mark.parametrize('compact', [False, True])
+def test_calc_means_same_as_per_type_loop(mined, compact):
+    frame = schema.compact(mined) if compact else mined
+    expected = legacy_stats.calc_means_and_counts_by_ref_type(frame, 2)
+    result = utils.calc_means_and_counts_by_ref_type(frame, 2)
+    assert len(expected) > 3
+    assert result['refactoringType'].dtype == expected['refactoringType'].dtype
+    if compact:
+        assert isinstance(result['refactoringType'].dtype, pd.CategoricalDtype)
+    pd.testing.assert_frame_equal(result[expected.columns].reset_index(drop=True), expected.reset_index(drop=True),
+                                  check_dtype=False)
+
+def test_batches_same_as_one_matrix(monkeypatch):
+    x = np.random.default_rng(3).integers(0, 5, (300, 4))
+    ci = stats.bootstrap_ci(x, n_boot=500)
+    p = stats.permutation_pvalues(x[:100], x[100:], n_perm=500)
+    monkeypatch.setattr(stats, 'BATCH', 7)
+    np.testing.assert_allclose(stats.bootstrap_ci(x, n_boot=500), ci)
+    np.testing.assert_allclose(stats.permutation_pvalues(x[:100], x[100:], n_perm=500), p)
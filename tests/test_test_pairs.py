@@ -0,0 +1,58 @@
+import random
+from test_pairs import find_test_pairs, EXTENDED_PATTERNS
+
+# the matching before test_pairs.py (miner.get_prod_files/get_test_files/calc_test_pairs)
+def legacy_pairs(files):
+    java_files = dict([(f.split('/')[-1].replace('.java', ''), f) for f in files if not 'Test.java' in f and f.endswith('.java')])
+    test_java_files = dict([(f.split('/')[-1].replace('Test.java', ''), f) for f in files if 'Test.java' in f])
+    return dict([(java_files[t], test_java_files[t]) for t in test_java_files if t in java_files])
+
+def random_pr(rnd, names):
+    files = []
+    for name in rnd.sample(names, rnd.randint(1, 8)):
+        kind = rnd.choice(['main', 'test', 'both', 'tests', 'it', 'prefix', 'other'])
+        if kind in ('main', 'both'):
+            files.append('m/src/main/java/p/%s.java' % name)
+        if kind in ('test', 'both'):
+            files.append('m/src/test/java/p/%sTest.java' % name)
+        if kind == 'tests':
+            files.append('m/src/test/java/p/%sTests.java' % name)
+        if kind == 'it':
+            files.append('m/src/test/java/p/%sIT.java' % name)
+        if kind == 'prefix':
+            files.append('m/src/test/java/p/Test%s.java' % name)
+        if kind == 'other':
+            files.append('docs/%s.md' % name)
+    rnd.shuffle(files)
+    return files
+
+def test_default_same_as_legacy_with_distinct_names():
+    rnd = random.Random(42)
+    names = ['Foo', 'Bar', 'Baz', 'Parser', 'Client', 'Server', 'Cache', 'Config', 'Util', 'Node']
+    for _ in range(2000):
+        files = random_pr(rnd, names)
+        assert find_test_pairs(files) == legacy_pairs(files)
+
+def test_extended_patterns_are_opt_in():
+    files = ['src/main/java/p/Foo.java', 'src/test/java/p/FooTests.java',
+             'src/main/java/p/Bar.java', 'src/test/java/p/BarIT.java',
+             'src/main/java/p/Baz.java', 'src/test/java/p/TestBaz.java']
+    assert find_test_pairs(files) == {}
+    assert find_test_pairs(files, EXTENDED_PATTERNS) == {
+        'src/main/java/p/Foo.java': 'src/test/java/p/FooTests.java',
+        'src/main/java/p/Bar.java': 'src/test/java/p/BarIT.java',
+        'src/main/java/p/Baz.java': 'src/test/java/p/TestBaz.java'}
+
+def test_it_and_test_prefix_under_main_are_production():
+    # JUnit's Test-prefixed helpers and classes named after an abbreviation like GIT, COMMIT
+    files = ['src/main/java/p/Comm.java', 'src/main/java/p/CommIT.java', 'src/test/java/p/CommITTest.java',
+             'src/main/java/p/TestUtils.java', 'src/test/java/p/TestUtilsTest.java']
+    assert find_test_pairs(files, EXTENDED_PATTERNS) == {
+        'src/main/java/p/CommIT.java': 'src/test/java/p/CommITTest.java',
+        'src/main/java/p/TestUtils.java': 'src/test/java/p/TestUtilsTest.java'}
+
+def test_same_name_prefers_own_package():
+    files = ['a/src/main/java/p/Foo.java', 'b/src/main/java/q/Foo.java',
+             'a/src/test/java/p/FooTest.java', 'b/src/test/java/q/FooTest.java']
+    assert find_test_pairs(files) == {'a/src/main/java/p/Foo.java': 'a/src/test/java/p/FooTest.java',
+                                      'b/src/main/java/q/Foo.java': 'b/src/test/java/q/FooTest.java'}
@@ -1,17 +1,38 @@
-from miner import get_files
-import traceback, sys
-from statsmodels.stats.proportion import proportions_ztest
+from miner import get_files, get_test_pairs, split_pr_urls, listed_files
+import traceback, sys, shutil
+from classifier import TESTABILITY_RULES, SUGGESTED_RULES
+from test_pairs import DEFAULT_PATTERNS
+from scheduler import run_jobs, read_ledger, mining_command, batch_command, LEDGER_FILE
+import mirror
+from mined_store import load_mined, mined_filenames, MINED_SUFFIX
+from page_reader import iter_page_nodes, processor_fields, PageError, NODE_FIELDS
+import hashlib
+import functools
+from ingest import ingest, read_parts
+from stats import proportions_ztest, compare_means
+from ref_counts import ref_counts
+import schema
+import memo
+import metrics
 import math
 from io import BytesIO
-import requests
 import os
 import re
 import json
 import pandas as pd
 import numpy as np
 import time
-import matplotlib.pyplot as plt
-import seaborn as sns
+
+# the charts are in plots.py, imported on first use of utils.plot_* because matplotlib and seaborn
+# take about a second to import. like statsmodels/scipy in stats.py, they are not needed for parsing and mining.
+# they are in __all__ at the end, so from utils import * still has them
+PLOTS=['ci_pointplot', 'plot_means', 'old_plot_ci_means', 'plot_ci_means', 'plot_ci_generic_means']
+
+def __getattr__(name):
+    if name in PLOTS:
+        import plots
+        return getattr(plots, name)
+    raise AttributeError("module 'utils' has no attribute '%s'" % name)
 
 def df_to_latex(df,index=True):
     s=df.round(2).to_latex(index=index)
@@ -21,79 +42,20 @@ def df_to_latex(df,index=True):
         s=s.replace(m.group(1),'|'+('|'.join(list(m.group(1)))+'|'))
     return s
 
-def contains_in_masks(s, masks):
-    return len([m for m in masks if m in s]) > 0
-
 def is_testability_relevant(s):
-    if not isinstance(s, str):
-        return (False, "other")
-    s=s.lower()
-    testability_masks=['testability','testable']
-    for m in testability_masks:
-        if m in s:
-            return (True, 'testability')
-    if 'refactor' in s and ('test' in s or 'junit' in s):
-        return (True, 'Refactor for test')
-    if 'dependency' in s or 'depend' in s:
-        return (True, 'Dependency')
-    if 'concurren' in s or 'thread' in s or 'sleep' in s or 'latch' in s:
-        return (True, 'Concurrency')
-    if 'singleton' in s:
-        return (True, 'Singleton')
-    if 'inject' in s or 'wire' in s or 'wiring' in s:
-        return (True, 'Inject')
-    if 'socket' in s or 'network' in s or 'connectivity' in s:
-        return (True, 'Network')
-    
-#    if 'fix' in s:
-#        return (True, 'fix')
-    if 'test' in s or 'junit' in s:
-        return (True, 'test')
-    
-#    if 'junit' in s:
-#        return (True, 'junit')
-            
-    return (False, "Other")
+    return TESTABILITY_RULES.classify(s)
 
 def is_testability_relevant_suggested(s):
-    if not isinstance(s, str):
-        return (False, "other")
-    s=s.lower()
-    test_junit=['test','junit']
-    #m1
-    if contains_in_masks(s, ['testabilit','testable']):
-        return (True, 'testability')
-    #m2
-    if contains_in_masks(s, ['simpl','visibl','eas']) and contains_in_masks(s, test_junit):
-        return (True, 'Easier to test')
-    #m3
-    if 'refactor' in s and contains_in_masks(s, test_junit):
-        return (True, 'Refactor for test')
-    #m4
-    if 'depend' in s and contains_in_masks(s, test_junit):
-        return (True, 'Dependency')
-    #m5
-    if contains_in_masks(s, ['concurren','thread','sleep','latch']) and contains_in_masks(s, test_junit):
-        return (True, 'Concurrency')
-    #m6
-    if 'singleton' in s and contains_in_masks(s, test_junit):
-        return (True, 'Singleton')
-    #m7
-    if contains_in_masks(s, ['inject','wire','wiring']) and contains_in_masks(s, test_junit):
-        return (True, 'Injection')
-    #m8
-    if contains_in_masks(s, ['network','socket','connectivity','connection']) and contains_in_masks(s, test_junit):
-        return (True, 'Network')
-    
-    if 'fix' in s:
-        return (True, 'Fix')
-    if 'test' in s:
-        return (True, 'test')
-            
-    return (False, "other")
+    return SUGGESTED_RULES.classify(s)
 
+def title_masks(titles, rules=TESTABILITY_RULES):
+    # vectorized is_testability_relevant(x)[1] over a whole series
+    return rules.classify_series(titles)['label']
+
+# memo.stage: the result is cached in MEMO_DIR when that is enabled, see memo.py
+@memo.stage
 def generate_all_prs(df):
-    all_prs=df.groupby(['url','title_mask','body_mask','title'], as_index=False).agg(
+    all_prs=df.groupby(['url','title_mask','body_mask','title'], as_index=False, observed=True).agg(
         {'prod_file':'count', 
          'prod_additions': 'sum',
          'test_additions': 'sum',
@@ -102,9 +64,8 @@ def generate_all_prs(df):
          'test_pairs':'first',
          'changed_files':'first'
         })
-    ja = df.groupby(['url'])
-    ja=ja.agg({'changedFile':lambda f: len([s for s in f if s.endswith('.java')] )})
-    ja=ja.reset_index().rename(columns={'changedFile':"java_files_count"})
+    ja=df[['url']].assign(java_files_count=df['changedFile'].str.endswith('.java') == True)
+    ja=ja.groupby('url', observed=True)['java_files_count'].sum().reset_index()
     all_prs=all_prs.merge(ja, on='url')
     return all_prs
 
@@ -120,31 +81,25 @@ def get_project(x):
         return mat.group(1)
 
 def create_mined_filename(row):
-    fname='mined/' + row['prid']+'.csv'
+    fname='mined/' + row['prid']+MINED_SUFFIX
     return fname
 
 def derive_prid(x):
     return re.sub(pattern='.*?github.com/(.*?)/pull/([0-9]+).*',string=x,repl='\\1_\\2').replace('/','_')
 
 def enrich_mine_df(df):
-    df['repo_url'] = df['url'].apply(lambda x: re.sub(pattern='(.*?)/pull/[0-9]+',string=x,repl='\\1.git'))
-    df['pull_req_id'] = df['url'].apply(lambda x: re.sub(pattern='.*?/pull/([0-9]+)',string=x,repl='\\1'))
-    df['prid'] = df['url'].apply(lambda x: re.sub(pattern='.*?github.com/(.*?)/pull',string=x,repl='\\1').replace('/','_'))
-    df['mined_filename']=df.apply(create_mined_filename, axis=1)
-    df['mined_already']=df['mined_filename'].apply(os.path.isfile)
+    df[['repo_url','pull_req_id','prid']] = split_pr_urls(df['url'])
+    listed=listed_files('mined')
+    df['mined_filename']=mined_filenames(df['prid'], listed)
+    df['mined_already']=df['mined_filename'].isin(listed)
     return df
 
 def gen_mined_csv(files=None):
-    mined=pd.DataFrame()
-    for fname in files:
-        if os.path.getsize(fname) < 100:
-            continue
-        x=pd.read_csv(fname,sep=';')
-        x['fname']=fname
-        x['prid']=fname.replace('mined/','').replace('.csv','')
-        mined=mined.append(x)
+    return schema.compact(load_mined(files))
 
-    return mined
+def load_frame(fname, urls=None):
+    # the analysis CSVs (all_prs_with_files.csv, cached_30k_mined.csv, ...) with the compact dtypes of schema.py
+    return schema.read_csv(fname, urls)
 
 def get_manually_mined(all_prs, manually_reviewed):
     mined_filenames=enrich_mine_df(manually_reviewed[['url','pr_group','ref_pattern']].merge(all_prs).drop_duplicates())
@@ -152,25 +107,76 @@ def get_manually_mined(all_prs, manually_reviewed):
     mined=mined.merge(mined_filenames)
     return mined    
 
-def mine_prs(df):
+def write_batch_file(chunk, batch_file, mirrors):
+    chunk=chunk[['repo_url','pull_req_id','mined_filename']].rename(columns={'mined_filename':'refminerFilename'})
+    if mirrors:
+        chunk['local_repo']=chunk['repo_url'].map(mirrors)
+    chunk.to_csv(batch_file, index=False)
+    return batch_file
+
+def write_mining_batches(mdf, batch_size, batch_dir='mining_batches', use_mirrors=False, mirror_max_bytes=mirror.MAX_BYTES):
+    # PRs of one repository end up next to each other, the batch goal mines them in one JVM
+    os.makedirs(batch_dir, exist_ok=True)
+    mdf=mdf.sort_values(['repo_url','pull_req_id'])
+    jobs=[]
+    for start in range(0, len(mdf), batch_size):
+        chunk=mdf.iloc[start:start+batch_size]
+        # named after all of its PRs, another set of PRs is another batch in the ledger
+        digest=hashlib.sha1('\n'.join(chunk['prid']).encode()).hexdigest()[:16]
+        batch_id='batch_' + digest + '_' + str(len(chunk))
+        batch_file=os.path.join(batch_dir, batch_id + '.csv')
+        job={'id':batch_id, 'size':len(chunk), 'rows':chunk}
+        if use_mirrors:
+            # the batch file can only be written once the mirrors are in place
+            job['context']=lambda urls=list(chunk['repo_url']): mirror.use_mirrors(urls, max_bytes=mirror_max_bytes)
+            job['cmd']=lambda paths, chunk=chunk, batch_file=batch_file: batch_command(write_batch_file(chunk, batch_file, paths))
+        else:
+            job['cmd']=batch_command(write_batch_file(chunk, batch_file, None))
+        jobs.append(job)
+    return jobs
+
+def mining_job(row, use_mirrors=False, mirror_max_bytes=mirror.MAX_BYTES):
+    job={'id':row.prid, 'output':row.mined_filename}
+    if use_mirrors:
+        job['context']=lambda: mirror.use_mirrors([row.repo_url], max_bytes=mirror_max_bytes)
+        job['cmd']=lambda paths: mining_command(row.mined_filename, row.repo_url, row.pull_req_id, local_repo=paths[row.repo_url])
+    else:
+        job['cmd']=mining_command(row.mined_filename, row.repo_url, row.pull_req_id)
+    return job
+
+def unmined_of_failed_batches(jobs, ledger=LEDGER_FILE):
+    # PRs without output of the batches that gave up, now or in an earlier run
+    state=read_ledger(ledger)
+    failed=[job['rows'] for job in jobs if state.get(job['id'], {}).get('status')=='gave_up']
+    if not failed:
+        return failed
+    rows=pd.concat(failed)
+    return list(rows[~rows['mined_filename'].map(os.path.isfile)].itertuples())
+
+def mine_prs(df, workers=4, timeout=3600, retries=2, backoff=900, batch_size=None, use_mirrors=False, retry_failed=False,
+             mirror_max_bytes=mirror.MAX_BYTES):
+    # retry_failed: run the jobs again that gave up in an earlier run, mirror_max_bytes: size of mirrors/ (0 no limit)
     df=enrich_mine_df(df)
     print(df['mined_already'].value_counts())
-    mdf=df[df['mined_already']==False]
+    mdf=df[df['mined_already']==False].drop_duplicates(subset=['prid']).sample(frac=1.0)
     print('Mining ', len(mdf), 'PRs')
-    counter=0
-    for i, row in mdf.sample(frac=1.0).iterrows():
-        fname='mined/' + row['prid']+'.csv'
-        cmd='mvn com.github.jazzmuesli:refminer-mvn-plugin:commitminer -DrefminerFilename=' + fname + ' -DgitURL=%s -DpullRequest=%s' % (row['repo_url'], row['pull_req_id'])
-        if not os.path.isfile(fname):
-            print(counter, '/', len(mdf), cmd)
-            ret=os.system(cmd)
-            counter = counter+1
-            if ret != 0:
-                print("Ended with " , ret)
-                time.sleep(900)
+    if not batch_size:
+        jobs=[mining_job(row, use_mirrors, mirror_max_bytes) for row in mdf.itertuples()]
+        return run_jobs(jobs, workers=workers, timeout=timeout, retries=retries, backoff=backoff, retry_failed=retry_failed)
+    jobs=write_mining_batches(mdf, batch_size, use_mirrors=use_mirrors, mirror_max_bytes=mirror_max_bytes)
+    results=run_jobs(jobs, workers=workers, timeout=timeout * batch_size, retries=retries, backoff=backoff, retry_failed=retry_failed)
+    # a failed batch has mined most of its PRs, the rest are mined one by one
+    rows=unmined_of_failed_batches(jobs)
+    if rows:
+        print('Mining', len(rows), 'PRs of failed batches one by one')
+        jobs=[mining_job(row, use_mirrors, mirror_max_bytes) for row in rows]
+        results.update(run_jobs(jobs, workers=workers, timeout=timeout, retries=retries, backoff=backoff, retry_failed=retry_failed))
+    return results
                 
+@memo.stage(files=lambda prs_to_mine: listed_files('mined'))
 def get_3k_mined(prs_to_mine):
-    mined_filenames=enrich_mine_df(prs_to_mine)
+    # on a copy, a memo hit could not add the columns to prs_to_mine
+    mined_filenames=enrich_mine_df(prs_to_mine.copy())
     print(pd.crosstab(mined_filenames['test_pairs']>0,mined_filenames['mined_already'],margins=True))
     mined=gen_mined_csv(mined_filenames[mined_filenames.mined_already==True]['mined_filename'])
     mined=mined.merge(mined_filenames)
@@ -198,12 +204,25 @@ def mark_reviewed_prs_with_test_pairs(mined, manually_reviewed):
         mined.loc[mined.pr_group!='irrelevant','with_test_pairs']=True
     return mined
 
-def exclude_too_large_commits(mined, all_prs_with_files):
-    # remove commits that are too large and likely to be merge commits
-    java_files_by_url=all_prs_with_files[all_prs_with_files.changedFile.str.endswith('.java')][['url','changedFile']].groupby('url').count()
-    cafter_by_url=mined.groupby(['url','commit']).agg({'classesAfter':lambda x: len(set(x))}).sort_values('classesAfter').reset_index()
-    commits=cafter_by_url.merge(java_files_by_url.reset_index())
-    irrelevant_commits=commits[commits.classesAfter > commits.changedFile]['commit'].drop_duplicates()
+def java_files_by_url(all_prs_with_files):
+    # changed .java files per url, compute once and pass to exclude_too_large_commits for several mined frames
+    java=all_prs_with_files.changedFile.str.endswith('.java')
+    counts=all_prs_with_files.loc[java, 'url'].value_counts()
+    counts=counts[counts > 0]
+    counts.index=pd.Index(counts.index.astype(object), name='url')
+    return counts
+
+@memo.stage
+def exclude_too_large_commits(mined, all_prs_with_files, java_files=None):
+    # remove commits that are too large and likely to be merge commits: more distinct classesAfter than
+    # the PR changed .java files. commits of PRs without .java files stay
+    if java_files is None:
+        java_files=java_files_by_url(all_prs_with_files)
+    cafter=mined.groupby(['url','commit'], observed=True)['classesAfter'].nunique(dropna=False)
+    urls=cafter.index.get_level_values('url')
+    java=java_files.reindex(urls.astype(object)).to_numpy()
+    too_large=cafter.to_numpy() > java
+    irrelevant_commits=cafter.index.get_level_values('commit')[too_large].unique()
     mined=mined[~mined.commit.isin(irrelevant_commits)]
     return mined
 
@@ -213,17 +232,55 @@ def extract_simple_file_name(s):
 def extract_simple_class_name(s):
     return re.sub(r'.*?([^\\.]+)$', '\\1', s)
 
+def replace_str(s, pat, repl):
+    # Series.str.replace, for a categorical only over its categories
+    if isinstance(s.dtype, pd.CategoricalDtype):
+        cats=pd.Series(s.cat.categories.astype(object)).str.replace(pat, repl, regex=True).to_numpy(object)
+        codes=s.cat.codes.to_numpy()
+        return pd.Series(np.where(codes >= 0, cats[codes], np.nan), index=s.index, dtype=object)
+    return s.str.replace(pat, repl, regex=True)
+
+def extract_simple_file_names(s):
+    # extract_simple_file_name of a whole series
+    return replace_str(s, r'.*?/([^/]+).java$', '\\1').fillna('')
+
+def extract_simple_class_names(s):
+    return replace_str(s, r'.*?([^\\.]+)$', '\\1')
+
+@memo.stage
 def merge_refs_on_prod_file(mined, manually_reviewed):
-    dmined=mined
-    derived=manually_reviewed
-    derived['prod_file_className']=derived['prod_file'].apply(extract_simple_file_name)
-    dmined['classNameBefore']=dmined['classesBefore'].apply(extract_simple_class_name)
-    dmined['classNameAfter']=dmined['classesAfter'].apply(extract_simple_class_name)
-    m=dmined[dmined.pr_group!='irrelevant'].merge(derived[['url','prod_file_className']].drop_duplicates(), left_on=['url','classNameBefore'], right_on=['url','prod_file_className'])
-    m=m.append(dmined[dmined.pr_group!='irrelevant'].merge(derived[['url','prod_file_className']].drop_duplicates(), left_on=['url','classNameAfter'], right_on=['url','prod_file_className']))
-    m=m.append(dmined[dmined.pr_group=='irrelevant'])
-    m=m.drop_duplicates()
-    return m
+    # refactorings of relevant PRs whose class before or after is a prod_file of the PR, plus all refactorings
+    # of irrelevant PRs, without duplicates. one merge of both class names against the prod files of the PR,
+    # rows are deduplicated on (mined row, matched class) instead of comparing all columns of the result
+    # copies, the class name columns are not added to the arguments (a memo hit could not add them)
+    dmined=mined.copy()
+    derived=manually_reviewed.copy()
+    derived['prod_file_className']=extract_simple_file_names(derived['prod_file'])
+    dmined['classNameBefore']=extract_simple_class_names(dmined['classesBefore'])
+    dmined['classNameAfter']=extract_simple_class_names(dmined['classesAfter'])
+    relevant=(dmined.pr_group!='irrelevant').to_numpy()
+    rel=dmined[relevant]
+    n=len(rel)
+    url=rel['url'].to_numpy(object)
+    keys=pd.DataFrame({'row': np.tile(np.arange(n), 2), 'side': np.repeat([0, 1], n),
+                       'url': np.concatenate([url, url]),
+                       'className': np.concatenate([rel['classNameBefore'].to_numpy(object), rel['classNameAfter'].to_numpy(object)])})
+    prod_files=derived[['url','prod_file_className']].drop_duplicates()
+    prod_files=prod_files.assign(url=prod_files['url'].to_numpy(object))
+    hits=keys.merge(prod_files, left_on=['url','className'], right_on=['url','prod_file_className'])
+    hits=hits.sort_values(['side','row'], kind='stable')
+    m=rel.iloc[hits['row'].to_numpy()].copy()
+    m['prod_file_className']=hits['prod_file_className'].to_numpy()
+    # same index as the two merges of before and after followed by the irrelevant rows
+    side=hits['side'].to_numpy()
+    m.index=np.concatenate([np.arange((side == 0).sum()), np.arange((side == 1).sum())])
+    irrelevant=dmined[dmined.pr_group=='irrelevant']
+    m=pd.concat([m, irrelevant])
+    # a result row is a mined row plus the matched class, identical mined rows share one id
+    row_ids=dmined.groupby(list(dmined.columns), dropna=False, observed=True, sort=False).ngroup().to_numpy()
+    ids=np.concatenate([row_ids[relevant][hits['row'].to_numpy()], row_ids[(dmined.pr_group=='irrelevant').to_numpy()]])
+    dup=pd.DataFrame({'id': ids, 'className': m['prod_file_className'].to_numpy(object)}).duplicated().to_numpy()
+    return m[~dup]
 
 
 def filter_mined(mined, with_test_pairs):
@@ -231,89 +288,69 @@ def filter_mined(mined, with_test_pairs):
     return sel
 
 def get_refs_per_url(mined, with_test_pairs):
-    sel=filter_mined(mined, with_test_pairs)
-    return pd.crosstab(sel.url, sel.refactoringType)
+    # PR x refactoringType counts of the rows of filter_mined(mined, with_test_pairs), a PR/type row/column
+    # only for the ones in there. built once per mined frame, see ref_counts.py
+    return ref_counts(mined).frame(with_test_pairs)
 
 
-def agg_data(mined, with_test_pairs):
+def agg_data(mined, with_test_pairs, counts=None):
+    # counts: ref_counts(mined) if the caller has it already
     col_name='with_test_pairs' if with_test_pairs else 'without_test_pairs'
-    sel=filter_mined(mined, with_test_pairs)
-    p=pd.DataFrame(get_refs_per_url(mined, with_test_pairs).agg(np.mean),columns=[col_name])
-    p['refactoringType']=p.index
-    p.index.name=None
-    cnt=sel[['url','refactoringType']].drop_duplicates().groupby('refactoringType').count().reset_index().sort_values('url').rename(columns={'url':col_name+'_cnt'})
-    cnt=pd.DataFrame(get_refs_per_url(mined, with_test_pairs).agg(sum),columns=[col_name+'_cnt'])
-    cnt['refactoringType']=cnt.index
-    cnt.index.name=None
-    return pd.DataFrame(p[['refactoringType',col_name]]).merge(pd.DataFrame(cnt[['refactoringType',col_name+'_cnt']]))
-
+    counts=counts or ref_counts(mined)
+    # the dtype the crosstab before had: categorical for a compact frame, else what pandas infers for strings
+    types=pd.Series(counts.types[with_test_pairs].tolist(), dtype=None)
+    if isinstance(mined['refactoringType'].dtype, pd.CategoricalDtype):
+        types=types.astype(mined['refactoringType'].dtype)
+    return pd.DataFrame({'refactoringType': types, col_name: counts.means(with_test_pairs).to_numpy(),
+                         col_name+'_cnt': counts.sums(with_test_pairs).to_numpy()})
+
+@memo.stage
 def calc_means_and_counts_by_ref_type(mined, min_count=5):
-    w1=agg_data(mined, True)
-    w2=agg_data(mined, False)
+    counts=ref_counts(mined)
+    w1=agg_data(mined, True, counts)
+    w2=agg_data(mined, False, counts)
     w=w2.merge(w1,on='refactoringType')
-    with_tests_cnt=len(set(mined[mined.test_pairs>0]['prid']))
-    without_tests_cnt=len(set(mined[mined.test_pairs==0]['prid']))
+    with_tests_cnt=mined.loc[mined.test_pairs>0, 'prid'].nunique(dropna=False)
+    without_tests_cnt=mined.loc[mined.test_pairs==0, 'prid'].nunique(dropna=False)
 
-    w['significance']=w[['with_test_pairs_cnt','without_test_pairs_cnt']].apply(lambda row: round(proportions_ztest([row[0], row[1]], [with_tests_cnt,without_tests_cnt])[1],4), axis=1)
+    w['significance']=proportions_ztest(w['with_test_pairs_cnt'], w['without_test_pairs_cnt'], with_tests_cnt, without_tests_cnt).round(4)
 
-    w=w[(w.without_test_pairs_cnt>min_count) & (w.with_test_pairs_cnt > min_count)]
+    w=w[(w.without_test_pairs_cnt>min_count) & (w.with_test_pairs_cnt > min_count)].copy()
     w['ratio']=w['with_test_pairs']/w['without_test_pairs']
+    # bootstrap CIs of the means and permutation p-values, the plots take the CIs from here
+    cis=ref_type_cis(mined, counts).reindex(w['refactoringType'])
+    for c in cis.columns:
+        w[c]=cis[c].to_numpy()
     return w.sort_values('ratio')
 
-
-def plot_means(means):
-    melted=pd.melt(means[['refactoringType','without_test_pairs','with_test_pairs','ratio']], id_vars=['refactoringType','ratio'])
-    plt.figure(figsize=(16, 6))
-    sns.stripplot(data=melted, x='refactoringType',y='value',hue='variable',order=means.sort_values('ratio',ascending=False)['refactoringType'].drop_duplicates())
-    plt.xticks(rotation=90)
-    plt.ylabel('Frequency per PR')
-    plt.xlabel('RefactoringMiner pattern')
-    return means
-
-def old_plot_ci_means(mined, means, leg_title):
-    a1=get_refs_per_url(mined, True)
-    a1['with_tpairs']=True
-    a2=get_refs_per_url(mined, False)
-    a2['with_tpairs']=False
-    a=a1.append(a2)
-    melted=pd.melt(a.reset_index(), id_vars=['url','with_tpairs'])
-    plt.figure(figsize=(16, 6))
-    ax = sns.pointplot(x="variable", y="value", hue="with_tpairs",
-                   data=melted[melted.variable.isin(means.refactoringType)],dodge=True,
-                   order=means.sort_values('ratio',ascending=False)['refactoringType'],
-                   markers=["o", "x"],capsize=.2,
-                   linestyles=[" ", " "])
-    plt.legend(title=leg_title, loc='upper left')
-    plt.xticks(rotation=90)
-    plt.ylabel('Frequency per PR')
-    plt.xlabel('RefactoringMiner pattern')
-    return ax
+def ref_type_cis(mined, counts=None):
+    # per refactoringType (index) the means and their 95% bootstrap CIs with and without test pairs and the
+    # permutation p-value of the difference, see stats.py
+    counts=counts or ref_counts(mined)
+    # resampled once per counts, the plots of the same frame reuse them
+    if counts.cis is None:
+        s=compare_means(counts.frame(True), counts.frame(False))
+        counts.cis=pd.DataFrame({'with_test_pairs_ci_low': s.ci_low1, 'with_test_pairs_ci_high': s.ci_high1,
+                                 'without_test_pairs_ci_low': s.ci_low2, 'without_test_pairs_ci_high': s.ci_high2,
+                                 'permutation_significance': s.pvalue.round(4)})
+    return counts.cis.copy()
+
+def means_cis(mined, means, counts=None):
+    # one row per refactoringType and with_tpairs with mean, ci_low and ci_high. the CIs of
+    # calc_means_and_counts_by_ref_type are reused, only means without them are bootstrapped again
+    if 'with_test_pairs_ci_low' not in means:
+        cis=ref_type_cis(mined, counts).reindex(means['refactoringType'])
+        means=means.assign(**{c: cis[c].to_numpy() for c in cis.columns})
+    rows=[]
+    for with_tpairs, col in [(True, 'with_test_pairs'), (False, 'without_test_pairs')]:
+        rows.append(pd.DataFrame({'refactoringType': means['refactoringType'].to_numpy(), 'with_tpairs': with_tpairs,
+                                  'mean': means[col].to_numpy(), 'ci_low': means[col+'_ci_low'].to_numpy(),
+                                  'ci_high': means[col+'_ci_high'].to_numpy()}))
+    return pd.concat(rows, ignore_index=True).drop_duplicates(['refactoringType','with_tpairs'])
 
 def as_title(x):
     return (' '.join(x.split('_'))).title()
 
-def plot_ci_means(mined, means, leg_title):
-    a1=get_refs_per_url(mined, True)
-    a1['with_tpairs']=True
-    a2=get_refs_per_url(mined, False)
-    a2['with_tpairs']=False
-    a=a1.append(a2)
-    melted=pd.melt(a.reset_index(), id_vars=['url','with_tpairs'])
-    means['refactoringTitle']=means['refactoringType'].apply(as_title)
-    melted['variableTitle']=melted['variable'].apply(as_title)
-    plt.figure(figsize=(5, 8))
-    ax = sns.pointplot(x="value", y="variableTitle", hue="with_tpairs",
-                   data=melted[melted.variableTitle.isin(means.refactoringTitle)],dodge=0.2,
-                   order=means.sort_values('ratio',ascending=False)['refactoringTitle'],
-                   markers=["o", "x"],capsize=.2,
-                   linestyles=[" ", " "])
-    plt.legend(title=leg_title, loc='upper right')
-    plt.xticks(rotation=0)
-    plt.xlabel('Frequency per PR')
-    plt.ylabel('')
-    return ax
-
-
 def make_clickable(val):
     return '<a href="{}">{}</a>'.format(val,val)
 
@@ -345,6 +382,7 @@ def derive_reviewer_id(x):
 
 
 def import_csv_from_url(url, header='infer'):
+    import requests
     r = requests.get(url)
     data = r.content
 
@@ -353,101 +391,211 @@ def import_csv_from_url(url, header='infer'):
 
 def as_title_sig(row):
     star = ''
-    if math.isnan(row[0]) or row[0] < 0.05:
+    if math.isnan(row.iloc[0]) or row.iloc[0] < 0.05:
         star = ' *'
-    elif row[0] >= 0.5:
+    elif row.iloc[0] >= 0.5:
         star = ' +'
-    return as_title(row[1]) + star
-
-def plot_ci_generic_means(mined, means, pos_title, neg_title):
-    a1=get_refs_per_url(mined, True)
-    a1['with_tpairs']=True
-    a2=get_refs_per_url(mined, False)
-    a2['with_tpairs']=False
-    a=a1.append(a2)
-    melted=pd.melt(a.reset_index(), id_vars=['url','with_tpairs'])
-    means['refactoringTitle']=means['refactoringType'].apply(as_title)
-    means['refactoringTitleSig']=means[['significance','refactoringType']].apply(as_title_sig, axis=1)
-
-    melted['variableTitle']=melted['refactoringType'].apply(as_title)
-    melted['hue']=melted['with_tpairs'].apply(lambda x: pos_title+' (N=' + str(len(a1)) + ')' if x else neg_title + ' (N=' + str(len(a2)) + ')')
-    plt.figure(figsize=(5, 12))
-    melted=melted.merge(means[['refactoringTitle','refactoringTitleSig']].drop_duplicates(), left_on='variableTitle',right_on='refactoringTitle')
-    sel=melted[melted.variableTitle.isin(means.refactoringTitle)]
-
-    ax = sns.pointplot(x="value", y="refactoringTitleSig", hue="hue",
-                   data=melted[melted.variableTitle.isin(means.refactoringTitle)],dodge=0.2,
-                   order=means.sort_values('ratio',ascending=False)['refactoringTitleSig'],
-                   markers=["o", "x"],capsize=.2,
-                   linestyles=[" ", " "])
-    plt.legend(loc='best',bbox_to_anchor=(0.5, 0.78))
-    plt.xticks(rotation=0)
-    plt.xlabel('Frequency per PR')
-    plt.ylabel('')
-    return ax
-
-
-
-
-def reparse_files(): 
+    return as_title(row.iloc[1]) + star
+
+MANIFEST_FILE='all_prs_with_files.manifest.csv'
+
+def file_digest(fname):
+    h=hashlib.sha1()
+    with open(fname,'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            h.update(block)
+    return h.hexdigest()
+
+def load_manifest(manifest_file=MANIFEST_FILE):
+    if os.path.isfile(manifest_file):
+        return pd.read_csv(manifest_file).set_index('fname')
+    return pd.DataFrame(columns=['mtime','size','sha1','rows'], index=pd.Index([], name='fname'))
+
+def scan_cache(files, manifest):
+    # a file is re-parsed only if its content changed, the hash is computed only when mtime or size differ
+    entries=[]
+    changed=[]
+    for fname in files:
+        st=os.stat(fname)
+        if fname in manifest.index:
+            old=manifest.loc[fname]
+            # no sha1: the file failed to parse last time
+            parsed=isinstance(old['sha1'], str) and old['sha1'] != ''
+            if parsed and old['mtime'] == st.st_mtime and old['size'] == st.st_size:
+                entries.append((fname, st.st_mtime, st.st_size, old['sha1'], old['rows']))
+                continue
+            digest=file_digest(fname)
+            if digest == old['sha1']:
+                entries.append((fname, st.st_mtime, st.st_size, digest, old['rows']))
+                continue
+        else:
+            digest=file_digest(fname)
+        entries.append((fname, st.st_mtime, st.st_size, digest, 0))
+        changed.append(fname)
+    new_manifest=pd.DataFrame(entries, columns=['fname','mtime','size','sha1','rows']).set_index('fname')
+    return new_manifest, changed
+
+def parse_cache_files(files, workers=None, parts_dir='all_prs_with_files.parts', nproc=None, fields=None):
+    # returns the rows and the files that could not be parsed, see ingest.py. nproc must be picklable
+    if len(files) == 0:
+        return pd.DataFrame(), []
+    shutil.rmtree(parts_dir, ignore_errors=True)
+    parts, failed=ingest(files, functools.partial(parse_files, nproc=nproc, fields=fields), parts_dir, workers)
+    df=read_parts(parts)
+    shutil.rmtree(parts_dir, ignore_errors=True)
+    return df, failed
+
+def read_previous(out_file):
+    # rows of the last run to build on, None if there are none (empty or cut off file): all files are parsed
+    if not os.path.isfile(out_file):
+        return None
+    try:
+        prev=pd.read_csv(out_file)
+    except pd.errors.EmptyDataError:
+        return None
+    return prev if 'fname' in prev.columns else None
+
+def reparse_files(store_dir=None, incremental=False, out_file='all_prs_with_files.csv', manifest_file=MANIFEST_FILE, workers=None, nproc=None, fields=None):
+    if store_dir:
+        df=process_store(store_dir, nproc)
+        df['title_mask']=title_masks(df.title)
+        df.to_csv(out_file,index=False) 
+        return df
     files=get_files('cached') 
-    df_split = np.array_split(files, 100) 
-    with Pool(7) as p: 
-        df=pd.concat(p.map(process_multiple_files, df_split)) 
-    df['title_mask']=df.title.apply(lambda x: is_testability_relevant(x)[1])
-    df.to_csv('all_prs_with_files.csv',index=False) 
+    prev=read_previous(out_file) if incremental else None
+    old_manifest=load_manifest(manifest_file if prev is not None else '')
+    manifest, changed=scan_cache(files, old_manifest)
+    df, failed=parse_cache_files(changed, workers, out_file + '.parts', nproc, fields)
+    # a file that failed is parsed again next time
+    manifest.loc[failed, 'sha1']=''
+    if len(df) > 0:
+        df['title_mask']=title_masks(df.title)
+    if prev is not None:
+        # keep rows of unchanged files, drop rows of changed and deleted ones
+        prev=prev[prev.fname.isin(manifest.index) & ~prev.fname.isin(changed)]
+        df=pd.concat([prev, df], ignore_index=True)
+    if len(df) > 0:
+        manifest['rows']=df.groupby('fname').size().reindex(manifest.index, fill_value=0)
+    df.to_csv(out_file,index=False) 
+    manifest.reset_index().to_csv(manifest_file,index=False)
+    print('Parsed', len(changed), 'of', len(files), 'files')
     return df
 
 
 
 
-def process_file(fname, fnproc):
-    try:
-        text=open(fname).read()
-        js=json.loads(text)
-        data=js.get('data',{})
-        repository=data.get('repository',{})
-        if not repository or js.get('errors'):
-            return pd.DataFrame()
-        nodes=repository.get('pullRequests',{}).get('nodes',[])
-        ret=[fnproc(fname,x) for x in nodes]
-        if len(ret) > 0:
-            return pd.concat(ret)
+class FrameBuilder:
+    # collects the output of node processors and builds one DataFrame at the end.
+    # a node processor may yield/return dicts (rows) or, like before, return a DataFrame
+    def __init__(self):
+        self.rows=[]
+        self.frames=[]
+        self.failed=[]
+        # nodes read, for the nodes/s of metrics
+        self.nodes=0
+
+    def add(self, out):
+        if out is None:
+            return
+        if isinstance(out, pd.DataFrame):
+            if len(out) > 0:
+                self.frames.append(out)
+        elif isinstance(out, dict):
+            self.rows.append(out)
         else:
+            self.rows.extend(out)
+
+    def mark(self):
+        return len(self.rows), len(self.frames)
+
+    def rollback(self, mark):
+        del self.rows[mark[0]:]
+        del self.frames[mark[1]:]
+
+    def frame(self):
+        frames=self.frames + ([pd.DataFrame(self.rows)] if self.rows else [])
+        if not frames:
             return pd.DataFrame()
+        return frames[0] if len(frames) == 1 else pd.concat(frames)
+
+def process_file(fname, fnproc, builder=None, fields=None, streaming=None):
+    # adds the rows of all nodes to builder, without one returns them as a DataFrame.
+    # the nodes only have the given fields, by default the ones fnproc declares (fnproc.fields, like
+    # nodeProcessor), whole nodes for processors that declare none
+    if fields is None:
+        fields=processor_fields(fnproc)
+    out=builder if builder is not None else FrameBuilder()
+    mark=out.mark()
+    try:
+        for x in iter_page_nodes(fname, fields, streaming):
+            out.nodes+=1
+            out.add(fnproc(fname,x))
+    except PageError:
+        out.rollback(mark)
     except Exception as e:
+        # nothing of a broken file
+        out.rollback(mark)
+        out.failed.append(fname)
         print(fname, e)
         traceback.print_exc(file=sys.stdout)
-        return pd.DataFrame()
+    return out if builder is not None else out.frame()
 
-def nodeProcessor(fname, n, max_changed_files=10):
+def nodeProcessor(fname, n, max_changed_files=10, patterns=DEFAULT_PATTERNS):
+    # max_changed_files=None keeps PRs of any size, e.g. functools.partial(nodeProcessor, max_changed_files=None),
+    # patterns=test_pairs.EXTENDED_PATTERNS also pairs FooTests, FooIT and TestFoo
     if not n.get('files'):
-        return pd.DataFrame()
+        return
     changed_files = {x.get('path', ''):x for x in n.get('files',{}).get('nodes',[])}
-    test_pairs = get_test_pairs(changed_files)
-    d=pd.DataFrame()
-    items=[]
-    if len(test_pairs) > 0 and len(changed_files) < max_changed_files:
+    test_pairs = get_test_pairs(changed_files, patterns)
+    if len(test_pairs) > 0 and (max_changed_files is None or len(changed_files) < max_changed_files):
+        body_mask=is_testability_relevant(n['bodyText'])[1]
         for s,t in test_pairs.items():
             prod_unit = changed_files[s]
             test_unit = changed_files[t]
-            if True or test_unit['additions'] > 10:
-                items.append({'fname':fname, 
-                              'url':n['url'], 
-                              'title':n['title'], 
-                              'body_mask': is_testability_relevant(n['bodyText'])[1], 
-                              'prod_file':s, 
-                              'test_file':t, 
-                              'test_pairs':len(test_pairs),
-                              'changed_files':len(changed_files),
-                             'prod_additions': prod_unit['additions'],
-                             'test_additions': test_unit['additions'],
-                             'prod_deletions': prod_unit['deletions'],
-                             'test_deletions': test_unit['deletions']
-                             })
-    return pd.DataFrame(items)
-
-def process_multiple_files(files, nproc=None):
+            yield {'fname':fname, 
+                   'url':n['url'], 
+                   'title':n['title'], 
+                   'body_mask': body_mask, 
+                   'prod_file':s, 
+                   'test_file':t, 
+                   'test_pairs':len(test_pairs),
+                   'changed_files':len(changed_files),
+                   'prod_additions': prod_unit['additions'],
+                   'test_additions': test_unit['additions'],
+                   'prod_deletions': prod_unit['deletions'],
+                   'test_deletions': test_unit['deletions']
+                  }
+
+nodeProcessor.fields=NODE_FIELDS
+
+def parse_files(files, nproc=None, fields=None):
+    # rows of all files and the files that failed
     if not nproc:
         nproc=nodeProcessor
-    return pd.concat([process_file(f, nproc) for f in files])
\ No newline at end of file
+    builder=FrameBuilder()
+    with metrics.timer('parse_files', files=len(files)) as m:
+        for f in files:
+            process_file(f, nproc, builder, fields)
+        df=builder.frame()
+        m.update(nodes=builder.nodes, rows=len(df), failed=len(builder.failed))
+    return df, builder.failed
+
+def process_multiple_files(files, nproc=None, fields=None):
+    return parse_files(files, nproc, fields)[0]
+
+def process_store(store_dir, nproc=None):
+    # same as process_multiple_files but reads the nodes from the columnar pr_store instead of cached/*.json
+    from pr_store import iter_nodes
+    if not nproc:
+        nproc=nodeProcessor
+    builder=FrameBuilder()
+    with metrics.timer('process_store', store=store_dir) as m:
+        for fname, n in iter_nodes(store_dir):
+            builder.nodes+=1
+            builder.add(nproc(fname, n))
+        df=builder.frame()
+        m.update(nodes=builder.nodes, rows=len(df))
+    return df
+
+# from utils import * (the notebooks) also gets the plot functions, importing plots.py then
+__all__=[name for name in globals() if not name.startswith('_')] + PLOTS